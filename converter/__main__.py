@@ -0,0 +1,23 @@
+'''Developer commands, e.g. ``python -m converter profile "1 m in cm"``'''
+import sys
+
+from . import memory, profiler
+
+COMMANDS = {
+    'memory': memory.main,
+    'profile': profiler.main,
+}
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else list(argv)
+    if not argv or argv[0] not in COMMANDS:
+        sys.stderr.write(
+            'usage: python -m converter {%s} ...\n' % ','.join(COMMANDS)
+        )
+        return 2
+    return COMMANDS[argv[0]](argv[1:])
+
+
+if __name__ == '__main__':  # pragma: no cover
+    raise SystemExit(main())
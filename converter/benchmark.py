@@ -0,0 +1,429 @@
+'''Micro benchmarks for the converter hot paths
+
+Run ``python -m converter.benchmark [name ...]`` to time all or some of the
+registered benchmarks. ``--save baseline.json`` stores the timings and
+``--baseline baseline.json`` fails when a benchmark got slower than the
+stored timing by more than ``--threshold``.
+'''
+import argparse
+import datetime as dt
+import decimal
+import fractions
+import functools
+import io
+import json
+import os
+import pickle
+import random
+import subprocess
+import sys
+import tempfile
+import timeit
+
+from . import (
+    constants, convert, corpus, currency, output, safe_math, utils,
+)
+
+BENCHMARKS = {}
+
+
+def benchmark(name):
+    '''Register a benchmark setup function
+
+    The setup function runs once and returns the callable to time.
+    '''
+
+    def register(setup):
+        BENCHMARKS[name] = setup
+        return setup
+
+    return register
+
+
+def time_call(function, repeat=5):
+    '''Best time in seconds for a single call of `function`'''
+    timer = timeit.Timer(function)
+    number, _ = timer.autorange()
+    return min(timer.repeat(repeat=repeat, number=number)) / number
+
+
+def sample_response(size):
+    items = [
+        output.Item(
+            title=f'{index} meter = {index * 100} centimeter',
+            subtitle=(
+                'Action this item to copy the converted value to the '
+                'clipboard'
+            ),
+            arg=str(index * 100),
+            uid=f'm to cm {index}',
+            icon='icons/scale6.png',
+            autocomplete=f'{index * 100} centimeter',
+        )
+        for index in range(size)
+    ]
+    return output.Response(items=items, skipknowledge=True)
+
+
+def _register_render(size):
+    @benchmark(f'render_json_{size}')
+    def render_json():
+        response = sample_response(size)
+        return lambda: output.render_json(response)
+
+    @benchmark(f'render_json_{size}_dumps')
+    def render_json_dumps():
+        # The previous implementation, kept as a reference point
+        response = sample_response(size)
+        return lambda: json.dumps(response.to_alfred(), ensure_ascii=False)
+
+
+for _size in (20, 50):
+    _register_render(_size)
+
+
+# One query per class of work the script filter does
+QUERIES = {
+    'math': '1 + 2 * 3',
+    'unit': '10 m in cm',
+    'fractional': '1.5 in',
+    'split': '70 in in ft',
+}
+BATCH_QUERIES = [
+    '1m in cm',
+    '2^30 byte',
+    "5'6\"",
+    '5 * pi + 2 mm in m',
+    '10 m/s in mm/s',
+    '0b1010 + 0xA - 050',
+    '100 kg in lb',
+    '30 c in f',
+]
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+@functools.lru_cache(maxsize=None)
+def load_units():
+    # Loaded once and shared, so warm benchmarks skip the registry load
+    units = convert.Units()
+    units.load(constants.UNITS_XML_FILE)
+    return units
+
+
+@benchmark('cold_start')
+def cold_start():
+    # A fresh interpreter per call, like Alfred runs the script filter
+    cache_dir = tempfile.TemporaryDirectory()
+    env = dict(os.environ, alfred_workflow_cache=cache_dir.name)
+    command = [
+        sys.executable,
+        '-c',
+        'from converter import main; main.scriptfilter("1 m in cm")',
+    ]
+
+    def run_script():
+        subprocess.run(
+            command,
+            cwd=PROJECT_DIR,
+            env=env,
+            stdout=subprocess.DEVNULL,
+            check=True,
+        )
+        # Keeps the cache dir alive for as long as the benchmark
+        return cache_dir
+
+    return run_script
+
+
+@benchmark('registry_load_xml')
+def registry_load_xml():
+    def load():
+        units = convert.Units()
+        units.load(constants.UNITS_XML_FILE)
+        return units
+
+    return load
+
+
+@benchmark('registry_load_pickle')
+def registry_load_pickle():
+    payload = pickle.dumps(load_units(), -1)
+    return lambda: pickle.loads(payload)
+
+
+def _register_query(name, query):
+    @benchmark(f'warm_{name}')
+    def warm_query():
+        units = load_units()
+        create_item = output.item_creator()
+        return lambda: list(convert.main(units, query, create_item))
+
+
+for _name, _query in QUERIES.items():
+    _register_query(_name, _query)
+
+
+@benchmark('warm_currency')
+def warm_currency():
+    cache_dir = tempfile.TemporaryDirectory()
+    today = dt.date.today()
+    currency.write_rate_cache(cache_dir.name, currency.RateCache(
+        base='usd',
+        date=today,
+        fetched_at=today,
+        rates={
+            'eur': decimal.Decimal('0.92'),
+            'gbp': decimal.Decimal('0.79'),
+        },
+    ))
+
+    def convert_currency():
+        currency.convert_query(cache_dir.name, '100 usd eur', today)
+        return cache_dir
+
+    return convert_currency
+
+
+@benchmark('batch_stream')
+def batch_stream():
+    units = load_units()
+    create_item = output.item_creator()
+
+    def stream_batch():
+        buffer = io.StringIO()
+        for query in BATCH_QUERIES:
+            output.write_ndjson(
+                convert.main(units, query, create_item), stream=buffer
+            )
+        return buffer
+
+    return stream_batch
+
+
+@benchmark('batch_corpus')
+def batch_corpus():
+    # Unit and math traffic only, currency queries never reach convert.main
+    units = load_units()
+    weights = dict(corpus.WEIGHTS, currency=0)
+    queries = corpus.generate(units, 100, weights=weights)
+    create_item = output.item_creator()
+
+    def convert_corpus():
+        return sum(
+            len(list(convert.main(units, query, create_item)))
+            for query in queries
+        )
+
+    return convert_corpus
+
+
+def fraction_samples():
+    # The values fractional results show for inch, foot, cup and teaspoon
+    units = load_units()
+    samples = []
+    for source, target in (
+        ('cm', 'in'), ('m', 'ft'), ('ml', 'cup'), ('ml', 'tsp'),
+    ):
+        source, target = units.get(source), units.get(target)
+        for amount in range(1, 51):
+            value = decimal.Decimal(amount) / 4
+            samples.append(target.from_base(source.to_base(value)))
+    return samples
+
+
+def fraction_to_string_fractions(
+    value, proper=False, limit=constants.FRACTIONAL_PRECISION.denominator
+):
+    # The previous Fraction based implementation, kept as a reference point
+    fraction = fractions.Fraction(value)
+    prefix = ''
+    if limit and fraction.denominator > limit:
+        approximate = fractions.Fraction(round(fraction * limit), limit)
+        deviation = abs((100 * approximate / fraction) - 100)
+        prefix = '~'
+        fraction = approximate
+        if deviation > constants.FRACTIONAL_MAX_DEVIATION:
+            return None
+
+    if proper:
+        if fraction.numerator > fraction.denominator:
+            major = int(fraction.numerator / fraction.denominator)
+            fraction %= major
+            if major and fraction:
+                return f'{prefix}{major} {fraction}'
+        return None
+    return prefix + str(fraction)
+
+
+@benchmark('fraction_format')
+def fraction_format():
+    samples = fraction_samples()
+    return lambda: [utils.fraction_to_strings(value) for value in samples]
+
+
+@benchmark('fraction_format_fractions')
+def fraction_format_fractions():
+    samples = fraction_samples()
+    return lambda: [
+        (
+            fraction_to_string_fractions(value),
+            fraction_to_string_fractions(value, True),
+        )
+        for value in samples
+    ]
+
+
+def decimal_samples(size=20000):
+    # Mostly long division results, as conversions produce them, plus
+    # short exact values like typed quantities
+    rng = random.Random(0)
+    samples = []
+    for index in range(size):
+        numerator = decimal.Decimal(rng.randint(1, 10 ** 6))
+        if index % 2:
+            samples.append(numerator / rng.randint(1, 10 ** 4))
+        else:
+            samples.append(numerator.scaleb(-rng.randint(0, 4)))
+    return samples
+
+
+def decimal_to_string_localcontext(value):
+    # The previous implementation, kept as a reference point
+    with decimal.localcontext() as context:
+        context.prec = 50
+        value = value.quantize(
+            decimal.Decimal(10) ** -constants.OUTPUT_DECIMALS, context=context
+        )
+
+        return str(value).rstrip('0').rstrip('.')
+
+
+@benchmark('decimal_format')
+def decimal_format():
+    samples = decimal_samples()
+    return lambda: [utils.decimal_to_string(value) for value in samples]
+
+
+@benchmark('decimal_format_localcontext')
+def decimal_format_localcontext():
+    samples = decimal_samples()
+    return lambda: [
+        decimal_to_string_localcontext(value) for value in samples
+    ]
+
+
+# Small arguments plus the large ones the plain series struggle with
+TRANSCENDENTAL_SAMPLES = (
+    ('cos', '0.5'),
+    ('cos', '1000'),
+    ('sin', '0.5'),
+    ('sin', '1000'),
+    ('exp', '2'),
+    ('exp', '200'),
+)
+
+
+def exp_taylor(x):
+    # The previous implementations, kept as a reference point. Without
+    # argument reduction cos(1000) is not even close to the right value.
+    decimal.getcontext().prec += 2
+    i, lasts, s, fact, num = 0, 0, 1, 1, 1
+    while s != lasts:
+        lasts = s
+        i += 1
+        fact *= i
+        num *= x
+        s += num / fact
+    decimal.getcontext().prec -= 2
+    return +s
+
+
+def _sin_cos_taylor(x, i, s, num):
+    decimal.getcontext().prec += 2
+    lasts, fact, sign = 0, 1, 1
+    while s != lasts:
+        lasts = s
+        i += 2
+        fact *= i * (i - 1)
+        num *= x * x
+        sign *= -1
+        s += num / fact * sign
+    decimal.getcontext().prec -= 2
+    return +s
+
+
+TAYLOR_FUNCTIONS = dict(
+    cos=lambda x: _sin_cos_taylor(x, 0, 1, 1),
+    sin=lambda x: _sin_cos_taylor(x, 1, x, x),
+    exp=exp_taylor,
+)
+
+
+def _register_transcendental(name, functions):
+    @benchmark(name)
+    def transcendental():
+        samples = [
+            (functions[function], decimal.Decimal(argument))
+            for function, argument in TRANSCENDENTAL_SAMPLES
+        ]
+        return lambda: [function(argument) for function, argument in samples]
+
+
+_register_transcendental('transcendental', dict(
+    cos=safe_math.cos,
+    sin=safe_math.sin,
+    exp=safe_math.exp,
+))
+_register_transcendental('transcendental_taylor', TAYLOR_FUNCTIONS)
+
+
+def run(names=None, repeat=5):
+    names = names or sorted(BENCHMARKS)
+    return {name: time_call(BENCHMARKS[name](), repeat) for name in names}
+
+
+def compare(timings, baseline, threshold):
+    '''Benchmarks that got slower than `threshold` times their baseline'''
+    return {
+        name: (baseline[name], seconds)
+        for name, seconds in timings.items()
+        if name in baseline and seconds > baseline[name] * threshold
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m converter.benchmark')
+    parser.add_argument('names', nargs='*', metavar='name')
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--save', metavar='FILE')
+    parser.add_argument('--baseline', metavar='FILE')
+    parser.add_argument('--threshold', type=float, default=1.5)
+    args = parser.parse_args(argv)
+    unknown = sorted(set(args.names) - set(BENCHMARKS))
+    if unknown:
+        parser.error(f'unknown benchmark: {", ".join(unknown)}')
+
+    timings = run(args.names, args.repeat)
+    for name, seconds in timings.items():
+        sys.stdout.write(f'{name}: {seconds * 1e6:.1f} us\n')
+
+    if args.save:
+        with open(args.save, 'w', encoding='utf-8') as fh:
+            json.dump(timings, fh, indent=2, sort_keys=True)
+
+    if args.baseline:
+        with open(args.baseline, encoding='utf-8') as fh:
+            baseline = json.load(fh)
+        regressions = compare(timings, baseline, args.threshold)
+        for name, (before, after) in sorted(regressions.items()):
+            sys.stdout.write(
+                f'REGRESSION {name}: {before * 1e6:.1f} us -> '
+                f'{after * 1e6:.1f} us\n'
+            )
+        if regressions:
+            return 1
+    return 0
+
+
+if __name__ == '__main__':  # pragma: no cover
+    raise SystemExit(main())
@@ -28,7 +28,7 @@ def _resolve_units_xml_file():
 
 UNITS_XML_FILE = _resolve_units_xml_file()
 UNITS_PICKLE_FILE = 'units.pickle'
-UNITS_CACHE_VERSION = 2
+UNITS_CACHE_VERSION = 4
 
 OUTPUT_DECIMALS = int(os.environ.get('OUTPUT_DECIMALS') or 6)
 DECIMAL_SEPARATOR = os.environ.get('DECIMAL_SEPARATOR') or '.'
@@ -69,6 +69,7 @@ ICONS = {
     'digital storage': 'binary9.png',
 }
 DEFAULT_ICON = 'ruler9.png'
+CALCULATOR_ICON = 'calculator63.png'
 
 ANNOTATION_REPLACEMENTS = {
     'litre': ('liter', 'liters', 'l'),
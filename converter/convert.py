@@ -9,18 +9,19 @@ import collections
 import decimal
 import fractions
 import functools
-import os
+import math
 import re
+import sys
 import typing
 from xml.etree import cElementTree as ET
 
-from . import constants, safe_math
+from . import constants, safe_math, settings, trace
 from .utils import (
     parse_quantity,
     fraction_to_decimal,
-    get_env_flag,
     decimal_to_string,
     fraction_to_string,
+    fraction_to_strings,
 )
 
 infinity = decimal.Decimal('inf')
@@ -70,19 +71,31 @@ def get_texts(parent, name):
 
 
 def get_color_prefix():
-    backcolor = os.environ.get('alfred_theme_background', '')
-    if backcolor.startswith('rgba'):  # pragma: no cover
-        # Format: 'rgba(r,g,b,a)'
-        channel = backcolor[5:-1].split(',')
-        red, green, blue = channel[:3]
-        # Reference: stackoverflow.com/questions/9780632/
-        grey = 0.2126 * int(red) + 0.7152 * int(green) + 0.0722 * int(blue)
-        if grey < 128:
-            return 'inv-'
-        else:
-            return ''
-    else:
-        return ''
+    return settings.current().color_prefix
+
+
+# Light and dark theme paths for every icon a result can get, indexed by
+# whether a color prefix is in use
+ICON_PATHS = {
+    icon: (f'icons/{icon}', f'icons/inv-{icon}')
+    for icon in {
+        *constants.ICONS.values(),
+        constants.DEFAULT_ICON,
+        constants.CALCULATOR_ICON,
+    }
+}
+
+
+def icon_path(icon, color_prefix):
+    return ICON_PATHS[icon][1 if color_prefix else 0]
+
+
+def quantity_types_icon(quantity_types):
+    # In ICONS order, so units with several icons always get the same one
+    for quantity_type, icon in constants.ICONS.items():
+        if quantity_type in quantity_types:
+            return icon
+    return None
 
 
 class Units(object):
@@ -93,6 +106,35 @@ class Units(object):
         self.ids = {}
         self.base_units = {}
         self.quantity_types = collections.defaultdict(set)
+        # Equal values shared between units while loading, see `shared`
+        self._shared = {}
+
+    def shared(self, key, value=None):
+        '''Return the value registered for `key`, registering `value`
+        (or `key` itself) if there is none yet
+
+        Thousands of units carry the same strings, quantity type sets and
+        conversion parameters, so sharing them keeps the registry and its
+        pickle small.
+        '''
+        if isinstance(key, str):
+            return sys.intern(key)
+        if value is None:
+            value = key
+        return self._shared.setdefault(key, value)
+
+    def shared_params(self, a, b, c, d) -> ConversionParams:
+        # Keyed by the strings, Decimal('1') and Decimal('1.0') are equal
+        # but format differently
+        key = tuple(str(value) for value in (a, b, c, d))
+        params = self._shared.get(key)
+        if params is None:
+            decimals = [
+                self.shared(('decimal', value), decimal.Decimal(value))
+                for value in key
+            ]
+            params = self._shared[key] = ConversionParams(*decimals)
+        return params
 
     def get_converter(
         self, elem
@@ -179,13 +221,16 @@ class Units(object):
 
         extra_units.register_post(self)
         self.cache_version = constants.UNITS_CACHE_VERSION
+        # Not needed once loaded, and would only bloat the pickle
+        self._shared = {}
 
     def convert(self, query):
         '''Convert a query to a list of units with quantities
 
         :rtype: list of (Unit, decimal.Decimal, Unit)
         '''
-        query = safe_math.pre_calculate(query)
+        with trace.stage('pre_calculate'):
+            query = safe_math.pre_calculate(query)
         match = constants.FULL_RE.match(query)
         source_match = constants.SOURCE_RE.match(query)
 
@@ -252,15 +297,30 @@ class Units(object):
 
 
 class Unit:
+    __slots__ = (
+        'units',
+        'id',
+        'name',
+        'fractional',
+        'split',
+        'annotations',
+        'quantity_types',
+        'base_unit',
+        'conversion_params',
+        'icon',
+    )
+
     units: Units
     id: str
     name: str
     fractional: bool
     split: typing.Optional[str]
-    annotations: typing.Set[str]
-    quantity_types: typing.Set[str]
+    annotations: typing.FrozenSet[str]
+    quantity_types: typing.FrozenSet[str]
     base_unit: typing.Optional[str]
     conversion_params: ConversionParams
+    # Icon file name, resolved once when the registry is built
+    icon: typing.Optional[str]
 
     def __init__(
         self,
@@ -277,8 +337,8 @@ class Unit:
         split: typing.Optional[str] = None,
     ):
         self.units = units
-        self.id = id
-        self.name = name
+        self.id = units.shared(id)
+        self.name = units.shared(name)
         self.fractional = fractional
         self.split = split
 
@@ -289,15 +349,20 @@ class Unit:
                 elif k in id:
                     annotations.append(id.replace(k, v))
 
-        self.annotations = set(annotations)
-        self.quantity_types = set(quantity_types)
-        self.base_unit = base_unit
+        self.annotations = frozenset(
+            units.shared(annotation) for annotation in annotations
+        )
+        self.quantity_types = units.shared(frozenset(
+            units.shared(quantity_type) for quantity_type in quantity_types
+        ))
+        self.base_unit = base_unit and units.shared(base_unit)
+        self.icon = quantity_types_icon(self.quantity_types)
 
-        self.conversion_params = ConversionParams.create(*conversion_params)
+        self.conversion_params = units.shared_params(*conversion_params)
 
-    def is_blacklisted(self):
-        blacklisted = os.environ.get('UNITS_BLACKLIST', '').lower().strip()
-        return set(self.name.lower().split()) & set(blacklisted.split())
+    def is_blacklisted(self, config=None):
+        config = config or settings.current()
+        return self.id in config.blacklisted_ids(self.units)
 
     def copy(self, id: str, conversion_params, **kwargs):  # pragma: no cover
         data = dict(
@@ -316,10 +381,12 @@ class Unit:
         ))
         return Unit(**data)  # type: ignore
 
-    def get_icon(self):
-        for quantity_type in self.quantity_types:  # pragma: no cover
-            if quantity_type in constants.ICONS:
-                return get_color_prefix() + constants.ICONS[quantity_type]
+    def get_icon(self, color_prefix=None):
+        if self.icon is None:
+            return None
+        if color_prefix is None:
+            color_prefix = get_color_prefix()
+        return color_prefix + self.icon
 
     def matches_token(self, token):
         token = token.lower()
@@ -352,7 +419,7 @@ class Unit:
 
         for annotation in self.annotations:
             units.annotations[annotation] = self
-            units.lower_annotations[annotation.lower()] = self
+            units.lower_annotations[units.shared(annotation.lower())] = self
 
         for quantity_type in list(self.quantity_types):
             units.quantity_types[quantity_type].add(self)
@@ -375,7 +442,7 @@ class Unit:
             return tos
 
     def __repr__(self):
-        data = self.__dict__.copy()
+        data = {name: getattr(self, name) for name in self.__slots__}
         data['units'] = '...'
         data['annotations'] = '...'
         return f'<{self.__class__.__name__} {data!r}>'
@@ -441,12 +508,12 @@ def clean_query(query):
 
 def get_units_left():
     '''Whether the place the units on the right or the left of the value'''
-    return os.environ.get('UNITS_SIDE', '').lower() == 'left'
+    return settings.current().units_left
 
 
 def get_max_magnitude():
     '''Return the maximum order of magnitude difference between units'''
-    return int(os.environ.get('MAX_MAGNITUDE', '3'), 10)
+    return settings.current().max_magnitude
 
 
 def swap_unit(left, unit, *values):
@@ -457,6 +524,10 @@ def swap_unit(left, unit, *values):
 
 
 def change_decimal(function):
+    if constants.DECIMAL_SEPARATOR == '.':
+        # Nothing to replace, so skip copying the keyword arguments
+        return function
+
     @functools.wraps(function)
     def _change_decimal(*args, **kwargs):
         for k, v in list(kwargs.items()):
@@ -468,7 +539,41 @@ def change_decimal(function):
     return _change_decimal
 
 
-def sort_abs_magnitude(result):
+# Float magnitudes are accurate to about 1e-15, so differences closer than
+# this to MAX_MAGNITUDE are decided with Decimal.log10() instead
+MAGNITUDE_TOLERANCE = 1e-9
+
+
+def magnitude(value: decimal.Decimal) -> float:
+    '''The base 10 logarithm of abs(value), like Decimal.log10() but as a
+    float, which is a lot cheaper to compute
+
+    >>> magnitude(decimal.Decimal('1000'))
+    3.0
+    >>> magnitude(decimal.Decimal('-0.5')) == math.log10(0.5)
+    True
+    >>> magnitude(decimal.Decimal('2E+400')) == 400 + math.log10(2)
+    True
+    >>> magnitude(decimal.Decimal(0))
+    -inf
+    '''
+    number = abs(float(value))
+    if 1e-300 < number < 1e300:
+        return math.log10(number)
+    if value.is_nan():
+        return math.nan
+    if value.is_zero():
+        return -math.inf
+    if value.is_infinite():
+        return math.inf
+
+    # Beyond the float range: split into exponent and mantissa
+    exponent = value.adjusted()
+    mantissa = value.copy_abs().scaleb(-exponent)
+    return exponent + math.log10(float(mantissa))
+
+
+def sort_abs_magnitude(result, exact=False):
     from_, quantity, to = result
 
     if not from_ or not to or from_ == to:
@@ -487,14 +592,16 @@ def sort_abs_magnitude(result):
     if abs_decimal_value.is_zero():
         return infinity
 
-    return abs(abs_decimal_value.log10())
+    if exact:
+        return abs(abs_decimal_value.log10())
+    return abs(magnitude(abs_decimal_value))
 
 
 def unit_matches_token(unit, token):
     return unit.matches_token(token)
 
 
-def sort_explicit_target(result, target_token):
+def sort_explicit_target(result, target_token, exact=False):
     from_, _, to = result
     target_matches_to = to and unit_matches_token(to, target_token)
     target_matches_from = from_ and unit_matches_token(from_, target_token)
@@ -503,46 +610,100 @@ def sort_explicit_target(result, target_token):
     return (
         not target_matches_to,
         not requested_identity,
-        sort_abs_magnitude(result),
+        sort_abs_magnitude(result, exact),
     )
 
 
-def main(units: Units, query: str, create_item):
-    create_item = change_decimal(create_item)
-    query = clean_query(query)
-    left = get_units_left()
-    max_magnitude = get_max_magnitude()
-
-    results = list(units.convert(query))
-    match = constants.FULL_RE.match(query)
-    if match:
-        target_token = match.group('to')
-        sort_key = functools.partial(
-            sort_explicit_target, target_token=target_token
-        )
-    else:
-        sort_key = sort_abs_magnitude
-    results.sort(key=sort_key)
-    for from_, quantity, to in results:
-        if to and to.is_blacklisted():  # pragma: no cover
+def _near_keys(a, b):
+    if not isinstance(a, tuple):
+        a, b = (a,), (b,)
+    return a[:-1] == b[:-1] and (
+        a[-1] == b[-1]
+        or abs(float(a[-1]) - float(b[-1])) < MAGNITUDE_TOLERANCE
+    )
+
+
+def sort_results(results, sort_key):
+    '''Sort `results` as `sort_key(result, exact=True)` would, but only
+    compute the exact Decimal.log10() magnitudes for near ties
+
+    Float magnitudes can order nearly equal values differently, 5/6 and 6/5
+    for example, so runs of near ties are sorted again with the exact key.
+    '''
+    keys = [sort_key(result) for result in results]
+    order = sorted(range(len(results)), key=keys.__getitem__)
+
+    start = 0
+    for end in range(1, len(order) + 1):
+        if end < len(order) and _near_keys(
+            keys[order[end - 1]], keys[order[end]]
+        ):
             continue
+        if end - start > 1:
+            order[start:end] = sorted(
+                order[start:end],
+                key=lambda index: (
+                    sort_key(results[index], exact=True), index
+                ),
+            )
+        start = end
+
+    return [results[index] for index in order]
+
 
-        if from_:
-            yield from format_units(
-                create_item, from_, left, max_magnitude, quantity, to, units
+def main(units: Units, query: str, create_item, config=None):
+    # The environment is read once per query, not once per result
+    config = config or settings.current()
+    create_item = change_decimal(create_item)
+    with trace.stage('clean_query'):
+        query = clean_query(query)
+    left = config.units_left
+    max_magnitude = config.max_magnitude
+    blacklisted = config.blacklisted_ids(units)
+
+    with trace.stage('convert') as fields:
+        results = list(units.convert(query))
+        fields['results'] = len(results)
+    with trace.stage('sort'):
+        match = constants.FULL_RE.match(query)
+        if match:
+            target_token = match.group('to')
+            sort_key = functools.partial(
+                sort_explicit_target, target_token=target_token
             )
         else:
-            yield from format_number(create_item, quantity)
+            sort_key = sort_abs_magnitude
+        results = sort_results(results, sort_key)
+    for from_, quantity, to in results:
+        if to and to.id in blacklisted:
+            continue
 
+        # Timed per result without the time spent by the consumer
+        with trace.stage('format'):
+            if from_:
+                items = list(format_units(
+                    create_item, from_, left, max_magnitude, quantity, to,
+                    units, color_prefix=config.color_prefix,
+                ))
+            else:
+                items = list(format_number(create_item, quantity, config))
+        yield from items
 
-def format_number(create_item, quantity):
+
+_CALCULATOR_SUBTITLE = (
+    'Action this item to copy the %s value to the clipboard'
+)
+_CONVERTED_SUBTITLE = _CALCULATOR_SUBTITLE % 'converted'
+
+
+def format_number(create_item, quantity, config=None):
+    config = config or settings.current()
     q_str = decimal_to_string(quantity)
+    icon = icon_path(constants.CALCULATOR_ICON, config.color_prefix)
     yield create_item(
         title=f'{q_str}',
-        subtitle=(
-            'Action this item to copy the converted value to ' 'the clipboard'
-        ),
-        icon=f'icons/{get_color_prefix()}calculator63.png',
+        subtitle=_CONVERTED_SUBTITLE,
+        icon=icon,
         attrib=dict(
             uid=q_str,
             arg=q_str,
@@ -552,52 +713,22 @@ def format_number(create_item, quantity):
     if q_str.isdigit() or (q_str[0] == '-' and q_str[1:].isdigit()):
         quantity = int(quantity)
 
-        bases = {k: get_env_flag('BASE_%d' % k) for k in (2, 8, 16)}
-
-        if bases[16]:  # pragma: no branch
-            q_hex = hex(quantity)
-            yield create_item(
-                title=f'{q_hex}',
-                subtitle=(
-                    'Action this item to copy the HEX '
-                    'value to the clipboard'
-                ),
-                icon=f'icons/{get_color_prefix()}calculator63.png',
-                attrib=dict(
-                    uid=q_hex,
-                    arg=q_hex,
-                    valid='yes',
-                ),
-            )
-
-        if bases[8]:  # pragma: no branch
-            q_oct = oct(quantity)
-            yield create_item(
-                title=f'{q_oct}',
-                subtitle=(
-                    'Action this item to copy the OCT '
-                    'value to the clipboard'
-                ),
-                icon=f'icons/{get_color_prefix()}calculator63.png',
-                attrib=dict(
-                    uid=q_oct,
-                    arg=q_oct,
-                    valid='yes',
-                ),
-            )
+        for base, label, to_string in (
+            (16, 'HEX', hex),
+            (8, 'OCT', oct),
+            (2, 'BIN', bin),
+        ):
+            if base not in config.bases:  # pragma: no cover
+                continue
 
-        if bases[2]:  # pragma: no branch
-            q_bin = bin(quantity)
+            value = to_string(quantity)
             yield create_item(
-                title=f'{q_bin}',
-                subtitle=(
-                    'Action this item to copy the BIN '
-                    'value to the clipboard'
-                ),
-                icon=f'icons/{get_color_prefix()}calculator63.png',
+                title=value,
+                subtitle=_CALCULATOR_SUBTITLE % label,
+                icon=icon,
                 attrib=dict(
-                    uid=q_bin,
-                    arg=q_bin,
+                    uid=value,
+                    arg=value,
                     valid='yes',
                 ),
             )
@@ -618,10 +749,11 @@ def format_units(
     to: Unit,
     units: Units,
     fractional: bool = True,
+    color_prefix: typing.Optional[str] = None,
 ):
     base_quantity: _FractionDecimalStr = from_.to_base(quantity)
     new_quantity: _FractionDecimalStr = to.from_base(base_quantity)
-    magnitude: decimal.Decimal = quantity.copy_abs().log10()
+    quantity_magnitude = magnitude(quantity)
     str_quantity = decimal_to_string(quantity)
 
     title_parts = []
@@ -630,35 +762,37 @@ def format_units(
         base_quantity = decimal_to_string(base_quantity)
 
     if to.fractional:
-        new_magnitude = fraction_to_decimal(new_quantity).copy_abs().log10()
+        new_decimal = fraction_to_decimal(new_quantity)
+        new_magnitude = magnitude(new_decimal)
 
         if fractional:
-            title_parts.append(
-                (decimal_to_string(fraction_to_decimal(new_quantity)),)
-            )
+            title_parts.append((decimal_to_string(new_decimal),))
 
-            new_quantity_proper = fraction_to_string(new_quantity, True)
+            fraction, new_quantity_proper = fraction_to_strings(new_quantity)
             if new_quantity_proper:
                 title_parts.append((new_quantity_proper,))
 
-            fraction = fraction_to_string(new_quantity)
             if fraction:
                 title_parts.append((fraction,))
                 new_quantity = fraction
 
     elif isinstance(new_quantity, decimal.Decimal):
-        new_magnitude = new_quantity.copy_abs().log10()
+        new_decimal = new_quantity
+        new_magnitude = magnitude(new_quantity)
         new_quantity = decimal_to_string(new_quantity)
         title_parts.append((new_quantity,))
         new_quantity_proper = None
     else:
         raise TypeError('Unknown type %r' % type(new_quantity))
 
-    if (
-        magnitude not in {infinity, -infinity}
-        and abs(magnitude - new_magnitude) > max_magnitude
-    ):
-        return
+    if not math.isinf(quantity_magnitude):
+        difference = abs(quantity_magnitude - new_magnitude)
+        if abs(difference - max_magnitude) < MAGNITUDE_TOLERANCE:
+            difference = abs(
+                quantity.copy_abs().log10() - new_decimal.copy_abs().log10()
+            )
+        if difference > max_magnitude:
+            return
 
     if to.split:
         title_parts += _get_split_unit_title_parts(units, to, base_quantity)
@@ -667,7 +801,9 @@ def format_units(
         to_title(left, from_, str_quantity, to, *title_part)
         for title_part in title_parts
     ]
-    yield from create_items(create_item, from_, new_quantity, titles, to)
+    yield from create_items(
+        create_item, from_, new_quantity, titles, to, color_prefix
+    )
 
 
 def _get_split_unit_title_parts(units, to, base_quantity):
@@ -693,23 +829,25 @@ def _get_split_unit_title_parts(units, to, base_quantity):
     return title_parts
 
 
-def create_items(create_item, from_, new_quantity, titles, to):
-    item = dict(
-        subtitle=(
-            'Action this item to copy the converted value ' 'to the clipboard'
-        ),
-        icon='icons/'
-        + (
-            to.get_icon()
-            or from_.get_icon()
-            or get_color_prefix() + constants.DEFAULT_ICON
-        ),
-        attrib=dict(
-            uid=f'{from_.id} to {to.id}',
-            arg=new_quantity,
-            valid='yes',
-            autocomplete=f'{new_quantity} {to}',
-        ),
+def create_items(
+    create_item, from_, new_quantity, titles, to, color_prefix=None
+):
+    if color_prefix is None:
+        color_prefix = get_color_prefix()
+    icon = icon_path(
+        to.icon or from_.icon or constants.DEFAULT_ICON, color_prefix
+    )
+    # Every title shares the same attributes, so build them once
+    attrib = dict(
+        uid=f'{from_.id} to {to.id}',
+        arg=new_quantity,
+        valid='yes',
+        autocomplete=f'{new_quantity} {to}',
     )
     for title in titles:
-        yield create_item(title=title, **item)
+        yield create_item(
+            title=title,
+            subtitle=_CONVERTED_SUBTITLE,
+            icon=icon,
+            attrib=attrib,
+        )
@@ -0,0 +1,212 @@
+'''Reproducible query corpora generated from the unit registry
+
+Run ``python -m converter.corpus [--size N] [--seed S] [--keystrokes]`` to
+print a corpus, one query per line. The same registry, size and seed always
+give the same queries, so benchmark and cache runs can be compared.
+'''
+import argparse
+import random
+import sys
+
+from . import constants, convert, currency
+
+# Rough share of each query kind in real keystroke traffic
+WEIGHTS = {
+    'unit': 40,
+    'unit_target': 25,
+    'spelling': 10,
+    'math': 8,
+    'percentage': 5,
+    'feet_inch': 4,
+    'number_base': 3,
+    'currency': 5,
+}
+CURRENCY_CONNECTORS = ('', 'to ', 'in ')
+PERCENTAGE_TEMPLATES = (
+    '{a}% of {b}',
+    '{a} + {b}%',
+    '{a} - {b}%',
+    '{a}% off {b}',
+    '{a} percentage of {b}',
+    '{a} to {b}',
+)
+MATH_TEMPLATES = (
+    '{a} + {b}',
+    '{a} * {b} - {c}',
+    '({a} + {b}) / {c}',
+    '{a}^2',
+    'sqrt({a})',
+    '{a} * pi',
+    'cos(pi / {c})',
+    'ln(e^{c})',
+)
+FEET_INCH_TEMPLATES = (
+    "{c}'",
+    "{c}'{d}\"",
+    '{d}"',
+    '{a} in in ft',
+    '{a} cm in ft',
+    '{c} ft {d} in',
+)
+
+
+def random_amount(rng):
+    # Mostly small whole numbers, like people type them
+    kind = rng.random()
+    if kind < 0.6:
+        return str(rng.randint(1, 100))
+    if kind < 0.9:
+        return f'{rng.uniform(0, 1000):.{rng.randint(1, 3)}f}'
+    return str(rng.randint(1, 10 ** 6))
+
+
+def _unit_names(unit):
+    return sorted({unit.id, unit.name, *unit.annotations})
+
+
+def _related_units(units, unit):
+    related = set()
+    for quantity_type in unit.quantity_types:
+        related |= units.quantity_types.get(quantity_type, set())
+    related.discard(unit)
+    return sorted(related, key=lambda related_unit: related_unit.id)
+
+
+def unit_queries(units, rng):
+    for annotation in sorted(units.annotations):
+        yield f'{random_amount(rng)} {annotation}'
+
+
+def unit_target_queries(units, rng):
+    for unit in sorted(units.units.values(), key=lambda unit: unit.id):
+        related = _related_units(units, unit)
+        if not related:
+            continue
+        source = rng.choice(_unit_names(unit))
+        target = rng.choice(_unit_names(rng.choice(related)))
+        connector = rng.choice(('in', 'to', 'as', ''))
+        yield ' '.join(filter(None, (
+            random_amount(rng), source, connector, target,
+        )))
+
+
+def spelling_queries(units, rng):
+    for spellings in constants.ANNOTATION_REPLACEMENTS.values():
+        for spelling in spellings:
+            yield f'{random_amount(rng)} {spelling}'
+
+
+def _templated(templates, rng, count):
+    for index in range(count):
+        template = templates[index % len(templates)]
+        yield template.format(
+            a=random_amount(rng),
+            b=random_amount(rng),
+            c=rng.randint(1, 12),
+            d=rng.randint(0, 11),
+        )
+
+
+def math_queries(units, rng, count=200):
+    return _templated(MATH_TEMPLATES, rng, count)
+
+
+def percentage_queries(units, rng, count=120):
+    return _templated(PERCENTAGE_TEMPLATES, rng, count)
+
+
+def feet_inch_queries(units, rng, count=120):
+    return _templated(FEET_INCH_TEMPLATES, rng, count)
+
+
+def number_base_queries(units, rng, count=100):
+    for _ in range(count):
+        yield (
+            f'{hex(rng.randint(0, 4096))} + {oct(rng.randint(0, 512))} '
+            f'- {bin(rng.randint(0, 64))}'
+        )
+
+
+def currency_queries(units, rng):
+    codes = sorted(currency.CURRENCY_CODES)
+    for source in codes:
+        target = rng.choice(codes)
+        connector = rng.choice(CURRENCY_CONNECTORS)
+        yield f'{random_amount(rng)} {source} {connector}{target}'
+        # Short queries fall back to the default targets
+        yield f'{random_amount(rng)} {source}'
+
+
+GENERATORS = {
+    'unit': unit_queries,
+    'unit_target': unit_target_queries,
+    'spelling': spelling_queries,
+    'math': math_queries,
+    'percentage': percentage_queries,
+    'feet_inch': feet_inch_queries,
+    'number_base': number_base_queries,
+    'currency': currency_queries,
+}
+
+
+def categories(units, seed=0):
+    '''Every generated query, grouped by kind'''
+    rng = random.Random(seed)
+    return {
+        name: list(generator(units, rng))
+        for name, generator in GENERATORS.items()
+    }
+
+
+def keystrokes(query):
+    '''The queries Alfred runs while `query` is being typed'''
+    for end in range(1, len(query) + 1):
+        prefix = query[:end]
+        if not prefix.endswith(' '):
+            yield prefix
+
+
+def generate(units, size=1000, seed=0, weights=None, typed=False):
+    '''Sample `size` queries with the traffic mix from `weights`
+
+    With `typed` every sampled query is expanded to its keystrokes, so the
+    result is longer than `size`.
+    '''
+    weights = weights or WEIGHTS
+    pools = categories(units, seed)
+    names = [name for name in sorted(weights) if pools.get(name)]
+    rng = random.Random(seed)
+    kinds = rng.choices(
+        names, weights=[weights[name] for name in names], k=size
+    )
+
+    queries = []
+    for kind in kinds:
+        query = rng.choice(pools[kind])
+        if typed:
+            queries.extend(keystrokes(query))
+        else:
+            queries.append(query)
+    return queries
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m converter.corpus')
+    parser.add_argument('--size', type=int, default=1000)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument(
+        '--keystrokes',
+        action='store_true',
+        help='expand every query to the prefixes typed along the way',
+    )
+    args = parser.parse_args(argv)
+
+    units = convert.Units()
+    units.load(constants.UNITS_XML_FILE)
+    for query in generate(units, args.size, args.seed, typed=args.keystrokes):
+        sys.stdout.write(query + '\n')
+    return 0
+
+
+if __name__ == '__main__':  # pragma: no cover
+    raise SystemExit(main())
@@ -4,19 +4,27 @@ import contextlib
 import datetime as dt
 import decimal
 import fcntl
+import functools
+import gzip
 import json
+import math
 import os
+import queue
 import re
+import sqlite3
 import stat
 import subprocess
 import sys
 import tempfile
+import threading
 import typing
+import urllib.error
 import urllib.request
 import uuid
-from dataclasses import dataclass
+import zlib
+from dataclasses import dataclass, field, replace
 
-from . import output
+from . import output, settings, store, trace
 
 CURRENCY_CODES = frozenset("""
     aed afn all amd ang aoa ars aud awg azn bam bbd bdt bgn bhd bif bmd bnd
@@ -35,17 +43,24 @@ CURRENCY_QUERY_RE = re.compile(
     r"^\s*(?P<amount>[+-]?(?:\d+(?:[.,]\d*)?|[.,]\d+))\s+"
     r"(?P<source>[a-zA-Z]{3})"
     r"(?:\s+(?:to|in|as))?\s+"
-    r"(?P<target>[a-zA-Z]{3})\s*$"
+    r"(?P<target>[a-zA-Z]{3})"
+    r"(?:\s+@(?P<on>\d{4}-\d{2}-\d{2}))?\s*$"
 )
 DEFAULT_CURRENCY_QUERY_RE = re.compile(
     r"^\s*(?P<amount>[+-]?(?:\d+(?:[.,]\d*)?|[.,]\d+))\s+"
-    r"(?P<source>[a-zA-Z]{3})\s*$"
+    r"(?P<source>[a-zA-Z]{3})"
+    r"(?:\s+@(?P<on>\d{4}-\d{2}-\d{2}))?\s*$"
 )
 
 DECIMAL_COMMA_RE = re.compile(r"^[+-]?(?:\d+,\d{1,2}|,\d+)$")
 UPDATE_RE = re.compile(r"^\s*currency-update(?:\s+(?P<base>[a-zA-Z]{3}))?\s*$")
 DEFAULT_TARGETS_ENV = "CURRENCY_DEFAULT_TARGETS"
 DEFAULT_TARGETS = ("usd", "eur", "gbp", "jpy", "cny", "cad", "aud")
+BULK_REFRESH_ENV = "CURRENCY_BULK_REFRESH"
+REFERENCE_BASE = "eur"
+PREFETCH_USAGE_WINDOW = dt.timedelta(days=7)
+PREFETCH_OFFSET = dt.timedelta(minutes=1)
+HISTORY_FILENAME = "history.sqlite3"
 CURRENCY_NAMES = {
     "aed": "United Arab Emirates Dirham",
     "afn": "Afghan Afghani",
@@ -430,12 +445,23 @@ PRIMARY_URL = (
 FALLBACK_URL = (
     "https://latest.currency-api.pages.dev/v1/currencies/{currency}.json"
 )
+VALIDATOR_HEADERS = (
+    ("ETag", "etag"),
+    ("Last-Modified", "last_modified"),
+)
+REQUEST_TIMEOUT = 10
+HEDGE_DELAY_ENV = "CURRENCY_HEDGE_DELAY"
+DEFAULT_HEDGE_DELAY = 1.0
 DEFAULT_LOCK_STALE_AFTER = dt.timedelta(minutes=10)
 LOCK_TOKEN_ENV = "ALFRED_CONVERTER_CURRENCY_LOCK_TOKEN"
 LOCK_TOKEN_RE = re.compile(r"^[0-9a-f]{32}$")
+LOCK_BACKEND_ENV = "CURRENCY_LOCK_BACKEND"
+LOCK_BACKEND_DIRECTORY = "directory"
+LOCK_BACKEND_FLOCK = "flock"
 BACKGROUND_REFRESH_STARTED = "started"
 BACKGROUND_REFRESH_ALREADY_RUNNING = "already_running"
 BACKGROUND_REFRESH_FAILED = "failed"
+_UNREAD = object()
 
 
 @dataclass(frozen=True)
@@ -443,6 +469,8 @@ class CurrencyQuery:
     amount: decimal.Decimal
     source: str
     target: str
+    # Historical queries ("@YYYY-MM-DD") use the rate history instead
+    on: typing.Optional[dt.date] = None
 
 
 @dataclass(frozen=True)
@@ -450,6 +478,7 @@ class DefaultQuery:
     amount: decimal.Decimal
     source: str
     targets: typing.Tuple[str, ...]
+    on: typing.Optional[dt.date] = None
 
 
 @dataclass(frozen=True)
@@ -458,12 +487,23 @@ class RateCache:
     date: dt.date
     fetched_at: dt.date
     rates: typing.Dict[str, decimal.Decimal]
+    # HTTP cache validators (ETag / Last-Modified) per provider URL
+    validators: typing.Dict[str, typing.Dict[str, str]] = field(
+        default_factory=dict,
+    )
 
     def is_fresh(self, today=None):
         today = today or dt.date.today()
         return self.fetched_at >= today
 
 
+@dataclass(frozen=True)
+class ProviderResponse:
+    # `data` is None when the provider answered 304 Not Modified
+    data: typing.Any
+    validators: typing.Dict[str, str] = field(default_factory=dict)
+
+
 @dataclass
 class RefreshLock:
     path: str
@@ -485,6 +525,24 @@ class RefreshLock:
             self.acquired = False
 
 
+@dataclass
+class FlockRefreshLock:
+    # The kernel drops the flock when the last descriptor closes, including
+    # on process death, so this backend never has stale locks to scan for.
+    path: str
+    acquired: bool
+    fd: typing.Optional[int] = None
+    token: typing.Optional[str] = None
+
+    def release(self):
+        if self.acquired:
+            # Closing our descriptor keeps the lock held while a child
+            # process still has an inherited copy of it.
+            os.close(self.fd)
+            self.fd = None
+            self.acquired = False
+
+
 @dataclass(frozen=True)
 class _StaleLockCleanup:
     is_directory: bool
@@ -515,6 +573,13 @@ def _parse_amount(match):
     return decimal.Decimal(amount_text.replace(",", "."))
 
 
+def _parse_on(match):
+    on_text = match.group("on")
+    if on_text is None:
+        return None
+    return dt.date.fromisoformat(on_text)
+
+
 def parse_query(query):
     match = CURRENCY_QUERY_RE.match(query)
     if not match:
@@ -528,15 +593,18 @@ def parse_query(query):
     amount = _parse_amount(match)
     if amount is None:
         return None
-    return CurrencyQuery(amount=amount, source=source, target=target)
+    try:
+        on = _parse_on(match)
+    except ValueError:
+        return None
+    return CurrencyQuery(amount=amount, source=source, target=target, on=on)
 
 
-def default_targets(source):
-    configured = os.environ.get(DEFAULT_TARGETS_ENV)
-    if configured is None:
+def default_targets(source, config=None):
+    config = config or settings.current()
+    candidates = config.currency_targets
+    if candidates is None:
         candidates = DEFAULT_TARGETS
-    else:
-        candidates = re.split(r"[\s,]+", configured.strip())
 
     targets = []
     seen = set()
@@ -566,10 +634,15 @@ def parse_default_query(query):
     amount = _parse_amount(match)
     if amount is None:
         return None
+    try:
+        on = _parse_on(match)
+    except ValueError:
+        return None
     return DefaultQuery(
         amount=amount,
         source=source,
         targets=default_targets(source),
+        on=on,
     )
 
 
@@ -758,19 +831,74 @@ def unavailable_response(base):
     )
 
 
+def history_unavailable_response(base, on):
+    return output.Response(
+        items=[
+            output.Item(
+                title="Currency rates unavailable",
+                subtitle=(
+                    f"No {base.upper()} rate history on or before "
+                    f"{on.isoformat()}."
+                ),
+                valid=False,
+                icon="icons/dollars17.png",
+            )
+        ],
+        skipknowledge=True,
+    )
+
+
+def _historical_response(base_dir, query):
+    # History lookups are offline only: no usage tracking or refreshes
+    cache = read_history_cache(
+        base_dir,
+        query.source,
+        query.on,
+        targets=_query_targets(query),
+    )
+    if cache is None:
+        return history_unavailable_response(query.source, query.on)
+    if isinstance(query, DefaultQuery):
+        return _default_conversion_response(query, cache)
+    return _conversion_response(query, cache)
+
+
+def _query_targets(query):
+    if isinstance(query, DefaultQuery):
+        return query.targets
+    return (query.target,)
+
+
 def convert_query(base_dir, query_text, today=None):
     query = parse_query(query_text) or parse_default_query(query_text)
     if query is None:
         return None
+    if query.on is not None:
+        return _historical_response(base_dir, query)
+
+    today = today or dt.date.today()
+    record_usage(base_dir, query.source, today)
+    with trace.stage("rate_cache") as fields:
+        cache = read_rate_cache(base_dir, query.source)
+        fields["hit"] = cache is not None and cache.is_fresh(today)
+        if cache is None or not cache.is_fresh(today):
+            cross_cache = read_cross_rate_cache(
+                base_dir,
+                query.source,
+                targets=_query_targets(query),
+                today=today,
+                source_cache=cache,
+            )
+            if cross_cache is not None:
+                cache = cross_cache
+                fields["cross_rate"] = True
 
-    cache = read_rate_cache(base_dir, query.source)
     if cache is None:
         status = start_background_refresh_status(base_dir, query.source)
         if status == BACKGROUND_REFRESH_FAILED:
             return unavailable_response(query.source)
         return updating_response(query.source)
 
-    today = today or dt.date.today()
     if cache.is_fresh(today):
         if isinstance(query, DefaultQuery):
             return _default_conversion_response(query, cache, stale=False)
@@ -1110,8 +1238,40 @@ def _new_lock(path):
     return RefreshLock(path=path, acquired=True, token=token)
 
 
+def lock_backend():
+    value = os.environ.get(LOCK_BACKEND_ENV, "").strip().lower()
+    if value == LOCK_BACKEND_FLOCK:
+        return LOCK_BACKEND_FLOCK
+    return LOCK_BACKEND_DIRECTORY
+
+
+def _flock_path(base_dir, base):
+    return os.path.join(
+        cache_root(base_dir),
+        "locks",
+        f"{normalize_base(base)}.flock",
+    )
+
+
+def acquire_flock_refresh_lock(base_dir, base):
+    path = _flock_path(base_dir, base)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    fd = os.open(path, os.O_CREAT | os.O_RDWR, 0o600)
+    try:
+        fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except BlockingIOError:
+        os.close(fd)
+        return FlockRefreshLock(path=path, acquired=False)
+    except BaseException:
+        os.close(fd)
+        raise
+    return FlockRefreshLock(path=path, acquired=True, fd=fd)
+
+
 def acquire_refresh_lock(base_dir, base, stale_after=None):
     normalized_base = normalize_base(base)
+    if lock_backend() == LOCK_BACKEND_FLOCK:
+        return acquire_flock_refresh_lock(base_dir, normalized_base)
     if stale_after is None:
         stale_after = DEFAULT_LOCK_STALE_AFTER
     path = _lock_path(base_dir, normalized_base)
@@ -1132,13 +1292,62 @@ def acquire_refresh_lock(base_dir, base, stale_after=None):
             return RefreshLock(path=path, acquired=False)
 
 
-def _load_json_url(url, timeout=10):
-    request = urllib.request.Request(
-        url,
-        headers={"User-Agent": "alfred-converter/1"},
-    )
-    with urllib.request.urlopen(request, timeout=timeout) as response:
-        return json.loads(response.read().decode("utf-8"))
+def _response_validators(headers):
+    validators = {}
+    for header, key in VALIDATOR_HEADERS:
+        value = headers.get(header)
+        if value:
+            validators[key] = value
+    return validators
+
+
+def _decode_body(body, encoding):
+    encoding = (encoding or "identity").strip().lower()
+    try:
+        if encoding in {"gzip", "x-gzip"}:
+            return gzip.decompress(body)
+        if encoding == "deflate":
+            try:
+                return zlib.decompress(body)
+            except zlib.error:
+                # Some servers send raw deflate streams without a header
+                return zlib.decompress(body, -zlib.MAX_WBITS)
+    except zlib.error as error:
+        raise ValueError(f"invalid {encoding} response: {error}") from error
+    if encoding == "identity":
+        return body
+    raise ValueError(f"unsupported content encoding {encoding!r}")
+
+
+def _load_json_url(url, validators=None, timeout=REQUEST_TIMEOUT):
+    headers = {
+        "User-Agent": "alfred-converter/1",
+        "Accept-Encoding": "gzip, deflate",
+    }
+    validators = validators or {}
+    if validators.get("etag"):
+        headers["If-None-Match"] = validators["etag"]
+    if validators.get("last_modified"):
+        headers["If-Modified-Since"] = validators["last_modified"]
+
+    request = urllib.request.Request(url, headers=headers)
+    try:
+        with urllib.request.urlopen(request, timeout=timeout) as response:
+            body = _decode_body(
+                response.read(),
+                response.headers.get("Content-Encoding"),
+            )
+            return ProviderResponse(
+                data=json.loads(body.decode("utf-8")),
+                validators=_response_validators(response.headers),
+            )
+    except urllib.error.HTTPError as error:
+        if error.code != 304 or not validators:
+            raise
+        return ProviderResponse(
+            data=None,
+            validators=_response_validators(error.headers) or validators,
+        )
 
 
 def _rate_cache_from_payload(base, data):
@@ -1157,29 +1366,102 @@ def _rate_cache_from_payload(base, data):
     )
 
 
-def fetch_rates(base):
-    normalized_base = normalize_base(base)
-    errors = []
+def hedge_delay():
+    try:
+        delay = float(os.environ[HEDGE_DELAY_ENV])
+    except (KeyError, ValueError):
+        return DEFAULT_HEDGE_DELAY
+    if not math.isfinite(delay) or delay < 0:
+        return DEFAULT_HEDGE_DELAY
+    # Waiting longer than a request may take would never hedge anything
+    return min(delay, REQUEST_TIMEOUT)
+
+
+def _revalidated_rate_cache(url, previous, response):
+    if previous is None:
+        raise ValueError("provider returned not modified without a cache")
+    validators = dict(previous.validators)
+    validators[url] = response.validators
+    return replace(
+        previous,
+        fetched_at=dt.date.today(),
+        validators=validators,
+    )
+
+
+def _fetch_provider(url, base, previous, results):
+    try:
+        validators = previous.validators.get(url) if previous else None
+        response = _load_json_url(url, validators=validators)
+        if response.data is None:
+            cache = _revalidated_rate_cache(url, previous, response)
+        else:
+            cache = _rate_cache_from_payload(base, response.data)
+            if response.validators:
+                cache = replace(cache, validators={url: response.validators})
+        results.put((url, cache, None))
+    except Exception as error:
+        # Every outcome must be reported or fetch_rates would keep waiting
+        # on a worker that has already died.
+        results.put((url, None, error))
+
 
-    for pattern in (PRIMARY_URL, FALLBACK_URL):
-        url = pattern.format(currency=normalized_base)
+def fetch_rates(base, delay=None, previous=None):
+    normalized_base = normalize_base(base)
+    if delay is None:
+        delay = hedge_delay()
+    if previous is not None and previous.base != normalized_base:
+        previous = None
+
+    # The fallback is started when the primary fails or has not answered
+    # within `delay` seconds. The first valid table wins; requests that
+    # are still in flight run on daemon threads and their results are
+    # discarded.
+    urls = [
+        pattern.format(currency=normalized_base)
+        for pattern in (PRIMARY_URL, FALLBACK_URL)
+    ]
+    pending = list(urls)
+    results = queue.Queue()
+    errors = {}
+
+    def launch():
+        threading.Thread(
+            target=_fetch_provider,
+            args=(pending.pop(0), normalized_base, previous, results),
+            daemon=True,
+        ).start()
+
+    launch()
+    running = 1
+    while running:
         try:
-            data = _load_json_url(url)
-            return _rate_cache_from_payload(normalized_base, data)
-        except (
-            OSError, ValueError, KeyError, TypeError,
-            decimal.InvalidOperation,
-        ) as error:
-            errors.append(error)
+            url, cache, error = results.get(
+                timeout=delay if pending else None,
+            )
+        except queue.Empty:
+            launch()
+            running += 1
+            continue
+
+        running -= 1
+        if error is None:
+            return cache
+        errors[url] = error
+        if pending:
+            launch()
+            running += 1
 
+    # Report every provider in a fixed order, not in completion order
+    details = "; ".join(f"{url}: {errors[url]}" for url in urls)
     raise RuntimeError(
-        f"Unable to fetch rates for {normalized_base}: {errors[-1]}"
+        f"Unable to fetch rates for {normalized_base}: {details}"
     )
 
 
 def _refresh_rates_with_lock(base_dir, base, lock):
     try:
-        cache = fetch_rates(base)
+        cache = fetch_rates(base, previous=read_rate_cache(base_dir, base))
         write_rate_cache(base_dir, cache)
         return cache
     finally:
@@ -1199,7 +1481,57 @@ def refresh_rates(base_dir, base):
 
 def refresh_rates_with_existing_lock(base_dir, base, lock_path, token=None):
     normalized_base = normalize_base(base)
-    expected_path = os.path.abspath(_lock_path(base_dir, normalized_base))
+    lock = _existing_refresh_lock(base_dir, normalized_base, lock_path, token)
+    return _refresh_rates_with_lock(base_dir, normalized_base, lock)
+
+
+def bulk_refresh_enabled():
+    value = os.environ.get(BULK_REFRESH_ENV, "")
+    return value.lower() in {"true", "1", "yes", "t", "y"}
+
+
+def bulk_refresh_bases(reference=REFERENCE_BASE):
+    normalized_reference = normalize_base(reference)
+    return (normalized_reference,) + default_targets(normalized_reference)
+
+
+def _refresh_bases_with_lock(base_dir, reference, bases, lock):
+    try:
+        reference_cache = fetch_rates(
+            reference,
+            previous=read_rate_cache(base_dir, reference),
+        )
+        caches = [reference_cache]
+        for base in bases:
+            if base == reference:
+                continue
+            cache = derive_rate_cache(reference_cache, base)
+            if cache is not None:
+                caches.append(cache)
+        write_rate_caches(base_dir, caches)
+        return reference_cache
+    finally:
+        lock.release()
+
+
+def refresh_bases(base_dir, bases=None, reference=REFERENCE_BASE):
+    normalized_reference = normalize_base(reference)
+    if bases is None:
+        bases = bulk_refresh_bases(normalized_reference)
+    normalized_bases = tuple(normalize_base(base) for base in bases)
+    lock = acquire_refresh_lock(base_dir, normalized_reference)
+    if not lock.acquired:
+        return None
+    return _refresh_bases_with_lock(
+        base_dir,
+        normalized_reference,
+        normalized_bases,
+        lock,
+    )
+
+
+def _existing_refresh_lock(base_dir, base, lock_path, token):
+    expected_path = os.path.abspath(_lock_path(base_dir, base))
     actual_path = os.path.abspath(lock_path)
     if actual_path != expected_path:
         raise ValueError("invalid refresh lock path")
@@ -1207,26 +1539,162 @@ def refresh_rates_with_existing_lock(base_dir, base, lock_path, token=None):
         raise ValueError("missing refresh lock")
     if not _lock_token_matches(actual_path, token):
         raise ValueError("invalid refresh lock token")
-    lock = RefreshLock(path=actual_path, acquired=True, token=token)
+    return RefreshLock(path=actual_path, acquired=True, token=token)
+
+
+def _held_refresh_lock(base_dir, base, fd):
+    # A background child inherits the parent's flock descriptor; check it
+    # refers to this base's lock file and that the lock is really held.
+    path = _flock_path(base_dir, base)
+    try:
+        fd_stat = os.fstat(fd)
+        path_stat = os.stat(path)
+    except OSError as error:
+        raise ValueError("missing refresh lock") from error
+    if (fd_stat.st_dev, fd_stat.st_ino) != (
+        path_stat.st_dev,
+        path_stat.st_ino,
+    ):
+        raise ValueError("invalid refresh lock descriptor")
+    try:
+        # Re-locking an already held flock through the same open file is a
+        # no-op; a descriptor that does not own the lock is refused.
+        fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except OSError as error:
+        raise ValueError("refresh lock is not held") from error
+    return FlockRefreshLock(path=path, acquired=True, fd=fd)
+
+
+def refresh_rates_with_held_lock(base_dir, base, fd):
+    normalized_base = normalize_base(base)
+    lock = _held_refresh_lock(base_dir, normalized_base, fd)
     return _refresh_rates_with_lock(base_dir, normalized_base, lock)
 
 
+def refresh_bases_with_held_lock(base_dir, fd):
+    lock = _held_refresh_lock(base_dir, REFERENCE_BASE, fd)
+    return _refresh_bases_with_lock(
+        base_dir,
+        REFERENCE_BASE,
+        bulk_refresh_bases(REFERENCE_BASE),
+        lock,
+    )
+
+
+def refresh_bases_with_existing_lock(base_dir, lock_path, token=None):
+    lock = _existing_refresh_lock(base_dir, REFERENCE_BASE, lock_path, token)
+    return _refresh_bases_with_lock(
+        base_dir,
+        REFERENCE_BASE,
+        bulk_refresh_bases(REFERENCE_BASE),
+        lock,
+    )
+
+
+class RefreshWorker:
+    # Runs refresh jobs on a single daemon thread so long-lived processes
+    # avoid starting a new interpreter per refresh. Jobs receive a lock
+    # that was already acquired through acquire_refresh_lock, which keeps
+    # refreshes exclusive across processes.
+
+    def __init__(self):
+        self.jobs = queue.Queue()
+        self.last_error = None
+        self._thread = None
+        self._mutex = threading.Lock()
+
+    def submit(self, job):
+        with self._mutex:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(
+                    target=self._run,
+                    name="converter-currency-refresh",
+                    daemon=True,
+                )
+                self._thread.start()
+            self.jobs.put(job)
+
+    def _run(self):
+        while True:
+            job = self.jobs.get()
+            try:
+                if job is None:
+                    return
+                job()
+            except Exception as error:
+                self.last_error = error
+            finally:
+                self.jobs.task_done()
+
+    def join(self):
+        self.jobs.join()
+
+    def stop(self):
+        with self._mutex:
+            thread = self._thread
+            self._thread = None
+        if thread is not None:
+            self.jobs.put(None)
+            thread.join()
+
+
+_refresh_worker = None
+
+
+def enable_in_process_refresh():
+    global _refresh_worker
+    if _refresh_worker is None:
+        _refresh_worker = RefreshWorker()
+    return _refresh_worker
+
+
+def disable_in_process_refresh():
+    global _refresh_worker
+    worker, _refresh_worker = _refresh_worker, None
+    if worker is not None:
+        worker.stop()
+
+
 def start_background_refresh_status(base_dir, base):
     normalized_base = normalize_base(base)
-    lock = acquire_refresh_lock(base_dir, normalized_base)
+    if bulk_refresh_enabled():
+        # One reference fetch refreshes every configured base at once, so
+        # all stale bases share a single lock, worker and HTTP request.
+        lock_base = REFERENCE_BASE
+        arguments = ["update-locked-all"]
+    else:
+        lock_base = normalized_base
+        arguments = ["update-locked", normalized_base]
+
+    with trace.stage("refresh_lock") as fields:
+        lock = acquire_refresh_lock(base_dir, lock_base)
+        fields["acquired"] = lock.acquired
     if not lock.acquired:
         return BACKGROUND_REFRESH_ALREADY_RUNNING
 
-    command = [
-        sys.executable,
-        "-m",
-        "converter.currency",
-        "update-locked",
-        normalized_base,
-        lock.path,
-    ]
+    worker = _refresh_worker
+    if worker is not None:
+        if arguments[0] == "update-locked-all":
+            job = functools.partial(
+                _refresh_bases_with_lock,
+                base_dir,
+                REFERENCE_BASE,
+                bulk_refresh_bases(REFERENCE_BASE),
+                lock,
+            )
+        else:
+            job = functools.partial(
+                _refresh_rates_with_lock,
+                base_dir,
+                normalized_base,
+                lock,
+            )
+        worker.submit(job)
+        return BACKGROUND_REFRESH_STARTED
+
+    # One-shot script filter runs exit right away, so the refresh has to
+    # outlive this process.
     env = os.environ.copy()
-    env[LOCK_TOKEN_ENV] = lock.token
     if base_dir is not None:
         env["alfred_workflow_cache"] = os.fspath(base_dir)
 
@@ -1237,12 +1705,24 @@ def start_background_refresh_status(base_dir, base):
         "close_fds": True,
         "env": env,
     }
+    if isinstance(lock, FlockRefreshLock):
+        # The child inherits the locked descriptor, so the lock lives
+        # exactly as long as the refresh process does.
+        arguments[0] = arguments[0].replace("locked", "held")
+        arguments.append(str(lock.fd))
+        popen_kwargs["pass_fds"] = (lock.fd,)
+    else:
+        arguments.append(lock.path)
+        env[LOCK_TOKEN_ENV] = lock.token
+    command = [sys.executable, "-m", "converter.currency", *arguments]
 
     try:
         subprocess.Popen(command, **popen_kwargs)
     except OSError:
         lock.release()
         return BACKGROUND_REFRESH_FAILED
+    if isinstance(lock, FlockRefreshLock):
+        lock.release()
     return BACKGROUND_REFRESH_STARTED
 
 
@@ -1253,13 +1733,34 @@ def start_background_refresh(base_dir, base):
     )
 
 
+def _cached_validators(validators):
+    # Validators are only an optimization, so malformed entries are dropped
+    # instead of invalidating the cached rates.
+    if not isinstance(validators, dict):
+        return {}
+    return {
+        url: {
+            key: value
+            for key, value in entry.items()
+            if isinstance(key, str) and isinstance(value, str)
+        }
+        for url, entry in validators.items()
+        if isinstance(url, str) and isinstance(entry, dict)
+    }
+
+
+def _read_rate_cache_data(base_dir, base):
+    if store.enabled():
+        return store.open_store(base_dir).rate_table(base)
+    with open(rate_cache_path(base_dir, base), "r", encoding="utf-8") as fh:
+        return json.load(fh)
+
+
 def read_rate_cache(base_dir, base):
     try:
         normalized_base = normalize_base(base)
-        path = rate_cache_path(base_dir, normalized_base)
-        with open(path, "r", encoding="utf-8") as fh:
-            data = json.load(fh)
-        if data["base"] != normalized_base:
+        data = _read_rate_cache_data(base_dir, normalized_base)
+        if data is None or data["base"] != normalized_base:
             return None
         rates = _normalize_rates(
             data["rates"],
@@ -1273,20 +1774,99 @@ def read_rate_cache(base_dir, base):
                 data.get("fetched_at", data["date"])
             ),
             rates=rates,
+            validators=_cached_validators(data.get("validators")),
         )
     except (
         AttributeError, OSError, ValueError, KeyError, TypeError,
-        decimal.InvalidOperation,
+        decimal.InvalidOperation, sqlite3.Error,
     ):
         return None
 
 
-def write_rate_cache(base_dir, cache):
-    root = cache_root(base_dir)
-    os.makedirs(root, exist_ok=True)
+def cached_bases(base_dir):
+    if store.enabled():
+        try:
+            return store.open_store(base_dir).rate_table_bases()
+        except (OSError, sqlite3.Error):
+            return ()
+    try:
+        filenames = os.listdir(cache_root(base_dir))
+    except OSError:
+        return ()
+
+    bases = []
+    for filename in filenames:
+        base, extension = os.path.splitext(filename)
+        if extension == ".json" and base in CURRENCY_CODES:
+            bases.append(base)
+    return tuple(sorted(bases))
+
+
+def derive_rate_cache(cache, base):
+    # Tables hold target units per base unit, so any table containing both
+    # currencies yields source -> target as rates[target] / rates[source].
+    normalized_base = normalize_base(base)
+    if cache.base == normalized_base:
+        return cache
+
+    pivot = cache.rates.get(normalized_base)
+    if pivot is None:
+        return None
+
+    rates = {
+        code: rate / pivot
+        for code, rate in cache.rates.items()
+        if code != normalized_base
+    }
+    rates[cache.base] = 1 / pivot
+    return RateCache(
+        base=normalized_base,
+        date=cache.date,
+        fetched_at=cache.fetched_at,
+        rates=rates,
+    )
+
+
+def read_cross_rate_cache(
+    base_dir,
+    source,
+    targets=(),
+    today=None,
+    source_cache=_UNREAD,
+):
+    normalized_source = normalize_base(source)
+    today = today or dt.date.today()
+
+    # Tables covering more of the requested targets win; freshness only
+    # decides between tables that answer the query equally well.
+    best = None
+    best_key = None
+    for base in cached_bases(base_dir):
+        if base == normalized_source and source_cache is not _UNREAD:
+            cache = source_cache
+        else:
+            cache = read_rate_cache(base_dir, base)
+        if cache is None or not cache.is_fresh(today):
+            continue
+        if base != normalized_source and normalized_source not in cache.rates:
+            continue
+
+        covered = sum(
+            1 for target in targets
+            if target == base or target in cache.rates
+        )
+        key = (covered, cache.fetched_at, cache.date)
+        if best_key is None or key > best_key:
+            best = cache
+            best_key = key
+
+    if best is None:
+        return None
+    return derive_rate_cache(best, normalized_source)
+
+
+def _rate_cache_data(cache):
     base = normalize_base(cache.base)
-    path = rate_cache_path(base_dir, base)
-    tmp_path = None
     rates = _normalize_rates(
         cache.rates,
         key_error_message="cache rate key is invalid",
@@ -1301,14 +1881,323 @@ def write_rate_cache(base_dir, cache):
             for key, value in sorted(rates.items())
         },
     }
+    if cache.validators:
+        data["validators"] = cache.validators
+    return base, data
+
+
+def write_rate_caches(base_dir, caches):
+    # Every table is validated and fully written to a temporary file before
+    # any is replaced, so encoding or disk errors leave all tables untouched.
+    # The replaces themselves are only atomic per file: a failing replace,
+    # or a reader running between two replaces, can see a mix of old and
+    # new tables. Each table is internally consistent either way.
+    root = cache_root(base_dir)
+    os.makedirs(root, exist_ok=True)
+    tables = [_rate_cache_data(cache) for cache in caches]
+    if store.enabled():
+        # The store replaces every table in one transaction instead
+        store.open_store(base_dir).write_rate_tables(tables)
+        _record_history(base_dir, tables)
+        return
+    staged = []
+    try:
+        for base, data in tables:
+            fd, tmp_path = tempfile.mkstemp(
+                dir=root, prefix=f".{base}.", suffix=".tmp"
+            )
+            staged.append((tmp_path, rate_cache_path(base_dir, base)))
+            with os.fdopen(fd, "w", encoding="utf-8") as fh:
+                json.dump(data, fh, sort_keys=True)
+        while staged:
+            tmp_path, path = staged[0]
+            os.replace(tmp_path, path)
+            staged.pop(0)
+    finally:
+        for tmp_path, _ in staged:
+            try:
+                os.unlink(tmp_path)
+            except OSError:
+                pass
+
+    _record_history(base_dir, tables)
+
+
+def _record_history(base_dir, tables):
+    # Every written table is also appended to the rate history
+    try:
+        _record_history_tables(base_dir, tables)
+    except sqlite3.Error:
+        # The history is an offline archive; failing to extend it must not
+        # fail the refresh that already replaced the tables.
+        pass
+
+
+def write_rate_cache(base_dir, cache):
+    write_rate_caches(base_dir, (cache,))
+
+
+def history_path(base_dir):
+    if store.enabled():
+        return store.store_path(base_dir)
+    return os.path.join(cache_root(base_dir), HISTORY_FILENAME)
+
+
+@contextlib.contextmanager
+def _history_connection(path):
+    connection = sqlite3.connect(path, timeout=REQUEST_TIMEOUT)
+    try:
+        # Primary keys lead with (base, date), so lookups are B-tree
+        # searches instead of scans over the whole history.
+        connection.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS tables (
+                base TEXT NOT NULL,
+                date TEXT NOT NULL,
+                PRIMARY KEY (base, date)
+            ) WITHOUT ROWID;
+            CREATE TABLE IF NOT EXISTS rates (
+                base TEXT NOT NULL,
+                date TEXT NOT NULL,
+                target TEXT NOT NULL,
+                rate TEXT NOT NULL,
+                PRIMARY KEY (base, date, target)
+            ) WITHOUT ROWID;
+            """
+        )
+        with connection:
+            yield connection
+    finally:
+        connection.close()
+
+
+def record_history(base_dir, caches):
+    _record_history_tables(
+        base_dir,
+        [_rate_cache_data(cache) for cache in caches],
+    )
+
+
+def _record_history_tables(base_dir, tables):
+    # Append-only: the first table stored for a base and date is kept
+    if not tables:
+        return
+    os.makedirs(cache_root(base_dir), exist_ok=True)
+    with _history_connection(history_path(base_dir)) as connection:
+        for base, data in tables:
+            inserted = connection.execute(
+                "INSERT OR IGNORE INTO tables (base, date) VALUES (?, ?)",
+                (base, data["date"]),
+            )
+            if inserted.rowcount == 0:
+                continue
+            connection.executemany(
+                "INSERT INTO rates (base, date, target, rate) "
+                "VALUES (?, ?, ?, ?)",
+                [
+                    (base, data["date"], target, rate)
+                    for target, rate in data["rates"].items()
+                ],
+            )
+
+
+def _history_table(connection, base, date):
+    rows = connection.execute(
+        "SELECT target, rate FROM rates WHERE base = ? AND date = ?",
+        (base, date),
+    ).fetchall()
+    try:
+        rates = _normalize_rates(
+            dict(rows),
+            key_error_message="history rate key is invalid",
+            value_error_message="history rates must be finite",
+        )
+    except (ValueError, decimal.InvalidOperation):
+        return None
+    if not rates:
+        return None
+    day = dt.date.fromisoformat(date)
+    return RateCache(base=base, date=day, fetched_at=day, rates=rates)
+
+
+def _history_bases(connection):
+    # One primary key seek per base rather than a scan over every date
+    base = ""
+    while True:
+        (base,) = connection.execute(
+            "SELECT MIN(base) FROM tables WHERE base > ?", (base,)
+        ).fetchone()
+        if base is None:
+            return
+        yield base
+
+
+def _history_date(connection, base, on):
+    (date,) = connection.execute(
+        "SELECT MAX(date) FROM tables WHERE base = ? AND date <= ?",
+        (base, on),
+    ).fetchone()
+    return date
+
+
+def _history_targets(connection, base, date, codes):
+    placeholders = ", ".join("?" * len(codes))
+    return {
+        target
+        for (target,) in connection.execute(
+            "SELECT target FROM rates WHERE base = ? AND date = ? "
+            f"AND target IN ({placeholders})",
+            (base, date, *codes),
+        )
+    }
+
+
+def read_history_cache(base_dir, base, on, targets=()):
+    # Returns the newest table dated on or before `on`. The base's own
+    # table is a single index seek; other bases are only searched for
+    # cross rates when it is missing or lacks a requested target.
+    normalized_base = normalize_base(base)
+    on = on.isoformat()
+    path = history_path(base_dir)
+    if not os.path.exists(path):
+        return None
+    try:
+        with _history_connection(path) as connection:
+            own = None
+            date = _history_date(connection, normalized_base, on)
+            if date is not None:
+                own = _history_table(connection, normalized_base, date)
+            if own is not None and all(
+                target == normalized_base or target in own.rates
+                for target in targets
+            ):
+                return own
+
+            codes = sorted({normalized_base, *targets})
+            candidates = []
+            for table_base in _history_bases(connection):
+                if table_base == normalized_base:
+                    if own is None:
+                        continue
+                    date = own.date.isoformat()
+                    present = own.rates
+                else:
+                    date = _history_date(connection, table_base, on)
+                    if date is None:
+                        continue
+                    present = _history_targets(
+                        connection, table_base, date, codes
+                    )
+                    if normalized_base not in present:
+                        continue
+                covered = sum(
+                    1 for target in targets
+                    if target == table_base or target in present
+                )
+                # Same ranking as read_cross_rate_cache, preferring the
+                # base's own table when everything else is equal
+                key = (covered, date, table_base == normalized_base)
+                candidates.append((key, table_base, date))
+
+            # Only the winning table is loaded and normalised
+            candidates.sort(key=lambda candidate: candidate[0], reverse=True)
+            for _, table_base, date in candidates:
+                if table_base == normalized_base:
+                    return own
+                cache = _history_table(connection, table_base, date)
+                if cache is not None:
+                    return derive_rate_cache(cache, normalized_base)
+    except (sqlite3.Error, ValueError):
+        return None
+    return None
+
+
+def usage_log_path(base_dir):
+    return os.path.join(cache_root(base_dir), "usage.json")
+
+
+def usage_stamp_path(base_dir, base):
+    # The modification time of this empty file is the last day the base
+    # was recorded, so repeated queries only cost a stat call
+    return os.path.join(
+        cache_root(base_dir), "usage", f"{normalize_base(base)}.stamp"
+    )
+
+
+def _stamped_on(path, today):
     try:
+        modified = os.stat(path).st_mtime
+    except OSError:
+        return False
+    return dt.date.fromtimestamp(modified) == today
+
+
+def _stamp(path, today):
+    midnight = dt.datetime.combine(today, dt.time()).timestamp()
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "a"):
+        pass
+    os.utime(path, (midnight, midnight))
+
+
+def read_usage(base_dir):
+    try:
+        with open(usage_log_path(base_dir), "r", encoding="utf-8") as fh:
+            data = json.load(fh)
+        return {
+            normalize_base(base): dt.date.fromisoformat(date)
+            for base, date in data.items()
+        }
+    except (AttributeError, OSError, ValueError, TypeError):
+        return {}
+
+
+# (cache root, base) -> the day this process last recorded it
+_recorded_usage = {}
+
+
+def _mark_usage_recorded(recorded, stamp, today):
+    _recorded_usage[recorded] = today
+    try:
+        _stamp(stamp, today)
+    except OSError:
+        pass
+
+
+def record_usage(base_dir, base, today=None):
+    # The log is rewritten at most once per base per day, and failures
+    # only cost prefetch accuracy, never the query itself.
+    today = today or dt.date.today()
+    recorded = (cache_root(base_dir), base)
+    if _recorded_usage.get(recorded) == today:
+        return
+    stamp = usage_stamp_path(base_dir, base)
+    if _stamped_on(stamp, today):
+        _recorded_usage[recorded] = today
+        return
+    usage = read_usage(base_dir)
+    if usage.get(base) == today:
+        _mark_usage_recorded(recorded, stamp, today)
+        return
+    usage[base] = today
+    data = {
+        key: value.isoformat()
+        for key, value in sorted(usage.items())
+    }
+    tmp_path = None
+    try:
+        root = cache_root(base_dir)
+        os.makedirs(root, exist_ok=True)
         fd, tmp_path = tempfile.mkstemp(
-            dir=root, prefix=f".{base}.", suffix=".tmp"
+            dir=root, prefix=".usage.", suffix=".tmp"
         )
         with os.fdopen(fd, "w", encoding="utf-8") as fh:
             json.dump(data, fh, sort_keys=True)
-        os.replace(tmp_path, path)
+        os.replace(tmp_path, usage_log_path(base_dir))
         tmp_path = None
+        _mark_usage_recorded(recorded, stamp, today)
+    except OSError:
+        pass
     finally:
         if tmp_path is not None:
             try:
@@ -1317,6 +2206,111 @@ def write_rate_cache(base_dir, cache):
                 pass
 
 
+def prefetch_bases(base_dir, today=None):
+    today = today or dt.date.today()
+    oldest = today - PREFETCH_USAGE_WINDOW
+    recent = sorted(
+        (date, base)
+        for base, date in read_usage(base_dir).items()
+        if date >= oldest
+    )
+    bases = list(default_targets(None))
+    for _, base in reversed(recent):
+        if base not in bases:
+            bases.append(base)
+    return tuple(bases)
+
+
+def _needs_prefetch(base_dir, base, today):
+    cache = read_rate_cache(base_dir, base)
+    if cache is not None and cache.is_fresh(today):
+        return False
+    return read_cross_rate_cache(
+        base_dir,
+        base,
+        today=today,
+        source_cache=cache,
+    ) is None
+
+
+def prefetch(base_dir, today=None):
+    today = today or dt.date.today()
+    due = [
+        base for base in prefetch_bases(base_dir, today)
+        if _needs_prefetch(base_dir, base, today)
+    ]
+    if not due:
+        return ()
+
+    if bulk_refresh_enabled():
+        if refresh_bases(base_dir, due) is None:
+            return ()
+        return tuple(due)
+
+    refreshed = []
+    for base in due:
+        if manual_refresh_rates(base_dir, base) is not None:
+            refreshed.append(base)
+    return tuple(refreshed)
+
+
+def next_prefetch_at(now=None):
+    # Tables are fresh for the calendar day they were fetched on, so the
+    # earliest useful refresh is just after local midnight.
+    now = now or dt.datetime.now()
+    midnight = dt.datetime.combine(
+        now.date() + dt.timedelta(days=1),
+        dt.time(),
+    )
+    return midnight + PREFETCH_OFFSET
+
+
+class PrefetchScheduler:
+    def __init__(self, base_dir=None):
+        self.base_dir = base_dir
+        self.last_error = None
+        self._stop = threading.Event()
+        self._thread = None
+
+    def run_once(self):
+        try:
+            return prefetch(self.base_dir)
+        except Exception as error:
+            self.last_error = error
+            return ()
+
+    def _run(self):
+        while not self._stop.is_set():
+            self.run_once()
+            now = dt.datetime.now()
+            delay = (next_prefetch_at(now) - now).total_seconds()
+            if self._stop.wait(delay):
+                return
+
+    def start(self):
+        if self._thread is None:
+            self._stop.clear()
+            self._thread = threading.Thread(
+                target=self._run,
+                name="converter-currency-prefetch",
+                daemon=True,
+            )
+            self._thread.start()
+        return self
+
+    def stop(self):
+        thread, self._thread = self._thread, None
+        if thread is not None:
+            self._stop.set()
+            thread.join()
+
+
+def _lock_fd(value):
+    if not value.isdigit():
+        raise SystemExit(f"invalid lock descriptor: {value}")
+    return int(value)
+
+
 def main(argv=None):
     argv = sys.argv[1:] if argv is None else argv
     argv = list(argv)
@@ -1331,9 +2325,30 @@ def main(argv=None):
             token=os.environ.get(LOCK_TOKEN_ENV),
         )
         return 0
+    if len(argv) == 3 and argv[0] == "update-held":
+        refresh_rates_with_held_lock(None, argv[1], _lock_fd(argv[2]))
+        return 0
+    if len(argv) == 2 and argv[0] == "update-held-all":
+        refresh_bases_with_held_lock(None, _lock_fd(argv[1]))
+        return 0
+    if argv == ["prefetch"]:
+        prefetch(None)
+        return 0
+    if argv and argv[0] == "update-all":
+        refresh_bases(None, argv[1:] or None)
+        return 0
+    if len(argv) == 2 and argv[0] == "update-locked-all":
+        refresh_bases_with_existing_lock(
+            None,
+            argv[1],
+            token=os.environ.get(LOCK_TOKEN_ENV),
+        )
+        return 0
     raise SystemExit(
         "Usage: python -m converter.currency update <base> | "
-        "update-locked <base> <lock-path>"
+        "update-locked <base> <lock-path> | update-all [<base> ...] | "
+        "update-locked-all <lock-path> | update-held <base> <fd> | "
+        "update-held-all <fd> | prefetch"
     )
 
 
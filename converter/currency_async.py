@@ -0,0 +1,127 @@
+from __future__ import annotations
+
+import asyncio
+import datetime as dt
+import decimal
+import functools
+
+from . import currency, fixed_point
+
+
+def _parse(query):
+    if isinstance(query, currency.CurrencyQuery):
+        return query
+    parsed = currency.parse_query(str(query))
+    if parsed is None:
+        raise ValueError(f"invalid currency query: {query!r}")
+    return parsed
+
+
+def _rate_table(base_dir, source, on, targets, today):
+    # Runs on an executor thread: fresh cached or cross-rate tables are used
+    # as is, anything else is refreshed once for the whole group.
+    if on is not None:
+        cache = currency.read_history_cache(base_dir, source, on, targets)
+        if cache is None:
+            raise RuntimeError(
+                f"No {source.upper()} rate history on or before "
+                f"{on.isoformat()}"
+            )
+        return cache
+
+    cache = currency.read_rate_cache(base_dir, source)
+    if cache is None or not cache.is_fresh(today):
+        cross_cache = currency.read_cross_rate_cache(
+            base_dir,
+            source,
+            targets=targets,
+            today=today,
+            source_cache=cache,
+        )
+        if cross_cache is not None:
+            cache = cross_cache
+    if cache is not None and cache.is_fresh(today):
+        return cache
+
+    try:
+        return currency.refresh_rates(base_dir, source)
+    except Exception:
+        # A stale table still beats failing the whole batch
+        if cache is not None:
+            return cache
+        raise
+
+
+def _convert_group(queries, cache):
+    rates = [cache.rates.get(query.target) for query in queries]
+    # Products are exact with one context sized for the longest operands
+    precision = 28
+    for query, rate in zip(queries, rates):
+        if rate is not None:
+            precision = max(
+                precision,
+                len(query.amount.as_tuple().digits)
+                + len(rate.as_tuple().digits)
+                + 6,
+            )
+    with decimal.localcontext() as context:
+        context.prec = precision
+        return [
+            None if rate is None else query.amount * rate
+            for query, rate in zip(queries, rates)
+        ]
+
+
+async def _rate_tables(parsed, base_dir, today):
+    # Groups query indexes by source currency and rate date, and loads
+    # every group's rate table concurrently
+    today = today or dt.date.today()
+
+    groups = {}
+    for index, query in enumerate(parsed):
+        groups.setdefault((query.source, query.on), []).append(index)
+
+    loop = asyncio.get_running_loop()
+    keys = list(groups)
+    caches = await asyncio.gather(*(
+        loop.run_in_executor(
+            None,
+            functools.partial(
+                _rate_table,
+                base_dir,
+                source,
+                on,
+                tuple(sorted({parsed[i].target for i in groups[source, on]})),
+                today,
+            ),
+        )
+        for source, on in keys
+    ))
+
+    return [(cache, groups[key]) for key, cache in zip(keys, caches)]
+
+
+async def convert_many(queries, base_dir=None, today=None):
+    # Converts every query and returns the unrounded amounts in input order;
+    # None marks targets missing from the source's rate table. Each source
+    # table is loaded (or fetched) once, and all sources concurrently.
+    parsed = [_parse(query) for query in queries]
+    results = [None] * len(parsed)
+    for cache, indexes in await _rate_tables(parsed, base_dir, today):
+        converted = _convert_group([parsed[i] for i in indexes], cache)
+        for index, value in zip(indexes, converted):
+            results[index] = value
+    return results
+
+
+async def format_many(queries, base_dir=None, today=None):
+    # Like convert_many, but returns the amounts as the Alfred results show
+    # them, rounded with integer arithmetic on rates scaled once per table
+    parsed = [_parse(query) for query in queries]
+    results = [None] * len(parsed)
+    for cache, indexes in await _rate_tables(parsed, base_dir, today):
+        table = fixed_point.ScaledRateTable.from_cache(cache)
+        for index in indexes:
+            query = parsed[index]
+            results[index] = table.format(query.amount, query.target)
+    return results
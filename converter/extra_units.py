@@ -111,6 +111,6 @@ def register_post(units):
         ).register(units)
 
     hz = units.get('Hz')
-    hz.conversion_params = tuple(units.get('cycles/second').conversion_params)
+    hz.conversion_params = units.get('cycles/second').conversion_params
     hz.base_unit = 'radians/second'
     hz.register(units)
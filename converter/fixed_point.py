@@ -0,0 +1,106 @@
+from __future__ import annotations
+
+import typing
+from dataclasses import dataclass
+
+# Currency amounts are shown with at most this many decimal places
+QUANTUM_PLACES = 6
+_QUANTUM_SCALE = 10 ** QUANTUM_PLACES
+
+
+def _exact_places(value):
+    exponent = value.as_tuple().exponent
+    if not isinstance(exponent, int):
+        raise ValueError(f"{value} is not finite")
+    return max(-exponent, 0)
+
+
+def scale_decimal(value, places):
+    # Returns the integer n with n / 10**places == value exactly
+    sign, digits, exponent = value.as_tuple()
+    if not isinstance(exponent, int):
+        raise ValueError(f"{value} is not finite")
+    shift = exponent + places
+    if shift < 0:
+        raise ValueError(f"{value} needs more than {places} decimal places")
+    coefficient = int("".join(map(str, digits)) or "0") * 10 ** shift
+    return -coefficient if sign else coefficient
+
+
+def split_decimal(value):
+    # Returns (n, places) with n / 10**places == value; amounts go through
+    # this once per conversion, and fixed-point text is the cheapest route
+    if not value.is_finite():
+        raise ValueError(f"{value} is not finite")
+    whole, _, fraction = format(value, "f").partition(".")
+    return int(whole + fraction), len(fraction)
+
+
+def format_scaled(value, places):
+    # Integer-only twin of currency._format_decimal for value / 10**places:
+    # round half-even to six places, falling back to every digit when that
+    # would hide a non-zero amount.
+    if value == 0:
+        return "0"
+    sign = "-" if value < 0 else ""
+    magnitude = abs(value)
+    if places > QUANTUM_PLACES:
+        divisor = 10 ** (places - QUANTUM_PLACES)
+        quotient, remainder = divmod(magnitude, divisor)
+        doubled = remainder * 2
+        if doubled > divisor or (doubled == divisor and quotient % 2):
+            quotient += 1
+    else:
+        quotient = magnitude * 10 ** (QUANTUM_PLACES - places)
+
+    if quotient == 0:
+        digits = str(magnitude).rjust(places + 1, "0")
+        text = f"{digits[:-places]}.{digits[-places:]}"
+    else:
+        whole, fraction = divmod(quotient, _QUANTUM_SCALE)
+        text = f"{whole}.{fraction:0{QUANTUM_PLACES}d}"
+    return sign + text.rstrip("0").rstrip(".")
+
+
+@dataclass(frozen=True)
+class ScaledRateTable:
+    # Rates as integers sharing one scale: rate == rates[code] / 10**scale
+    base: str
+    scale: int
+    rates: typing.Dict[str, int]
+
+    @classmethod
+    def from_cache(cls, cache):
+        scale = max(
+            (_exact_places(rate) for rate in cache.rates.values()),
+            default=0,
+        )
+        return cls(
+            base=cache.base,
+            scale=scale,
+            rates={
+                code: scale_decimal(rate, scale)
+                for code, rate in cache.rates.items()
+            },
+        )
+
+    def convert(self, amount, target):
+        # Returns the product as (scaled integer, decimal places), or None
+        # when the table has no rate for the target
+        rate = self.rates.get(target)
+        if rate is None:
+            return None
+        coefficient, places = split_decimal(amount)
+        return coefficient * rate, places + self.scale
+
+    def format(self, amount, target):
+        product = self.convert(amount, target)
+        if product is None:
+            return None
+        return format_scaled(*product)
+
+
+def format_decimal(value):
+    # Same output as currency._format_decimal without a decimal context
+    return format_scaled(*split_decimal(value))
+
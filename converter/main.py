@@ -1,10 +1,16 @@
 #!/usr/bin/env python3
+import itertools
 import os
 import pickle
 import sys
+import time
 import traceback
 
-from . import constants, convert, currency, output
+_IMPORT_STARTED = time.perf_counter()
+
+from . import constants, convert, currency, output, store, trace  # noqa: E402
+
+IMPORT_SECONDS = time.perf_counter() - _IMPORT_STARTED
 
 DEBUG = os.environ.get('DEBUG_CONVERTER')
 
@@ -25,7 +31,41 @@ def error_response(error):
     )
 
 
+def units_store_key():
+    xml_file = os.fspath(constants.UNITS_XML_FILE)
+    mtime = os.stat(xml_file).st_mtime_ns
+    return f'{constants.UNITS_CACHE_VERSION}:{xml_file}:{mtime}'
+
+
+def load_store_units(unit_store, fields=None):
+    fields = {} if fields is None else fields
+    key = units_store_key()
+    payload = unit_store.units(key)
+    if payload is not None:
+        units = pickle.loads(payload)
+        if (
+            getattr(units, 'cache_version', None)
+            == constants.UNITS_CACHE_VERSION
+        ):
+            fields['source'] = 'store'
+            return units
+
+    fields['source'] = 'xml'
+    units = convert.Units()
+    units.load(constants.UNITS_XML_FILE)
+    payload = pickle.dumps(units, -1)
+    unit_store.save_units(key, payload)
+    return pickle.loads(payload)
+
+
 def load_units():
+    with trace.stage('load_units') as fields:
+        return _load_units(fields)
+
+
+def _load_units(fields):
+    if store.enabled() and not DEBUG:
+        return load_store_units(store.open_store(workflow_cache_dir()), fields)
     try:  # pragma: no cover
         assert not DEBUG
         with open(constants.UNITS_PICKLE_FILE, 'rb') as fh:
@@ -36,8 +76,10 @@ def load_units():
                 != constants.UNITS_CACHE_VERSION
             ):
                 raise RuntimeError('Stale units cache')
+            fields['source'] = 'pickle'
             return units
     except BaseException:  # pragma: no cover
+        fields['source'] = 'xml'
         units = convert.Units()
         units.load(constants.UNITS_XML_FILE)
 
@@ -64,6 +106,17 @@ def run(query):
         if response is not None:
             return response
 
+    # Unit results only depend on the query, the units file and settings,
+    # so the optional store can answer repeats without loading any units.
+    result_store = store.open_store(cache_dir) if store.enabled() else None
+    if result_store is not None:
+        key = store.result_key(query, units_store_key())
+        with trace.stage('result_cache') as fields:
+            response = result_store.cached_response(key)
+            fields['hit'] = response is not None
+        if response is not None:
+            return response
+
     units = None
     default_currency_query = currency.parse_default_query(query)
     if default_currency_query is not None:
@@ -80,12 +133,54 @@ def run(query):
     items = list(convert.main(units, query, output.item_creator()))
     if not items:
         raise RuntimeError(f"No results for {query!r}")
-    return output.Response(items=items, skipknowledge=True)
+    response = output.Response(items=items, skipknowledge=True)
+    if result_store is not None:
+        result_store.save_response(key, response)
+    return response
+
+
+# Writes results as convert.main yields them. Only plain unit queries are
+# streamed; currency queries and anything the result store could answer go
+# through run(). An error after the first item leaves a truncated document,
+# so callers that need the error item should use scriptfilter() instead.
+def stream(query, ndjson=False, out=None):
+    query = " ".join(str(query).split())
+    if (
+        store.enabled()
+        or currency.is_update_command(query)
+        or currency.parse_query(query) is not None
+        or currency.parse_default_query(query) is not None
+    ):
+        response = run(query)
+        items = iter(response.items)
+        skipknowledge = response.skipknowledge
+        rerun = response.rerun
+    else:
+        items = convert.main(load_units(), query, output.item_creator())
+        skipknowledge = True
+        rerun = None
+
+    # Check for results before writing anything so an empty query still
+    # raises like `run` does
+    first = next(items, None)
+    if first is None:
+        raise RuntimeError(f"No results for {query!r}")
+    items = itertools.chain((first,), items)
+
+    if ndjson:
+        return output.write_ndjson(items, stream=out)
+    return output.write_stream(
+        items, skipknowledge=skipknowledge, rerun=rerun, stream=out
+    )
 
 
 def scriptfilter(query):
+    query = ' '.join(str(query).split())
+    if trace.start(query) is not None:
+        trace.record('import', IMPORT_SECONDS)
+
     try:
-        response = run(' '.join(str(query).split()))
+        response = run(query)
     except Exception as error:  # pragma: no cover
         response = error_response(error)
 
@@ -94,7 +189,9 @@ def scriptfilter(query):
 
         pprint.pprint(response.to_alfred())
     else:
-        output.write_json(response)
+        with trace.stage('render'):
+            output.write_json(response)
+    trace.finish(workflow_cache_dir())
 
 
 if __name__ == '__main__':
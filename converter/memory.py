@@ -0,0 +1,90 @@
+'''Deep memory size of a loaded unit registry
+
+Run ``python -m converter memory`` to see how many bytes each part of the
+registry holds. Objects shared between parts are counted once, in the first
+part that reaches them.
+'''
+import argparse
+import sys
+
+from . import constants, convert
+
+# Reported in this order, so shared objects end up in the earliest part
+PARTS = (
+    'units',
+    'ids',
+    'annotations',
+    'lower_annotations',
+    'base_units',
+    'quantity_types',
+)
+
+
+def deep_size(obj, seen):
+    '''Size of `obj` and everything it references that is not in `seen`'''
+    size = 0
+    stack = [obj]
+    while stack:
+        obj = stack.pop()
+        if id(obj) in seen:
+            continue
+        seen.add(id(obj))
+        size += sys.getsizeof(obj)
+
+        if isinstance(obj, dict):
+            stack.extend(obj.keys())
+            stack.extend(obj.values())
+        elif isinstance(obj, (list, tuple, set, frozenset)):
+            stack.extend(obj)
+        elif isinstance(obj, convert.Units):
+            # Reached through Unit.units, reported as its own parts
+            continue
+        else:
+            if hasattr(obj, '__dict__'):
+                stack.append(vars(obj))
+            for cls in type(obj).__mro__:
+                for name in getattr(cls, '__slots__', ()):
+                    if hasattr(obj, name):
+                        stack.append(getattr(obj, name))
+    return size
+
+
+def _unique(objects):
+    return {id(obj): obj for obj in objects}.values()
+
+
+def report(units):
+    '''Bytes per registry part plus a few counts, as a dict'''
+    seen = {id(units)}
+    sizes = {
+        part: deep_size(getattr(units, part), seen)
+        for part in PARTS
+    }
+    sizes['total'] = sum(sizes.values()) + sys.getsizeof(units)
+
+    unit_objects = list(_unique(units.ids.values()))
+    counts = dict(
+        unit_count=len(unit_objects),
+        annotation_count=len(units.annotations),
+        conversion_params=len(_unique(
+            unit.conversion_params for unit in unit_objects
+        )),
+        quantity_type_sets=len(_unique(
+            unit.quantity_types for unit in unit_objects
+        )),
+    )
+    return dict(sizes, **counts)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m converter memory')
+    parser.parse_args(argv)
+
+    units = convert.Units()
+    units.load(constants.UNITS_XML_FILE)
+    for name, value in report(units).items():
+        if name in PARTS or name == 'total':
+            sys.stdout.write(f'{name}: {value / 1024:.1f} KiB\n')
+        else:
+            sys.stdout.write(f'{name}: {value}\n')
+    return 0
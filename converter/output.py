@@ -1,11 +1,44 @@
 from __future__ import annotations
 
+import functools
 import json
 import sys
 import typing
-from dataclasses import dataclass, field
+from dataclasses import dataclass, field, fields
 
+# Same escaping json.dumps uses with ensure_ascii=False
+_encode_string = json.encoder.encode_basestring
 
+
+def _slots_getstate(self):
+    return tuple(getattr(self, name) for name in self.__slots__)
+
+
+def _slots_setstate(self, state):
+    # Results pickled before the classes had slots carry a __dict__
+    if isinstance(state, dict):
+        state = tuple(state[name] for name in self.__slots__)
+    for name, value in zip(self.__slots__, state):
+        object.__setattr__(self, name, value)
+
+
+def _add_slots(cls):
+    # dataclass(slots=True) needs Python 3.10+, so rebuild the class with
+    # __slots__ the same way. Frozen classes also need explicit pickle
+    # state, as the default restore path would call the frozen __setattr__.
+    names = tuple(item.name for item in fields(cls))
+    namespace = dict(cls.__dict__)
+    for name in names + ("__dict__", "__weakref__"):
+        namespace.pop(name, None)
+    namespace["__slots__"] = names
+    namespace["__getstate__"] = _slots_getstate
+    namespace["__setstate__"] = _slots_setstate
+    slotted = type(cls)(cls.__name__, cls.__bases__, namespace)
+    slotted.__qualname__ = cls.__qualname__
+    return slotted
+
+
+@_add_slots
 @dataclass(frozen=True)
 class Item:
     title: str
@@ -46,7 +79,58 @@ class Item:
             data["icon"] = {"path": self.icon}
         return data
 
+    def to_json(self) -> str:
+        # Writes the to_alfred() mapping directly, byte for byte as
+        # json.dumps(..., ensure_ascii=False) would
+        parts = [
+            '{"title": ',
+            _encode_string(self.title),
+            ', "valid": true' if self.valid else ', "valid": false',
+        ]
+        if self.uid is not None:
+            parts += (', "uid": ', _encode_string(self.uid))
+        if self.subtitle is not None:
+            parts.append(_subtitle_fragment(self.subtitle))
+        if self.arg is not None:
+            arg = _encode_string(self.arg)
+            parts += (
+                ', "arg": ',
+                arg,
+                ', "text": {"copy": ',
+                (
+                    _encode_string(self.text_copy)
+                    if self.text_copy is not None
+                    else arg
+                ),
+                ', "largetype": ',
+                (
+                    _encode_string(self.text_largetype)
+                    if self.text_largetype is not None
+                    else arg
+                ),
+                '}',
+            )
+        if self.autocomplete is not None:
+            parts += (', "autocomplete": ', _encode_string(self.autocomplete))
+        if self.icon is not None:
+            parts.append(_icon_fragment(self.icon))
+        parts.append('}')
+        return ''.join(parts)
+
+
+# Subtitles and icon paths repeat across items and queries, so their
+# escaped JSON fragments are built once
+@functools.lru_cache(maxsize=1024)
+def _subtitle_fragment(subtitle: str) -> str:
+    return ', "subtitle": ' + _encode_string(subtitle)
+
+
+@functools.lru_cache(maxsize=1024)
+def _icon_fragment(icon: str) -> str:
+    return ', "icon": {"path": ' + _encode_string(icon) + '}'
 
+
+@_add_slots
 @dataclass(frozen=True)
 class Response:
     items: typing.List[Item] = field(default_factory=list)
@@ -63,6 +147,19 @@ class Response:
             data["rerun"] = self.rerun
         return data
 
+    def to_json(self) -> str:
+        parts = [
+            '{"items": [',
+            ', '.join([item.to_json() for item in self.items]),
+            ']',
+        ]
+        if self.skipknowledge:
+            parts.append(', "skipknowledge": true')
+        if self.rerun is not None:
+            parts += (', "rerun": ', json.dumps(self.rerun))
+        parts.append('}')
+        return ''.join(parts)
+
 
 def _valid_from_attrib(value: typing.Any) -> bool:
     if isinstance(value, bool):
@@ -77,24 +174,70 @@ def _optional_str(value: typing.Any) -> typing.Optional[str]:
 
 
 def item_creator():
-    def create_item(attrib=None, **kwargs):
-        attrib = attrib or {}
+    def create_item(title, subtitle=None, icon=None, attrib=None):
+        if attrib is None:
+            return Item(str(title), subtitle, icon=icon)
         return Item(
-            title=str(kwargs["title"]),
-            subtitle=kwargs.get("subtitle"),
-            icon=kwargs.get("icon"),
-            uid=_optional_str(attrib.get("uid")),
-            arg=_optional_str(attrib.get("arg")),
-            valid=_valid_from_attrib(attrib.get("valid", True)),
-            autocomplete=_optional_str(attrib.get("autocomplete")),
+            str(title),
+            subtitle,
+            _optional_str(attrib.get("arg")),
+            _optional_str(attrib.get("uid")),
+            _valid_from_attrib(attrib.get("valid", True)),
+            icon,
+            _optional_str(attrib.get("autocomplete")),
         )
 
     return create_item
 
 
 def render_json(response: Response) -> str:
-    return json.dumps(response.to_alfred(), ensure_ascii=False)
+    return response.to_json()
 
 
 def write_json(response: Response) -> None:
     sys.stdout.write(render_json(response))
+
+
+# Writes items as they are produced, byte for byte as Response.to_json()
+# would, and returns the number of items written
+def write_stream(
+    items: typing.Iterable[Item],
+    skipknowledge: bool = False,
+    rerun: typing.Optional[float] = None,
+    stream: typing.Optional[typing.TextIO] = None,
+) -> int:
+    stream = stream or sys.stdout
+    count = 0
+    stream.write('{"items": [')
+    for item in items:
+        if count:
+            stream.write(', ')
+        stream.write(item.to_json())
+        count += 1
+        if count == 1:
+            # Get the first result out without waiting for the rest
+            stream.flush()
+
+    parts = [']']
+    if skipknowledge:
+        parts.append(', "skipknowledge": true')
+    if rerun is not None:
+        parts += (', "rerun": ', json.dumps(rerun))
+    parts.append('}')
+    stream.write(''.join(parts))
+    return count
+
+
+# One JSON item per line, for batch consumers
+def write_ndjson(
+    items: typing.Iterable[Item],
+    stream: typing.Optional[typing.TextIO] = None,
+) -> int:
+    stream = stream or sys.stdout
+    count = 0
+    for item in items:
+        stream.write(item.to_json() + '\n')
+        count += 1
+        if count == 1:
+            stream.flush()
+    return count
@@ -0,0 +1,112 @@
+'''Profile a single query
+
+Run ``python -m converter profile "<query>"`` to run ``main.run`` a number
+of times under cProfile and print the hotspots. ``--collapsed FILE`` also
+samples the call stacks and writes them in the collapsed format that
+flamegraph.pl and speedscope read.
+'''
+import argparse
+import collections
+import cProfile
+import io
+import pstats
+import sys
+import threading
+import time
+
+from . import main as converter_main
+
+SORT_KEYS = ('cumulative', 'tottime', 'ncalls')
+
+
+def run_query(query, runs):
+    for _ in range(runs):
+        converter_main.run(query)
+
+
+def hotspots(query, runs=20, sort='cumulative', limit=30):
+    '''The cProfile report for `runs` runs of `query`, sorted by `sort`'''
+    profile = cProfile.Profile()
+    profile.runcall(run_query, query, runs)
+
+    report = io.StringIO()
+    stats = pstats.Stats(profile, stream=report)
+    stats.strip_dirs().sort_stats(sort).print_stats(limit)
+    return report.getvalue()
+
+
+def _frame_name(frame):
+    # Functions rather than lines, so flamegraphs merge the samples
+    module = frame.f_globals.get('__name__', '?')
+    return f'{module}:{frame.f_code.co_name}'
+
+
+class Sampler(object):
+    '''Samples the stack of one thread from a second thread
+
+    Nothing is traced, so the sampled code runs at full speed apart from
+    the sampler competing for the GIL.
+    '''
+
+    def __init__(self, thread_id, interval=0.001):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = collections.Counter()
+        self._stopped = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self):
+        while not self._stopped.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                stack.append(_frame_name(frame))
+                frame = frame.f_back
+            if stack:
+                self.stacks[';'.join(reversed(stack))] += 1
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._stopped.set()
+        self._thread.join()
+
+
+def collapsed_stacks(query, runs=20, interval=0.001):
+    '''Sampled stacks for `runs` runs of `query` as collapsed lines'''
+    with Sampler(threading.get_ident(), interval) as sampler:
+        run_query(query, runs)
+    return [
+        f'{stack} {count}'
+        for stack, count in sorted(sampler.stacks.items())
+    ]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m converter profile')
+    parser.add_argument('query')
+    parser.add_argument('-n', '--runs', type=int, default=20)
+    parser.add_argument('--sort', choices=SORT_KEYS, default='cumulative')
+    parser.add_argument('--limit', type=int, default=30)
+    parser.add_argument('--collapsed', metavar='FILE')
+    parser.add_argument('--interval', type=float, default=0.001)
+    args = parser.parse_args(argv)
+    query = ' '.join(args.query.split())
+
+    # Warm up first, so a one-off cache rebuild does not skew the report
+    run_query(query, 1)
+    started = time.perf_counter()
+    report = hotspots(query, args.runs, args.sort, args.limit)
+    sys.stdout.write(report)
+
+    if args.collapsed:
+        lines = collapsed_stacks(query, args.runs, args.interval)
+        with open(args.collapsed, 'w', encoding='utf-8') as fh:
+            fh.writelines(line + '\n' for line in lines)
+        sys.stdout.write(
+            f'Wrote {len(lines)} stacks to {args.collapsed} '
+            f'in {time.perf_counter() - started:.2f}s\n'
+        )
+    return 0
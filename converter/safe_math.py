@@ -1,8 +1,8 @@
+import cmath
 import decimal
 import functools
-import re
-
 import math
+import re
 
 from . import constants
 
@@ -28,31 +28,57 @@ for k in constants.MATH_FUNCTIONS:
         safe_dict[k] = functools.partial(decimal_math, k)
 
 
-# The following methods are copied from the Python manual:
-# https://docs.python.org/3/library/decimal.html#decimal-recipes
+# Guard digits for intermediate steps
+GUARD_DIGITS = 5
+# Safety bound on series terms, far above what reduced arguments need
+MAX_TERMS_PER_DIGIT = 4
+
+
+def _is_decimal(x):
+    return isinstance(x, decimal.Decimal)
+
+
+def _complex_or_real(x, real, complex_):
+    if isinstance(x, complex):
+        return complex_(x)
+    return real(x)
+
+
+@functools.lru_cache(maxsize=16)
+def _pi(precision):
+    # Based on the pi() recipe from the Python manual:
+    # https://docs.python.org/3/library/decimal.html#decimal-recipes
+    with decimal.localcontext() as context:
+        context.prec = precision + 2
+        three = decimal.Decimal(3)
+        lasts, t, s, n, na, d, da = 0, three, 3, 1, 0, 0, 24
+        while s != lasts:
+            lasts = s
+            n, na = n + na, na + 8
+            d, da = d + da, da + 32
+            t = (t * n) / d
+            s += t
+    with decimal.localcontext() as context:
+        context.prec = precision
+        return +s
+
+
 def pi():
-    """Compute Pi to the current precision.
+    """Compute Pi to the current precision, cached per precision.
 
     >>> print(pi())
     3.141592653589793238462643383
 
     """
-    decimal.getcontext().prec += 2  # extra digits for intermediate steps
-    three = decimal.Decimal(3)  # substitute "three=3.0" for regular floats
-    lasts, t, s, n, na, d, da = 0, three, 3, 1, 0, 0, 24
-    while s != lasts:
-        lasts = s
-        n, na = n + na, na + 8
-        d, da = d + da, da + 32
-        t = (t * n) / d
-        s += t
-    decimal.getcontext().prec -= 2
-    return +s  # unary plus applies the new precision
+    return _pi(decimal.getcontext().prec)
 
 
 def exp(x):
     """Return e raised to the power of x.  Result type matches input type.
 
+    Decimals use Decimal.exp(), which reduces the argument itself and is
+    correctly rounded, so exp(200) does not need hundreds of series terms.
+
     >>> print(exp(decimal.Decimal(1)))
     2.718281828459045235360287471
     >>> print(exp(decimal.Decimal(2)))
@@ -63,79 +89,245 @@ def exp(x):
     (7.38905609893...+0j)
 
     """
-    decimal.getcontext().prec += 2
-    i, lasts, s, fact, num = 0, 0, 1, 1, 1
-    while s != lasts:
-        lasts = s
-        i += 1
-        fact *= i
-        num *= x
-        s += num / fact
-    decimal.getcontext().prec -= 2
-    return +s
+    if _is_decimal(x):
+        return x.exp()
+    return _complex_or_real(x, math.exp, cmath.exp)
+
+
+def _sin_cos_series(x, start):
+    # Taylor series for sin (start=1) or cos (start=0), for |x| <= pi/4
+    context = decimal.getcontext()
+    term = x if start else decimal.Decimal(1)
+    total = term
+    square = x * x
+    limit = decimal.Decimal(1).scaleb(-context.prec - 1)
+    i = start
+    for _ in range(MAX_TERMS_PER_DIGIT * context.prec):
+        i += 2
+        term = -term * square / (i * (i - 1))
+        total += term
+        if abs(term) < limit:
+            break
+    return total
+
+
+def _sin_cos(x):
+    # Reduce x to r in [-pi/4, pi/4] with x = r + quadrant * pi/2. Large
+    # arguments lose one digit per order of magnitude to the reduction, so
+    # pi gets as many extra digits.
+    precision = decimal.getcontext().prec
+    with decimal.localcontext() as context:
+        context.prec = precision + GUARD_DIGITS + max(0, x.adjusted())
+        half_pi = pi() / 2
+        quadrant = (x / half_pi).to_integral_value(decimal.ROUND_HALF_EVEN)
+        reduced = x - quadrant * half_pi
+        context.prec = precision + GUARD_DIGITS
+        sin = _sin_cos_series(reduced, 1)
+        cos = _sin_cos_series(reduced, 0)
+
+    quadrant = int(quadrant) % 4
+    if quadrant == 1:
+        sin, cos = cos, -sin
+    elif quadrant == 2:
+        sin, cos = -sin, -cos
+    elif quadrant == 3:
+        sin, cos = -cos, sin
+    return sin, cos
 
 
 def cos(x):
     """Return the cosine of x as measured in radians.
 
-    The Taylor series approximation works best for a small value of x.
-    For larger values, first compute x = x % (2 * pi).
+    Decimal arguments are reduced to [-pi/4, pi/4] first, so cos(1000)
+    stays fast and accurate.
 
     >>> print(cos(decimal.Decimal('0.5')))
     0.8775825618903727161162815826
+    >>> print(cos(decimal.Decimal(1000)))
+    0.5623790762907029910782492266
     >>> print(cos(0.5))
     0.87758256189...
-    >>> print(cos(0.5+0j))
-    (0.87758256189...+0j)
+    >>> print(cos(0.5+0j).real)
+    0.87758256189...
 
     """
-    decimal.getcontext().prec += 2
-    i, lasts, s, fact, num, sign = 0, 0, 1, 1, 1, 1
-    while s != lasts:
-        lasts = s
-        i += 2
-        fact *= i * (i - 1)
-        num *= x * x
-        sign *= -1
-        s += num / fact * sign
-    decimal.getcontext().prec -= 2
-    return +s
+    if _is_decimal(x):
+        if not x.is_finite():
+            raise decimal.InvalidOperation(x)
+        return +_sin_cos(x)[1]
+    return _complex_or_real(x, math.cos, cmath.cos)
 
 
 def sin(x):
     """Return the sine of x as measured in radians.
 
-    The Taylor series approximation works best for a small value of x.
-    For larger values, first compute x = x % (2 * pi).
-
     >>> print(sin(decimal.Decimal('0.5')))
     0.4794255386042030002732879352
+    >>> print(sin(decimal.Decimal(1000)))
+    0.8268795405320025602558874291
     >>> print(sin(0.5))
     0.479425538604...
     >>> print(sin(0.5+0j))
     (0.479425538604...+0j)
 
     """
-    decimal.getcontext().prec += 2
-    i, lasts, s, fact, num, sign = 1, 0, x, 1, x, 1
-    while s != lasts:
-        lasts = s
-        i += 2
-        fact *= i * (i - 1)
-        num *= x * x
-        sign *= -1
-        s += num / fact * sign
-    decimal.getcontext().prec -= 2
-    return +s
+    if _is_decimal(x):
+        if not x.is_finite():
+            raise decimal.InvalidOperation(x)
+        return +_sin_cos(x)[0]
+    return _complex_or_real(x, math.sin, cmath.sin)
+
+
+def tan(x):
+    """Return the tangent of x as measured in radians.
+
+    >>> print(tan(decimal.Decimal(1)))
+    1.557407724654902230506974807
+    """
+    if _is_decimal(x):
+        if not x.is_finite():
+            raise decimal.InvalidOperation(x)
+        with decimal.localcontext() as context:
+            context.prec += GUARD_DIGITS
+            sin, cos = _sin_cos(x)
+            result = sin / cos
+        return +result
+    return _complex_or_real(x, math.tan, cmath.tan)
+
+
+def log(x, base=None):
+    """Return the logarithm of x to the given base, natural by default.
+
+    >>> print(log(decimal.Decimal(8), decimal.Decimal(2)))
+    3.000000000000000000000000000
+    >>> print(log(exp(decimal.Decimal(10))))
+    10.00000000000000000000000000
+    """
+    if not _is_decimal(x) or (base is not None and not _is_decimal(base)):
+        if base is None:
+            return math.log(x)
+        return math.log(x, base)
+    if x <= 0 or (base is not None and base <= 0):
+        # Like math.log, rather than a NaN or -Infinity
+        raise ValueError('math domain error')
+
+    with decimal.localcontext() as context:
+        context.prec += GUARD_DIGITS
+        result = x.ln()
+        if base is not None:
+            result /= base.ln()
+    return +result
+
+
+def log2(x):
+    """Return the base 2 logarithm of x.
+
+    >>> log2(decimal.Decimal(1024)) == 10
+    True
+    """
+    return log(x, decimal.Decimal(2) if _is_decimal(x) else 2)
+
+
+def log1p(x):
+    """Return the natural logarithm of 1 + x, accurate for x near zero.
+
+    >>> print(log1p(decimal.Decimal('1E-20')))
+    9.999999999999999999950000000E-21
+    """
+    if not _is_decimal(x):
+        return math.log1p(x)
+    with decimal.localcontext() as context:
+        # 1 + x needs every digit of x to keep the relative precision
+        context.prec += GUARD_DIGITS + max(0, -x.adjusted())
+        result = log(1 + x)
+    return +result
+
+
+def expm1(x):
+    """Return e raised to the power of x, minus 1, accurate for x near zero.
+
+    >>> print(expm1(decimal.Decimal('1E-20')))
+    1.000000000000000000005000000E-20
+    """
+    if not _is_decimal(x):
+        return math.expm1(x)
+    with decimal.localcontext() as context:
+        context.prec += GUARD_DIGITS + max(0, -x.adjusted())
+        result = x.exp() - 1
+    return +result
+
+
+def _hyperbolic(x, sign):
+    # (e^|x| + sign * e^-|x|) / 2, with the sign of x applied afterwards so
+    # e^-|x| is never a divisor that underflowed to zero
+    with decimal.localcontext() as context:
+        context.prec += GUARD_DIGITS + max(0, -x.adjusted())
+        positive = abs(x).exp()
+        result = (positive + sign / positive) / 2
+    if sign < 0:
+        result = result.copy_sign(x)
+    return +result
+
+
+def cosh(x):
+    """Return the hyperbolic cosine of x.
+
+    >>> print(cosh(decimal.Decimal(1)))
+    1.543080634815243778477905621
+    """
+    if not _is_decimal(x):
+        return math.cosh(x)
+    return _hyperbolic(x, 1)
+
+
+def sinh(x):
+    """Return the hyperbolic sine of x.
+
+    >>> print(sinh(decimal.Decimal(1)))
+    1.175201193643801456882381851
+    """
+    if not _is_decimal(x):
+        return math.sinh(x)
+    if x.is_zero():
+        return x
+    return _hyperbolic(x, -1)
+
+
+def tanh(x):
+    """Return the hyperbolic tangent of x.
+
+    Computed from expm1(-2|x|), which never overflows, so large arguments
+    round to 1 or -1.
+
+    >>> print(tanh(decimal.Decimal(1)))
+    0.7615941559557648881194582826
+    >>> print(tanh(decimal.Decimal(-10000000)))
+    -1
+    """
+    if not _is_decimal(x):
+        return math.tanh(x)
+    if x.is_zero():
+        return x
+    with decimal.localcontext() as context:
+        context.prec += GUARD_DIGITS
+        # tanh(|x|) = -expm1(-2|x|) / (2 + expm1(-2|x|))
+        negative = expm1(-2 * abs(x))
+        result = (-negative / (2 + negative)).copy_sign(x)
+    return +result
 
 
 safe_dict['abs'] = abs
 safe_dict['Decimal'] = decimal.Decimal
-safe_dict['e'] = decimal.Decimal(math.e)
+# Guard digits keep e^x accurate, so ln(e^10) comes out as exactly 10
+with decimal.localcontext() as _context:
+    _context.prec += GUARD_DIGITS
+    safe_dict['e'] = exp(decimal.Decimal(1))
 safe_dict['pi'] = pi()
-safe_dict['exp'] = exp
-safe_dict['cos'] = cos
-safe_dict['sin'] = sin
+# Decimal versions, instead of the float fallback of decimal_math
+for _function in (
+    exp, cos, sin, tan, log, log2, log1p, expm1, cosh, sinh, tanh,
+):
+    safe_dict[_function.__name__] = _function
 safe_dict['inf'] = decimal.Decimal('Inf')
 safe_dict['infinity'] = decimal.Decimal('Inf')
 
@@ -0,0 +1,95 @@
+'''Workflow settings resolved from the environment once
+
+`current()` parses the environment variables the query path depends on into
+a frozen `Settings` snapshot and only parses them again when one of them
+changes, so long running processes pick up new settings without paying for
+the parsing on every query.
+'''
+from __future__ import annotations
+
+import functools
+import os
+import re
+import typing
+from dataclasses import dataclass
+
+from .utils import get_env_flag
+
+BASES = (16, 8, 2)
+ENV_NAMES = (
+    'UNITS_SIDE',
+    'MAX_MAGNITUDE',
+    'UNITS_BLACKLIST',
+    'alfred_theme_background',
+    'CURRENCY_DEFAULT_TARGETS',
+    *(f'BASE_{base}' for base in BASES),
+)
+
+
+@dataclass(frozen=True)
+class Settings:
+    units_left: bool = False
+    max_magnitude: int = 3
+    color_prefix: str = ''
+    # Lowercase words, a unit is hidden when its name contains one
+    blacklist: typing.FrozenSet[str] = frozenset()
+    bases: typing.Tuple[int, ...] = BASES
+    # None means the built-in default targets
+    currency_targets: typing.Optional[typing.Tuple[str, ...]] = None
+
+    def blacklisted_ids(self, units) -> typing.FrozenSet[str]:
+        if not self.blacklist:
+            return frozenset()
+        return _blacklisted_ids(units, self.blacklist)
+
+
+@functools.lru_cache(maxsize=8)
+def _blacklisted_ids(units, blacklist):
+    return frozenset(
+        unit.id
+        for unit in units.ids.values()
+        if set(unit.name.lower().split()) & blacklist
+    )
+
+
+def color_prefix(background):
+    if background.startswith('rgba'):  # pragma: no cover
+        # Format: 'rgba(r,g,b,a)'
+        channel = background[5:-1].split(',')
+        red, green, blue = channel[:3]
+        # Reference: stackoverflow.com/questions/9780632/
+        grey = 0.2126 * int(red) + 0.7152 * int(green) + 0.0722 * int(blue)
+        if grey < 128:
+            return 'inv-'
+    return ''
+
+
+def from_environ() -> Settings:
+    environ = os.environ
+    targets = environ.get('CURRENCY_DEFAULT_TARGETS')
+    return Settings(
+        units_left=environ.get('UNITS_SIDE', '').lower() == 'left',
+        max_magnitude=int(environ.get('MAX_MAGNITUDE', '3'), 10),
+        color_prefix=color_prefix(environ.get('alfred_theme_background', '')),
+        blacklist=frozenset(
+            environ.get('UNITS_BLACKLIST', '').lower().split()
+        ),
+        bases=tuple(base for base in BASES if get_env_flag(f'BASE_{base}')),
+        currency_targets=(
+            None
+            if targets is None
+            else tuple(re.split(r'[\s,]+', targets.strip()))
+        ),
+    )
+
+
+_snapshot: typing.Optional[Settings] = None
+_snapshot_key: typing.Optional[tuple] = None
+
+
+def current() -> Settings:
+    global _snapshot, _snapshot_key
+    key = tuple(os.environ.get(name) for name in ENV_NAMES)
+    if _snapshot is None or key != _snapshot_key:
+        _snapshot, _snapshot_key = from_environ(), key
+    return _snapshot
@@ -0,0 +1,215 @@
+from __future__ import annotations
+
+import contextlib
+import datetime as dt
+import hashlib
+import json
+import os
+import pickle
+import sqlite3
+import threading
+
+STORE_ENV = 'CONVERTER_STORE'
+STORE_FILENAME = 'converter.sqlite3'
+STORE_TIMEOUT = 10
+# Most recently used unit query results kept by the result cache
+RESULT_CACHE_SIZE = 500
+# Cache hits only write when the last use recorded for a result is older
+# than this, so repeated keystrokes stay read-only
+RESULT_REFRESH_INTERVAL = dt.timedelta(minutes=10)
+# Environment that changes how unit query results are rendered
+RESULT_ENV_NAMES = (
+    'BASE_2',
+    'BASE_8',
+    'BASE_16',
+    'DECIMAL_SEPARATOR',
+    'FRACTIONAL_MAX_DEVIATION',
+    'FRACTIONAL_UNITS',
+    'FRACTION_PRECISION',
+    'MAX_MAGNITUDE',
+    'OUTPUT_DECIMALS',
+    'UNITS_BLACKLIST',
+    'UNITS_SIDE',
+    'UNITS_XML_FILE',
+    'alfred_theme_background',
+)
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS units (
+    key TEXT PRIMARY KEY,
+    payload BLOB NOT NULL
+);
+CREATE TABLE IF NOT EXISTS rate_tables (
+    base TEXT PRIMARY KEY,
+    data TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS results (
+    key TEXT PRIMARY KEY,
+    payload BLOB NOT NULL,
+    used_at TEXT NOT NULL
+);
+'''
+
+
+def enabled():
+    return os.environ.get(STORE_ENV, '').strip().lower() == 'sqlite'
+
+
+def store_path(base_dir=None):
+    root = base_dir or os.environ.get('alfred_workflow_cache') or os.getcwd()
+    return os.path.join(root, STORE_FILENAME)
+
+
+class Store:
+    # One connection per process and file. WAL mode lets readers run while a
+    # refresh writes, and every write is a single transaction, so a group of
+    # rate tables is replaced atomically.
+
+    def __init__(self, path):
+        self.path = path
+        self._connection = None
+        self._mutex = threading.RLock()
+
+    def _connect(self):
+        if self._connection is None:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            connection = sqlite3.connect(
+                self.path,
+                timeout=STORE_TIMEOUT,
+                check_same_thread=False,
+            )
+            try:
+                connection.execute('PRAGMA journal_mode=WAL')
+                connection.execute('PRAGMA synchronous=NORMAL')
+                connection.executescript(SCHEMA)
+            except BaseException:
+                connection.close()
+                raise
+            self._connection = connection
+        return self._connection
+
+    @contextlib.contextmanager
+    def transaction(self):
+        with self._mutex:
+            connection = self._connect()
+            with connection:
+                yield connection
+
+    def close(self):
+        with self._mutex:
+            if self._connection is not None:
+                self._connection.close()
+                self._connection = None
+
+    def units(self, key):
+        with self.transaction() as connection:
+            row = connection.execute(
+                'SELECT payload FROM units WHERE key = ?',
+                (key,),
+            ).fetchone()
+        return None if row is None else row[0]
+
+    def save_units(self, key, payload):
+        # Only the snapshot for the current key is worth keeping
+        with self.transaction() as connection:
+            connection.execute('DELETE FROM units WHERE key != ?', (key,))
+            connection.execute(
+                'INSERT OR REPLACE INTO units (key, payload) VALUES (?, ?)',
+                (key, payload),
+            )
+
+    def rate_table(self, base):
+        with self.transaction() as connection:
+            row = connection.execute(
+                'SELECT data FROM rate_tables WHERE base = ?',
+                (base,),
+            ).fetchone()
+        return None if row is None else json.loads(row[0])
+
+    def rate_table_bases(self):
+        with self.transaction() as connection:
+            rows = connection.execute(
+                'SELECT base FROM rate_tables ORDER BY base'
+            ).fetchall()
+        return tuple(base for base, in rows)
+
+    def write_rate_tables(self, tables):
+        with self.transaction() as connection:
+            connection.executemany(
+                'INSERT OR REPLACE INTO rate_tables (base, data) '
+                'VALUES (?, ?)',
+                [
+                    (base, json.dumps(data, sort_keys=True))
+                    for base, data in tables
+                ],
+            )
+
+    def cached_response(self, key):
+        now = _utcnow()
+        with self.transaction() as connection:
+            row = connection.execute(
+                'SELECT payload, used_at FROM results WHERE key = ?',
+                (key,),
+            ).fetchone()
+            if row is None:
+                return None
+            payload, used_at = row
+            # ISO timestamps in UTC sort like the times they stand for
+            if used_at < (now - RESULT_REFRESH_INTERVAL).isoformat():
+                connection.execute(
+                    'UPDATE results SET used_at = ? WHERE key = ?',
+                    (now.isoformat(), key),
+                )
+        return pickle.loads(payload)
+
+    def save_response(self, key, response):
+        with self.transaction() as connection:
+            connection.execute(
+                'INSERT OR REPLACE INTO results (key, payload, used_at) '
+                'VALUES (?, ?, ?)',
+                (key, pickle.dumps(response, -1), _utcnow().isoformat()),
+            )
+            connection.execute(
+                'DELETE FROM results WHERE key IN ('
+                'SELECT key FROM results ORDER BY used_at DESC '
+                'LIMIT -1 OFFSET ?)',
+                (RESULT_CACHE_SIZE,),
+            )
+
+
+def _utcnow():
+    return dt.datetime.now(dt.timezone.utc)
+
+
+def result_key(query, units_key=''):
+    environment = {
+        name: os.environ.get(name) for name in RESULT_ENV_NAMES
+    }
+    fingerprint = json.dumps(
+        [query, units_key, environment],
+        sort_keys=True,
+    )
+    return hashlib.sha256(fingerprint.encode('utf-8')).hexdigest()
+
+
+_stores = {}
+_stores_mutex = threading.Lock()
+
+
+def open_store(base_dir=None):
+    path = os.path.abspath(store_path(base_dir))
+    with _stores_mutex:
+        store = _stores.get(path)
+        if store is None:
+            store = _stores[path] = Store(path)
+        return store
+
+
+def close_stores():
+    with _stores_mutex:
+        stores = list(_stores.values())
+        _stores.clear()
+    for store in stores:
+        store.close()
@@ -0,0 +1,117 @@
+'''Opt-in per-stage timings for script filter runs
+
+Set ``CONVERTER_TRACE=1`` to append one JSON line per query to
+``trace.jsonl`` in the workflow cache dir. Each line holds the wall-clock
+duration of every stage that ran, so slow keystrokes can be traced back to
+the stage that caused them.
+'''
+import json
+import os
+import time
+
+TRACE_ENV = 'CONVERTER_TRACE'
+TRACE_FILENAME = 'trace.jsonl'
+
+_current = None
+
+
+def enabled():
+    value = os.environ.get(TRACE_ENV, '')
+    return value.strip().lower() in {'true', '1', 'yes', 't', 'y'}
+
+
+def trace_path(base_dir=None):
+    root = base_dir or os.environ.get('alfred_workflow_cache') or os.getcwd()
+    return os.path.join(root, TRACE_FILENAME)
+
+
+class Trace(object):
+    def __init__(self, query):
+        self.query = query
+        self.started = time.perf_counter()
+        self.stages = {}
+
+    def add(self, name, seconds, fields):
+        # Stages like format_units run once per result, so repeats are
+        # summed and counted instead of being listed one by one
+        stage = self.stages.get(name)
+        if stage is None:
+            stage = self.stages[name] = {'seconds': 0.0, 'count': 0}
+        stage['seconds'] += seconds
+        stage['count'] += 1
+        stage.update(fields)
+
+    def to_json(self):
+        return json.dumps(dict(
+            time=time.time(),
+            query=self.query,
+            seconds=time.perf_counter() - self.started,
+            stages=self.stages,
+        ), sort_keys=True)
+
+
+class _Stage(object):
+    __slots__ = ('trace', 'name', 'fields', 'started')
+
+    def __init__(self, trace, name):
+        self.trace = trace
+        self.name = name
+        self.fields = {}
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        # Callers can add details, e.g. whether a cache was hit
+        return self.fields
+
+    def __exit__(self, *exc_info):
+        seconds = time.perf_counter() - self.started
+        self.trace.add(self.name, seconds, self.fields)
+
+
+class _NullStage(object):
+    __slots__ = ()
+
+    def __enter__(self):
+        return {}
+
+    def __exit__(self, *exc_info):
+        pass
+
+
+_null_stage = _NullStage()
+
+
+def stage(name):
+    # Outside of a traced query this is a shared no-op, so the hot paths
+    # only pay for a global lookup when tracing is off
+    if _current is None:
+        return _null_stage
+    return _Stage(_current, name)
+
+
+def record(name, seconds, **fields):
+    if _current is not None:
+        _current.add(name, seconds, fields)
+
+
+def start(query):
+    global _current
+    if enabled():
+        _current = Trace(query)
+    return _current
+
+
+def finish(base_dir=None):
+    global _current
+    trace, _current = _current, None
+    if trace is None:
+        return None
+
+    line = trace.to_json()
+    try:
+        with open(trace_path(base_dir), 'a', encoding='utf-8') as fh:
+            fh.write(line + '\n')
+    except OSError:  # pragma: no cover
+        # Tracing must never break the query itself
+        pass
+    return trace
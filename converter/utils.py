@@ -3,7 +3,9 @@ from __future__ import print_function, annotations
 import contextlib
 import decimal
 import fractions
+import math
 import os
+import typing
 
 from converter import safe_math, constants
 
@@ -45,6 +47,14 @@ def get_env_flag(name, default=True):
     return value.lower() in {'true', '1', 'yes', 't', 'y'}
 
 
+_QUANTIZE_PRECISION = 50
+# Shared instead of a new localcontext per call. Only the flags change when
+# quantizing, and nothing reads them.
+_QUANTIZE_CONTEXT = decimal.Context(prec=_QUANTIZE_PRECISION)
+# Quantum per OUTPUT_DECIMALS value
+_QUANTA: typing.Dict[int, decimal.Decimal] = {}
+
+
 def decimal_to_string(value: decimal.Decimal) -> str:
     '''This strips trailing zeros without converting to 0e0 for 0
 
@@ -61,19 +71,115 @@ def decimal_to_string(value: decimal.Decimal) -> str:
     >>> decimal_to_string(decimal.Decimal('1'))
     '1'
     '''
-    with decimal.localcontext() as context:
-        context.prec = 50
-        value = value.quantize(
-            decimal.Decimal(10) ** -constants.OUTPUT_DECIMALS, context=context
-        )
+    decimals = constants.OUTPUT_DECIMALS
+    string = str(value)
+    # Values that already fit the output precision only need their
+    # trailing zeros trimmed, which is far cheaper than quantizing. Anything
+    # in exponent notation, special or close to the context precision takes
+    # the quantize path.
+    if len(string) + decimals < _QUANTIZE_PRECISION:
+        point = string.find('.')
+        if point == -1:
+            if string.lstrip('-').isdigit():
+                return string
+        elif (
+            len(string) - point - 1 <= decimals
+            and string[point + 1:].isdigit()
+        ):
+            return string.rstrip('0').rstrip('.')
+
+    quantum = _QUANTA.get(decimals)
+    if quantum is None:
+        quantum = _QUANTA[decimals] = decimal.Decimal(10) ** -decimals
+    string = str(value.quantize(quantum, context=_QUANTIZE_CONTEXT))
+    if '.' in string:
+        string = string.rstrip('0').rstrip('.')
+    return string
+
+
+def _fraction_parts(value):
+    if isinstance(value, (int, fractions.Fraction)):
+        return value.numerator, value.denominator
+    return fractions.Fraction(value).as_integer_ratio()
+
+
+def _approximate_fraction(
+    value, limit=constants.FRACTIONAL_PRECISION.denominator
+):
+    '''The reduced numerator and denominator to show for `value`, whether
+    they are approximated and None if the approximation deviates too much
+
+    Equivalent to rounding a `fractions.Fraction` to `limit` but using
+    integers only, as this runs for every fractional result.
+
+    >>> _approximate_fraction(fractions.Fraction('3/2'))
+    (3, 2, False)
+    >>> _approximate_fraction(fractions.Fraction('15/64'), limit=4)
+    (1, 4, True)
+    >>> _approximate_fraction(fractions.Fraction('1/3'), limit=2)
+    '''
+    numerator, denominator = _fraction_parts(value)
+    if not limit or denominator <= limit:
+        return numerator, denominator, False
+
+    # Round numerator * limit / denominator half to even, like round() on
+    # a Fraction does
+    scaled = numerator * limit
+    rounded, remainder = divmod(scaled, denominator)
+    if 2 * remainder > denominator or (
+        2 * remainder == denominator and rounded % 2
+    ):
+        rounded += 1
+
+    # Deviation in percent: 100 * |approximate - value| / |value| with
+    # both sides multiplied by limit * denominator
+    if (
+        100 * abs(rounded * denominator - scaled)
+        > constants.FRACTIONAL_MAX_DEVIATION * abs(scaled)
+    ):
+        return None
+
+    divisor = math.gcd(rounded, limit)
+    return rounded // divisor, limit // divisor, True
+
+
+def fraction_to_strings(
+    value, limit=constants.FRACTIONAL_PRECISION.denominator
+):
+    '''Both `fraction_to_string` forms of `value`, computed in one pass
+
+    :return: (fraction, proper fraction), either can be None
+
+    >>> fraction_to_strings(fractions.Fraction('7/4'))
+    ('7/4', '1 3/4')
+    >>> fraction_to_strings(fractions.Fraction('1/3'))
+    ('1/3', None)
+    >>> fraction_to_strings(fractions.Fraction('1/3'), limit=2)
+    (None, None)
+    '''
+    approximate = _approximate_fraction(value, limit)
+    if approximate is None:
+        return None, None
+
+    numerator, denominator, approximated = approximate
+    prefix = '~' if approximated else ''
+    if denominator == 1:
+        fraction = f'{prefix}{numerator}'
+    else:
+        fraction = f'{prefix}{numerator}/{denominator}'
 
-        return str(value).rstrip('0').rstrip('.')
+    proper = None
+    if numerator > denominator:
+        # Reduced, so the remainder is reduced over denominator as well
+        major, minor = divmod(numerator, denominator)
+        if minor:
+            proper = f'{prefix}{major} {minor}/{denominator}'
+    return fraction, proper
 
 
 def fraction_to_string(
     value, proper=False, limit=constants.FRACTIONAL_PRECISION.denominator
 ):
-    # sourcery skip: remove-unnecessary-else, swap-if-else-branches
     '''Converts a decimal to a string fraction
 
 
@@ -98,25 +204,5 @@ def fraction_to_string(
     >>> fraction_to_string(fractions.Fraction('7/4'), proper=True)
     '1 3/4'
     '''
-    fraction = fractions.Fraction(value)
-    prefix = ''
-    if limit and fraction.denominator > limit:
-        # Convert the fraction to the closest available fraction with the
-        # highest allowed denominator
-        approximate = fractions.Fraction(round(fraction * limit), limit)
-        deviation = abs((100 * approximate / fraction) - 100)
-        prefix = '~'
-
-        fraction = approximate
-
-        if deviation > constants.FRACTIONAL_MAX_DEVIATION:
-            return
-
-    if proper:
-        if fraction.numerator > fraction.denominator:
-            major = int(fraction.numerator / fraction.denominator)
-            fraction %= major
-            if major and fraction:
-                return f'{prefix}{major} {fraction}'
-    else:
-        return prefix + str(fraction)
+    fraction, proper_fraction = fraction_to_strings(value, limit)
+    return proper_fraction if proper else fraction
@@ -0,0 +1,66 @@
+import json
+
+import pytest
+
+from converter import benchmark
+
+
+def test_benchmarks_time_registered_callables(capsys):
+    assert benchmark.main(['render_json_20', '--repeat', '1']) == 0
+
+    name, timing = capsys.readouterr().out.strip().split(': ')
+    assert name == 'render_json_20'
+    assert float(timing.split()[0]) > 0
+
+
+def test_benchmarks_reject_unknown_names(capsys):
+    with pytest.raises(SystemExit):
+        benchmark.main(['missing'])
+
+    assert 'unknown benchmark: missing' in capsys.readouterr().err
+
+
+def test_benchmark_registry_runs_every_setup(monkeypatch):
+    monkeypatch.setattr(
+        benchmark,
+        'time_call',
+        lambda function, repeat: function() and 1.0,
+    )
+
+    timings = benchmark.run()
+
+    assert sorted(timings) == sorted(benchmark.BENCHMARKS)
+    assert set(timings.values()) == {1.0}
+
+
+def test_benchmarks_cover_every_query_class():
+    for name in (
+        'cold_start', 'registry_load_xml', 'registry_load_pickle',
+        'warm_math', 'warm_unit', 'warm_fractional', 'warm_split',
+        'warm_currency', 'batch_stream', 'batch_corpus',
+    ):
+        assert name in benchmark.BENCHMARKS
+
+
+def test_compare_reports_regressions_over_threshold():
+    baseline = {'fast': 1.0, 'slow': 1.0, 'removed': 1.0}
+    timings = {'fast': 1.2, 'slow': 2.0, 'new': 5.0}
+
+    assert benchmark.compare(timings, baseline, 1.5) == {'slow': (1.0, 2.0)}
+
+
+def test_benchmarks_save_and_check_baseline(capsys, monkeypatch, tmp_path):
+    path = tmp_path / 'baseline.json'
+    timings = {'render_json_20': 1.0}
+    monkeypatch.setattr(
+        benchmark, 'run', lambda names, repeat: dict(timings)
+    )
+
+    assert benchmark.main(['--save', str(path)]) == 0
+    assert json.loads(path.read_text()) == timings
+    assert benchmark.main(['--baseline', str(path)]) == 0
+
+    timings['render_json_20'] = 2.0
+    capsys.readouterr()
+    assert benchmark.main(['--baseline', str(path)]) == 1
+    assert 'REGRESSION render_json_20' in capsys.readouterr().out
@@ -199,8 +199,8 @@ def test_explicit_target_match_beats_identity(monkeypatch, units):
 
 
 def test_log_functions_keep_scientific_meaning():
-    assert str(safe_math.safe_eval("log(e^10)")) == "10"
-    assert str(safe_math.safe_eval(convert.clean_query("ln(e^10)"))) == "10"
+    assert safe_math.safe_eval("log(e^10)") == 10
+    assert safe_math.safe_eval(convert.clean_query("ln(e^10)")) == 10
     assert str(safe_math.safe_eval("log10(e^10)")) == (
-        "4.342944819032518045543160246"
+        "4.342944819032518276511289189"
     )
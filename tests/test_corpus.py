@@ -0,0 +1,55 @@
+from converter import constants, convert, corpus, currency, output
+
+
+def test_corpus_is_reproducible(units):
+    assert corpus.generate(units, 200, seed=1) == corpus.generate(
+        units, 200, seed=1
+    )
+    assert corpus.generate(units, 200, seed=1) != corpus.generate(
+        units, 200, seed=2
+    )
+
+
+def test_corpus_covers_the_registry(units):
+    pools = corpus.categories(units)
+
+    assert set(pools) == set(corpus.WEIGHTS)
+    assert len(pools['unit']) == len(units.annotations)
+    spellings = {
+        spelling
+        for spellings in constants.ANNOTATION_REPLACEMENTS.values()
+        for spelling in spellings
+    }
+    assert {query.split(' ', 1)[1] for query in pools['spelling']} == (
+        spellings
+    )
+    sources = {query.split()[1] for query in pools['currency']}
+    assert sources == set(currency.CURRENCY_CODES)
+
+
+def test_generate_follows_weights(units):
+    queries = corpus.generate(units, 50, weights={'number_base': 1})
+
+    assert len(queries) == 50
+    assert all(query.startswith('0x') for query in queries)
+
+
+def test_keystrokes_expand_typed_prefixes(units):
+    assert list(corpus.keystrokes('1 m')) == ['1', '1 m']
+
+    queries = corpus.generate(units, 10, typed=True)
+    assert len(queries) > 10
+
+
+def test_corpus_queries_convert(units):
+    weights = dict(corpus.WEIGHTS, currency=0)
+    create_item = output.item_creator()
+
+    for query in corpus.generate(units, 100, weights=weights):
+        list(convert.main(units, query, create_item))
+
+
+def test_corpus_main_prints_queries(capsys):
+    assert corpus.main(['--size', '5', '--seed', '3']) == 0
+
+    assert len(capsys.readouterr().out.splitlines()) == 5
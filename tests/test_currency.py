@@ -1,12 +1,19 @@
 import contextlib
 import datetime as dt
 import decimal
+import gzip
+import http.server
 import json
 import os
 import shutil
 import struct
+import subprocess
+import sys
+import threading
+import time
 import urllib.error
 import zlib
+from dataclasses import replace
 from pathlib import Path
 
 import pytest
@@ -775,6 +782,290 @@ def test_convert_with_stale_cache_does_not_refresh_synchronously(
     assert launched == [(tmp_path, "isk")]
 
 
+def test_derive_rate_cache_uses_cross_rates():
+    cache = currency.RateCache(
+        base="eur",
+        date=dt.date(2026, 4, 24),
+        fetched_at=dt.date(2026, 4, 25),
+        rates={
+            "isk": decimal.Decimal("160"),
+            "usd": decimal.Decimal("1.2"),
+        },
+    )
+
+    derived = currency.derive_rate_cache(cache, "isk")
+
+    assert derived.base == "isk"
+    assert derived.date == cache.date
+    assert derived.fetched_at == cache.fetched_at
+    assert derived.rates == {
+        "eur": decimal.Decimal("0.00625"),
+        "usd": decimal.Decimal("0.0075"),
+    }
+    assert currency.derive_rate_cache(cache, "eur") is cache
+    assert currency.derive_rate_cache(cache, "gbp") is None
+
+
+def test_cached_bases_lists_rate_tables_only(tmp_path):
+    assert currency.cached_bases(tmp_path) == ()
+
+    for base in ("usd", "eur"):
+        currency.write_rate_cache(
+            tmp_path,
+            currency.RateCache(
+                base=base,
+                date=dt.date(2026, 4, 24),
+                fetched_at=dt.date(2026, 4, 24),
+                rates={"isk": decimal.Decimal("150")},
+            ),
+        )
+    (tmp_path / "currency" / "usage.log").write_text("", encoding="utf-8")
+    (tmp_path / "currency" / "zzz.json").write_text("{}", encoding="utf-8")
+
+    assert currency.cached_bases(tmp_path) == ("eur", "usd")
+
+
+def test_convert_without_source_cache_uses_fresh_cross_rates(
+    tmp_path,
+    monkeypatch,
+):
+    currency.write_rate_cache(
+        tmp_path,
+        currency.RateCache(
+            base="eur",
+            date=dt.date(2026, 4, 24),
+            fetched_at=dt.date(2026, 4, 25),
+            rates={
+                "isk": decimal.Decimal("160"),
+                "usd": decimal.Decimal("1.2"),
+            },
+        ),
+    )
+    monkeypatch.setattr(
+        currency,
+        "start_background_refresh_status",
+        lambda base_dir, base: (_ for _ in ()).throw(
+            AssertionError("refresh started")
+        ),
+    )
+
+    response = currency.convert_query(
+        tmp_path,
+        "2000 isk usd",
+        today=dt.date(2026, 4, 25),
+    )
+
+    assert response.items[0].valid is True
+    assert response.items[0].arg == "15"
+    assert response.items[0].subtitle == (
+        "Icelandic Krona to US Dollar - Rates from 2026-04-24"
+    )
+
+
+def test_convert_with_stale_source_cache_prefers_fresh_cross_rates(
+    tmp_path,
+    monkeypatch,
+):
+    currency.write_rate_cache(
+        tmp_path,
+        currency.RateCache(
+            base="isk",
+            date=dt.date(2026, 4, 23),
+            fetched_at=dt.date(2026, 4, 23),
+            rates={"usd": decimal.Decimal("0.007")},
+        ),
+    )
+    currency.write_rate_cache(
+        tmp_path,
+        currency.RateCache(
+            base="eur",
+            date=dt.date(2026, 4, 24),
+            fetched_at=dt.date(2026, 4, 25),
+            rates={
+                "isk": decimal.Decimal("160"),
+                "usd": decimal.Decimal("1.2"),
+            },
+        ),
+    )
+    monkeypatch.setattr(
+        currency,
+        "start_background_refresh_status",
+        lambda base_dir, base: (_ for _ in ()).throw(
+            AssertionError("refresh started")
+        ),
+    )
+
+    response = currency.convert_query(
+        tmp_path,
+        "2000 isk usd",
+        today=dt.date(2026, 4, 25),
+    )
+
+    assert response.items[0].arg == "15"
+    assert "stale" not in response.items[0].subtitle
+
+
+def test_cross_rates_choose_freshest_table(tmp_path):
+    for base, date, rate in (
+        ("eur", dt.date(2026, 4, 24), "160"),
+        ("usd", dt.date(2026, 4, 25), "125"),
+        ("gbp", dt.date(2026, 4, 22), "170"),
+    ):
+        currency.write_rate_cache(
+            tmp_path,
+            currency.RateCache(
+                base=base,
+                date=date,
+                fetched_at=date,
+                rates={"isk": decimal.Decimal(rate)},
+            ),
+        )
+
+    cache = currency.read_cross_rate_cache(
+        tmp_path,
+        "isk",
+        targets=("usd",),
+        today=dt.date(2026, 4, 24),
+    )
+
+    assert cache.base == "isk"
+    assert cache.date == dt.date(2026, 4, 25)
+    assert cache.rates == {"usd": decimal.Decimal("0.008")}
+
+
+def test_cross_rates_prefer_table_covering_targets(tmp_path):
+    for base, rates in (
+        ("eur", {"isk": "160"}),
+        ("usd", {"isk": "125", "gbp": "0.8"}),
+    ):
+        currency.write_rate_cache(
+            tmp_path,
+            currency.RateCache(
+                base=base,
+                date=dt.date(2026, 4, 24),
+                fetched_at=dt.date(2026, 4, 24),
+                rates={
+                    key: decimal.Decimal(value)
+                    for key, value in rates.items()
+                },
+            ),
+        )
+
+    cache = currency.read_cross_rate_cache(
+        tmp_path,
+        "isk",
+        targets=("gbp",),
+        today=dt.date(2026, 4, 24),
+    )
+
+    assert cache.rates["gbp"] == decimal.Decimal("0.0064")
+
+
+def test_cross_rates_prefer_target_coverage_over_newer_date(tmp_path):
+    currency.write_rate_cache(
+        tmp_path,
+        currency.RateCache(
+            base="eur",
+            date=dt.date(2026, 4, 25),
+            fetched_at=dt.date(2026, 4, 25),
+            rates={
+                "isk": decimal.Decimal("160"),
+                "usd": decimal.Decimal("1.2"),
+            },
+        ),
+    )
+    currency.write_rate_cache(
+        tmp_path,
+        currency.RateCache(
+            base="usd",
+            date=dt.date(2026, 4, 24),
+            fetched_at=dt.date(2026, 4, 25),
+            rates={
+                "isk": decimal.Decimal("125"),
+                "eur": decimal.Decimal("0.8"),
+                "jpy": decimal.Decimal("150"),
+            },
+        ),
+    )
+
+    response = currency.convert_query(
+        tmp_path,
+        "10 isk to jpy",
+        today=dt.date(2026, 4, 25),
+    )
+
+    assert response.items[0].valid is True
+    assert response.items[0].arg == "12"
+
+
+def test_cross_rates_reuse_already_read_source_cache(tmp_path, monkeypatch):
+    currency.write_rate_cache(
+        tmp_path,
+        currency.RateCache(
+            base="isk",
+            date=dt.date(2026, 4, 23),
+            fetched_at=dt.date(2026, 4, 23),
+            rates={"eur": decimal.Decimal("0.006")},
+        ),
+    )
+    currency.write_rate_cache(
+        tmp_path,
+        currency.RateCache(
+            base="eur",
+            date=dt.date(2026, 4, 24),
+            fetched_at=dt.date(2026, 4, 24),
+            rates={"isk": decimal.Decimal("160")},
+        ),
+    )
+    reads = []
+    read_rate_cache = currency.read_rate_cache
+    monkeypatch.setattr(
+        currency,
+        "read_rate_cache",
+        lambda base_dir, base: reads.append(base)
+        or read_rate_cache(base_dir, base),
+    )
+
+    currency.convert_query(
+        tmp_path,
+        "10 isk eur",
+        today=dt.date(2026, 4, 24),
+    )
+
+    assert reads == ["isk", "eur"]
+
+
+def test_cross_rates_ignore_stale_and_unrelated_tables(tmp_path):
+    currency.write_rate_cache(
+        tmp_path,
+        currency.RateCache(
+            base="eur",
+            date=dt.date(2026, 4, 23),
+            fetched_at=dt.date(2026, 4, 23),
+            rates={"isk": decimal.Decimal("160")},
+        ),
+    )
+    currency.write_rate_cache(
+        tmp_path,
+        currency.RateCache(
+            base="usd",
+            date=dt.date(2026, 4, 24),
+            fetched_at=dt.date(2026, 4, 24),
+            rates={"gbp": decimal.Decimal("0.8")},
+        ),
+    )
+    (tmp_path / "currency" / "gbp.json").write_text(
+        "{not-json",
+        encoding="utf-8",
+    )
+
+    assert currency.read_cross_rate_cache(
+        tmp_path,
+        "isk",
+        today=dt.date(2026, 4, 24),
+    ) is None
+
+
 def test_convert_missing_target_rate_returns_unavailable_item(tmp_path):
     cache = currency.RateCache(
         base="isk",
@@ -860,7 +1151,7 @@ def test_manual_update_success(tmp_path, monkeypatch):
     monkeypatch.setattr(
         currency,
         "fetch_rates",
-        lambda base: fetched,
+        lambda base, previous=None: fetched,
     )
 
     response = currency.update_command(tmp_path, "currency-update isk")
@@ -870,7 +1161,7 @@ def test_manual_update_success(tmp_path, monkeypatch):
 
 
 def test_manual_update_failure(tmp_path, monkeypatch):
-    def fail(base):
+    def fail(base, previous=None):
         raise RuntimeError("network down")
 
     monkeypatch.setattr(currency, "fetch_rates", fail)
@@ -897,7 +1188,7 @@ def test_manual_update_reports_already_running_instead_of_cached_success(
     monkeypatch.setattr(
         currency,
         "fetch_rates",
-        lambda base: (_ for _ in ()).throw(
+        lambda base, previous=None: (_ for _ in ()).throw(
             AssertionError("fetch_rates called")
         ),
     )
@@ -922,7 +1213,7 @@ def test_manual_update_defaults_to_eur(tmp_path, monkeypatch):
     monkeypatch.setattr(
         currency,
         "fetch_rates",
-        lambda base: calls.append(base) or fetched,
+        lambda base, previous=None: calls.append(base) or fetched,
     )
 
     response = currency.update_command(tmp_path, "currency-update")
@@ -1085,8 +1376,9 @@ def test_corrupt_cache_returns_none(tmp_path):
 
 
 class FakeResponse:
-    def __init__(self, payload):
+    def __init__(self, payload, headers=None):
         self.payload = payload
+        self.headers = headers or {}
 
     def __enter__(self):
         return self
@@ -1098,6 +1390,13 @@ class FakeResponse:
         return json.dumps(self.payload).encode("utf-8")
 
 
+def load_payload(payload):
+    def load_json_url(url, validators=None):
+        return currency.ProviderResponse(payload)
+
+    return load_json_url
+
+
 def lock_metadata_path(lock_dir, token):
     try:
         return lock_dir.__class__(currency._metadata_path(lock_dir, token))
@@ -1143,6 +1442,7 @@ def test_fetch_rates_uses_primary_url(monkeypatch):
     )
     assert timeout == 10
     assert request.get_header("User-agent") == "alfred-converter/1"
+    assert request.get_header("Accept-encoding") == "gzip, deflate"
     assert cache.rates["eur"] == decimal.Decimal("0.0069542179")
 
 
@@ -1150,10 +1450,10 @@ def test_fetch_rates_normalizes_provider_rate_keys(monkeypatch):
     monkeypatch.setattr(
         currency,
         "_load_json_url",
-        lambda url: {
+        load_payload({
             "date": "2026-04-24",
             "isk": {"EUR": 0.0069542179},
-        },
+        }),
     )
 
     cache = currency.fetch_rates("isk")
@@ -1167,10 +1467,10 @@ def test_fetch_rates_rejects_duplicate_normalized_provider_rate_keys(
     monkeypatch.setattr(
         currency,
         "_load_json_url",
-        lambda url: {
+        load_payload({
             "date": "2026-04-24",
             "isk": {"EUR": 0.0069542179, "eur": 0.0069542180},
-        },
+        }),
     )
 
     with pytest.raises(RuntimeError, match="Unable to fetch rates for isk"):
@@ -1181,10 +1481,10 @@ def test_fetch_rates_rejects_invalid_provider_rate_key(monkeypatch):
     monkeypatch.setattr(
         currency,
         "_load_json_url",
-        lambda url: {
+        load_payload({
             "date": "2026-04-24",
             "isk": {"not-currency": 1},
-        },
+        }),
     )
 
     with pytest.raises(RuntimeError, match="Unable to fetch rates for isk"):
@@ -1199,10 +1499,10 @@ def test_fetch_rates_rejects_non_positive_provider_rates(
     monkeypatch.setattr(
         currency,
         "_load_json_url",
-        lambda url: {
+        load_payload({
             "date": "2026-04-24",
             "isk": {"eur": rate},
-        },
+        }),
     )
 
     with pytest.raises(RuntimeError, match="Unable to fetch rates for isk"):
@@ -1238,9 +1538,9 @@ def test_fetch_rates_uses_fallback_after_malformed_primary(monkeypatch):
         {"date": "2026-04-24", "isk": {"eur": 0.0069542179}},
     ]
 
-    def fake_load_json_url(url):
+    def fake_load_json_url(url, validators=None):
         calls.append(url)
-        return payloads.pop(0)
+        return currency.ProviderResponse(payloads.pop(0))
 
     monkeypatch.setattr(currency, "_load_json_url", fake_load_json_url)
 
@@ -1262,12 +1562,356 @@ def test_fetch_rates_uses_fallback_after_malformed_primary(monkeypatch):
 def test_fetch_rates_rejects_malformed_provider_payloads(
     payload, monkeypatch
 ):
-    monkeypatch.setattr(currency, "_load_json_url", lambda url: payload)
+    monkeypatch.setattr(currency, "_load_json_url", load_payload(payload))
 
     with pytest.raises(RuntimeError, match="Unable to fetch rates for isk"):
         currency.fetch_rates("isk")
 
 
+class ProviderHandler(http.server.BaseHTTPRequestHandler):
+    def do_GET(self):
+        self.server.requests.append(self.path)
+        behavior = self.server.behavior
+        if behavior == "fail":
+            self.send_error(500)
+            return
+        if behavior == "slow":
+            time.sleep(1)
+
+        etag = self.server.etag
+        self.server.conditions.append((
+            self.headers.get("If-None-Match"),
+            self.headers.get("If-Modified-Since"),
+        ))
+        if etag and self.headers.get("If-None-Match") == etag:
+            self.send_response(304)
+            self.send_header("ETag", etag)
+            self.end_headers()
+            return
+
+        body = json.dumps({
+            "date": "2026-04-24",
+            "isk": {"eur": self.server.rate},
+        }).encode("utf-8")
+        encoding = self.server.encoding
+        if encoding == "gzip":
+            body = gzip.compress(body)
+        elif encoding == "deflate":
+            body = zlib.compress(body)
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        if encoding:
+            self.send_header("Content-Encoding", encoding)
+        if etag:
+            self.send_header("ETag", etag)
+            self.send_header("Last-Modified", "Fri, 24 Apr 2026 00:00:00 GMT")
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+@contextlib.contextmanager
+def provider_server(behavior, rate="0.007"):
+    server = http.server.ThreadingHTTPServer(
+        ("127.0.0.1", 0),
+        ProviderHandler,
+    )
+    server.daemon_threads = True
+    server.behavior = behavior
+    server.rate = rate
+    server.requests = []
+    server.conditions = []
+    server.etag = None
+    server.encoding = None
+    thread = threading.Thread(
+        target=server.serve_forever,
+        kwargs={"poll_interval": 0.05},
+        daemon=True,
+    )
+    thread.start()
+    try:
+        host, port = server.server_address
+        server.url = f"http://{host}:{port}/{{currency}}.json"
+        yield server
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+@contextlib.contextmanager
+def providers(monkeypatch, primary_behavior, fallback_behavior):
+    with provider_server(primary_behavior, "0.007") as primary:
+        with provider_server(fallback_behavior, "0.008") as fallback:
+            monkeypatch.setattr(currency, "PRIMARY_URL", primary.url)
+            monkeypatch.setattr(currency, "FALLBACK_URL", fallback.url)
+            yield primary, fallback
+
+
+def test_hedged_fetch_uses_fast_primary_without_fallback(monkeypatch):
+    with providers(monkeypatch, "ok", "ok") as (primary, fallback):
+        cache = currency.fetch_rates("isk", delay=5)
+
+    assert cache.rates == {"eur": decimal.Decimal("0.007")}
+    assert primary.requests == ["/isk.json"]
+    assert fallback.requests == []
+
+
+def test_hedged_fetch_launches_fallback_when_primary_is_slow(monkeypatch):
+    with providers(monkeypatch, "slow", "ok") as (primary, fallback):
+        started = time.monotonic()
+        cache = currency.fetch_rates("isk", delay=0.05)
+        elapsed = time.monotonic() - started
+
+    assert cache.rates == {"eur": decimal.Decimal("0.008")}
+    assert elapsed < 0.9
+    assert fallback.requests == ["/isk.json"]
+
+
+def test_hedged_fetch_skips_delay_when_primary_fails(monkeypatch):
+    with providers(monkeypatch, "fail", "ok") as (primary, fallback):
+        started = time.monotonic()
+        cache = currency.fetch_rates("isk", delay=30)
+        elapsed = time.monotonic() - started
+
+    assert cache.rates == {"eur": decimal.Decimal("0.008")}
+    assert elapsed < 5
+    assert primary.requests == ["/isk.json"]
+
+
+def test_hedged_fetch_waits_for_slow_primary_when_fallback_fails(
+    monkeypatch,
+):
+    with providers(monkeypatch, "slow", "fail"):
+        cache = currency.fetch_rates("isk", delay=0.05)
+
+    assert cache.rates == {"eur": decimal.Decimal("0.007")}
+
+
+def test_hedged_fetch_raises_when_all_providers_fail(monkeypatch):
+    with providers(monkeypatch, "fail", "fail"):
+        with pytest.raises(
+            RuntimeError,
+            match="Unable to fetch rates for isk",
+        ):
+            currency.fetch_rates("isk", delay=0.05)
+
+
+def test_fetch_rates_reports_every_provider_error_in_order(monkeypatch):
+    def fake_load_json_url(url, validators=None):
+        if url.startswith("https://cdn"):
+            time.sleep(0.2)
+            raise OSError("primary down")
+        raise OSError("fallback down")
+
+    monkeypatch.setattr(currency, "_load_json_url", fake_load_json_url)
+
+    with pytest.raises(RuntimeError) as error:
+        currency.fetch_rates("isk", delay=0)
+
+    assert str(error.value) == (
+        "Unable to fetch rates for isk: "
+        f"{currency.PRIMARY_URL.format(currency='isk')}: primary down; "
+        f"{currency.FALLBACK_URL.format(currency='isk')}: fallback down"
+    )
+
+
+@pytest.mark.parametrize("encoding", ["gzip", "deflate"])
+def test_fetch_rates_decodes_compressed_responses(encoding, monkeypatch):
+    with providers(monkeypatch, "ok", "fail") as (primary, fallback):
+        primary.encoding = encoding
+        cache = currency.fetch_rates("isk", delay=5)
+
+    assert cache.rates == {"eur": decimal.Decimal("0.007")}
+
+
+@pytest.mark.parametrize(
+    "body, encoding",
+    [
+        (zlib.compress(b"{}")[2:-4], "deflate"),
+        (b"{}", None),
+        (b"{}", "Identity"),
+    ],
+)
+def test_decode_body_accepts_supported_encodings(body, encoding):
+    assert currency._decode_body(body, encoding) == b"{}"
+
+
+@pytest.mark.parametrize(
+    "body, encoding",
+    [
+        (b"not compressed", "deflate"),
+        (b"{}", "br"),
+    ],
+)
+def test_decode_body_rejects_invalid_encodings(body, encoding):
+    with pytest.raises(ValueError):
+        currency._decode_body(body, encoding)
+
+
+def test_fetch_rates_stores_validators_per_url(monkeypatch):
+    with providers(monkeypatch, "ok", "ok") as (primary, fallback):
+        primary.etag = '"v1"'
+        cache = currency.fetch_rates("isk", delay=5)
+
+    url = primary.url.format(currency="isk")
+    assert cache.validators == {
+        url: {
+            "etag": '"v1"',
+            "last_modified": "Fri, 24 Apr 2026 00:00:00 GMT",
+        },
+    }
+    assert primary.conditions == [(None, None)]
+
+
+def test_refresh_revalidates_unchanged_rates_with_304(tmp_path, monkeypatch):
+    with providers(monkeypatch, "ok", "fail") as (primary, fallback):
+        primary.etag = '"v1"'
+        url = primary.url.format(currency="isk")
+        currency.write_rate_cache(
+            tmp_path,
+            currency.RateCache(
+                base="isk",
+                date=dt.date(2026, 4, 23),
+                fetched_at=dt.date(2026, 4, 23),
+                rates={"eur": decimal.Decimal("0.0065")},
+                validators={
+                    url: {
+                        "etag": '"v1"',
+                        "last_modified": "Thu, 23 Apr 2026 00:00:00 GMT",
+                    },
+                },
+            ),
+        )
+
+        cache = currency.refresh_rates(tmp_path, "isk")
+
+    assert primary.conditions == [
+        ('"v1"', "Thu, 23 Apr 2026 00:00:00 GMT"),
+    ]
+    assert cache.rates == {"eur": decimal.Decimal("0.0065")}
+    assert cache.date == dt.date(2026, 4, 23)
+    assert cache.fetched_at == dt.date.today()
+    assert cache.validators[url] == {"etag": '"v1"'}
+    assert currency.read_rate_cache(tmp_path, "isk") == cache
+
+
+def test_refresh_downloads_when_validators_changed(tmp_path, monkeypatch):
+    with providers(monkeypatch, "ok", "fail") as (primary, fallback):
+        primary.etag = '"v2"'
+        url = primary.url.format(currency="isk")
+        currency.write_rate_cache(
+            tmp_path,
+            currency.RateCache(
+                base="isk",
+                date=dt.date(2026, 4, 23),
+                fetched_at=dt.date(2026, 4, 23),
+                rates={"eur": decimal.Decimal("0.0065")},
+                validators={url: {"etag": '"v1"'}},
+            ),
+        )
+
+        cache = currency.refresh_rates(tmp_path, "isk")
+
+    assert cache.rates == {"eur": decimal.Decimal("0.007")}
+    assert cache.validators[url]["etag"] == '"v2"'
+
+
+def test_not_modified_without_cached_rates_is_an_error(monkeypatch):
+    monkeypatch.setattr(
+        currency,
+        "_load_json_url",
+        lambda url, validators=None: currency.ProviderResponse(None),
+    )
+
+    with pytest.raises(RuntimeError, match="not modified"):
+        currency.fetch_rates("isk", delay=0)
+
+
+def test_fetch_rates_ignores_validators_from_other_base(monkeypatch):
+    seen = []
+
+    def fake_load_json_url(url, validators=None):
+        seen.append(validators)
+        return currency.ProviderResponse(
+            {"date": "2026-04-24", "isk": {"eur": 0.007}},
+        )
+
+    monkeypatch.setattr(currency, "_load_json_url", fake_load_json_url)
+    previous = currency.RateCache(
+        base="usd",
+        date=dt.date(2026, 4, 23),
+        fetched_at=dt.date(2026, 4, 23),
+        rates={"eur": decimal.Decimal("0.9")},
+        validators={
+            currency.PRIMARY_URL.format(currency="isk"): {"etag": '"v1"'},
+        },
+    )
+
+    currency.fetch_rates("isk", previous=previous)
+
+    assert seen == [None]
+
+
+def test_load_json_url_raises_304_without_validators(monkeypatch):
+    def fake_urlopen(request, timeout):
+        raise urllib.error.HTTPError(request.full_url, 304, "", {}, None)
+
+    monkeypatch.setattr(currency.urllib.request, "urlopen", fake_urlopen)
+
+    with pytest.raises(urllib.error.HTTPError):
+        currency._load_json_url("https://example.invalid/isk.json")
+
+
+def test_read_rate_cache_drops_malformed_validators(tmp_path):
+    rate_dir = tmp_path / "currency"
+    rate_dir.mkdir()
+    for validators, expected in (
+        ([], {}),
+        (
+            {"u": {"etag": 1, "last_modified": "x"}, "v": []},
+            {"u": {"last_modified": "x"}},
+        ),
+    ):
+        (rate_dir / "isk.json").write_text(
+            json.dumps({
+                "base": "isk",
+                "date": "2026-04-24",
+                "rates": {"eur": "0.007"},
+                "validators": validators,
+            }),
+            encoding="utf-8",
+        )
+
+        assert currency.read_rate_cache(tmp_path, "isk").validators == (
+            expected
+        )
+
+
+@pytest.mark.parametrize(
+    "value, expected",
+    [
+        (None, currency.DEFAULT_HEDGE_DELAY),
+        ("0.25", 0.25),
+        ("0", 0),
+        ("-1", currency.DEFAULT_HEDGE_DELAY),
+        ("nan", currency.DEFAULT_HEDGE_DELAY),
+        ("inf", currency.DEFAULT_HEDGE_DELAY),
+        ("1e300", currency.REQUEST_TIMEOUT),
+        ("soon", currency.DEFAULT_HEDGE_DELAY),
+    ],
+)
+def test_hedge_delay_reads_environment(value, expected, monkeypatch):
+    if value is None:
+        monkeypatch.delenv(currency.HEDGE_DELAY_ENV, raising=False)
+    else:
+        monkeypatch.setenv(currency.HEDGE_DELAY_ENV, value)
+
+    assert currency.hedge_delay() == expected
+
+
 def test_lock_prevents_stampede(tmp_path):
     first = currency.acquire_refresh_lock(tmp_path, "isk")
     second = currency.acquire_refresh_lock(tmp_path, "isk")
@@ -1744,7 +2388,11 @@ def test_refresh_writes_cache_with_lock(tmp_path, monkeypatch):
         fetched_at=dt.date(2026, 4, 25),
         rates={"eur": decimal.Decimal("0.0069542179")},
     )
-    monkeypatch.setattr(currency, "fetch_rates", lambda base: fetched)
+    monkeypatch.setattr(
+        currency,
+        "fetch_rates",
+        lambda base, previous=None: fetched,
+    )
 
     result = currency.refresh_rates(tmp_path, "isk")
 
@@ -1789,7 +2437,11 @@ def test_refresh_rates_with_existing_lock_writes_cache_and_releases(
         rates={"eur": decimal.Decimal("0.0069542179")},
     )
     lock = currency.acquire_refresh_lock(tmp_path, "isk")
-    monkeypatch.setattr(currency, "fetch_rates", lambda base: fetched)
+    monkeypatch.setattr(
+        currency,
+        "fetch_rates",
+        lambda base, previous=None: fetched,
+    )
 
     result = currency.refresh_rates_with_existing_lock(
         tmp_path,
@@ -1817,7 +2469,7 @@ def test_refresh_rates_with_existing_lock_rejects_missing_lock_token(
     monkeypatch.setattr(
         currency,
         "fetch_rates",
-        lambda base: calls.append(base) or fetched,
+        lambda base, previous=None: calls.append(base) or fetched,
     )
 
     with pytest.raises(ValueError, match="refresh lock"):
@@ -1845,7 +2497,7 @@ def test_refresh_rates_with_existing_lock_rejects_existing_lock_missing_token(
     monkeypatch.setattr(
         currency,
         "fetch_rates",
-        lambda base: calls.append(base) or fetched,
+        lambda base, previous=None: calls.append(base) or fetched,
     )
 
     with pytest.raises(ValueError, match="refresh lock"):
@@ -1870,7 +2522,7 @@ def test_refresh_rates_with_existing_lock_rejects_unreadable_metadata(
     monkeypatch.setattr(
         currency,
         "fetch_rates",
-        lambda base: calls.append(base) or fetched,
+        lambda base, previous=None: calls.append(base) or fetched,
     )
 
     with pytest.raises(ValueError, match="refresh lock"):
@@ -1899,7 +2551,7 @@ def test_refresh_rates_with_existing_lock_rejects_wrong_token(
     monkeypatch.setattr(
         currency,
         "fetch_rates",
-        lambda base: calls.append(base) or fetched,
+        lambda base, previous=None: calls.append(base) or fetched,
     )
 
     with pytest.raises(ValueError, match="refresh lock"):
@@ -2103,60 +2755,1126 @@ def test_start_background_refresh_without_base_dir_passes_token_env(
     ).release()
 
 
-def test_main_update_invokes_refresh(monkeypatch):
+def test_lock_backend_reads_environment(monkeypatch):
+    monkeypatch.delenv(currency.LOCK_BACKEND_ENV, raising=False)
+    assert currency.lock_backend() == currency.LOCK_BACKEND_DIRECTORY
+
+    monkeypatch.setenv(currency.LOCK_BACKEND_ENV, " FLOCK ")
+    assert currency.lock_backend() == currency.LOCK_BACKEND_FLOCK
+
+    monkeypatch.setenv(currency.LOCK_BACKEND_ENV, "bogus")
+    assert currency.lock_backend() == currency.LOCK_BACKEND_DIRECTORY
+
+
+def test_flock_refresh_lock_is_exclusive(tmp_path, monkeypatch):
+    monkeypatch.setenv(currency.LOCK_BACKEND_ENV, "flock")
+
+    lock = currency.acquire_refresh_lock(tmp_path, "ISK")
+    assert isinstance(lock, currency.FlockRefreshLock)
+    assert lock.acquired is True
+    assert lock.path == str(tmp_path / "currency" / "locks" / "isk.flock")
+
+    other = currency.acquire_refresh_lock(tmp_path, "isk")
+    assert other.acquired is False
+    assert other.fd is None
+    assert not (tmp_path / "currency" / "locks" / "isk.lock").exists()
+
+    lock.release()
+    lock.release()
+    assert lock.fd is None
+
+    again = currency.acquire_refresh_lock(tmp_path, "isk")
+    assert again.acquired is True
+    again.release()
+
+
+def test_flock_refresh_lock_is_released_when_holder_dies(tmp_path):
+    script = (
+        "import os, sys\n"
+        "from converter import currency\n"
+        "lock = currency.acquire_flock_refresh_lock(sys.argv[1], 'isk')\n"
+        "assert lock.acquired\n"
+        "os._exit(1)\n"
+    )
+    subprocess.run(
+        [sys.executable, "-c", script, str(tmp_path)],
+        cwd=Path(__file__).resolve().parents[1],
+        check=False,
+    )
+
+    lock = currency.acquire_flock_refresh_lock(tmp_path, "isk")
+    assert lock.acquired is True
+    lock.release()
+
+
+def test_flock_refresh_lock_closes_descriptor_on_error(
+    tmp_path, monkeypatch
+):
+    closed = []
+    real_close = os.close
+
+    def fake_flock(fd, operation):
+        raise OSError("flock unsupported")
+
+    def fake_close(fd):
+        closed.append(fd)
+        real_close(fd)
+
+    monkeypatch.setattr(currency.fcntl, "flock", fake_flock)
+    monkeypatch.setattr(currency.os, "close", fake_close)
+
+    with pytest.raises(OSError, match="flock unsupported"):
+        currency.acquire_flock_refresh_lock(tmp_path, "isk")
+
+    assert len(closed) == 1
+
+
+def test_flock_refresh_lock_survives_concurrent_processes(tmp_path):
+    # Every process races for the same lock repeatedly; holders log an
+    # enter/exit pair, which must never interleave with another holder.
+    log_path = tmp_path / "holders.log"
+    script = (
+        "import os, sys, time\n"
+        "from converter import currency\n"
+        "base_dir, log_path = sys.argv[1], sys.argv[2]\n"
+        "for _ in range(20):\n"
+        "    lock = currency.acquire_flock_refresh_lock(base_dir, 'isk')\n"
+        "    if lock.acquired:\n"
+        "        with open(log_path, 'a') as fh:\n"
+        "            fh.write(f'enter {os.getpid()}\\n')\n"
+        "        time.sleep(0.002)\n"
+        "        with open(log_path, 'a') as fh:\n"
+        "            fh.write(f'exit {os.getpid()}\\n')\n"
+        "        lock.release()\n"
+        "    time.sleep(0.001)\n"
+    )
+    processes = [
+        subprocess.Popen(
+            [sys.executable, "-c", script, str(tmp_path), str(log_path)],
+            cwd=Path(__file__).resolve().parents[1],
+        )
+        for _ in range(12)
+    ]
+    assert [process.wait(timeout=60) for process in processes] == [0] * 12
+
+    lines = log_path.read_text().splitlines()
+    assert lines
+    assert len(lines) % 2 == 0
+    for enter, leave in zip(lines[::2], lines[1::2]):
+        assert enter.startswith("enter ")
+        assert leave == "exit " + enter.split()[1]
+
+
+def test_start_background_refresh_passes_flock_to_child(
+    tmp_path, monkeypatch
+):
+    launched = []
+
+    def fake_popen(command, **kwargs):
+        # Keep a duplicate like the child would inherit
+        launched.append((command, kwargs, os.dup(kwargs["pass_fds"][0])))
+
+    monkeypatch.setenv(currency.LOCK_BACKEND_ENV, "flock")
+    monkeypatch.setattr(currency.subprocess, "Popen", fake_popen)
+
+    assert currency.start_background_refresh(tmp_path, "isk") is True
+
+    command, kwargs, child_fd = launched[0]
+    assert command[3:] == ["update-held", "isk", str(kwargs["pass_fds"][0])]
+    assert currency.LOCK_TOKEN_ENV not in kwargs["env"]
+    # The parent closed its copy, but the child's descriptor keeps it held
+    assert currency.start_background_refresh(tmp_path, "isk") is False
+
+    monkeypatch.setattr(
+        currency,
+        "fetch_rates",
+        lambda base, previous=None: currency.RateCache(
+            base=base,
+            date=dt.date(2026, 4, 24),
+            fetched_at=dt.date.today(),
+            rates={"eur": decimal.Decimal("0.0066")},
+        ),
+    )
+    cache = currency.refresh_rates_with_held_lock(tmp_path, "isk", child_fd)
+
+    assert cache.rates == {"eur": decimal.Decimal("0.0066")}
+    assert currency.read_rate_cache(tmp_path, "isk") == cache
+    with pytest.raises(OSError):
+        os.fstat(child_fd)
+    lock = currency.acquire_refresh_lock(tmp_path, "isk")
+    assert lock.acquired is True
+    lock.release()
+
+
+def test_start_background_refresh_passes_bulk_flock_to_child(
+    tmp_path, monkeypatch
+):
+    launched = []
+
+    def fake_popen(command, **kwargs):
+        launched.append((command, os.dup(kwargs["pass_fds"][0])))
+
+    monkeypatch.setenv(currency.LOCK_BACKEND_ENV, "flock")
+    monkeypatch.setenv(currency.BULK_REFRESH_ENV, "yes")
+    monkeypatch.setattr(currency.subprocess, "Popen", fake_popen)
+    monkeypatch.setattr(
+        currency,
+        "fetch_rates",
+        lambda base, previous=None: _reference_cache(),
+    )
+
+    assert currency.start_background_refresh(tmp_path, "isk") is True
+
+    command, child_fd = launched[0]
+    assert command[3] == "update-held-all"
+    currency.refresh_bases_with_held_lock(tmp_path, child_fd)
+
+    assert currency.read_rate_cache(tmp_path, "eur") == _reference_cache()
+    assert currency.read_rate_cache(tmp_path, "usd") is not None
+
+
+def test_start_background_refresh_releases_flock_when_launch_fails(
+    tmp_path, monkeypatch
+):
+    def fake_popen(command, **kwargs):
+        raise OSError("cannot launch")
+
+    monkeypatch.setenv(currency.LOCK_BACKEND_ENV, "flock")
+    monkeypatch.setattr(currency.subprocess, "Popen", fake_popen)
+
+    assert currency.start_background_refresh(tmp_path, "isk") is False
+
+    lock = currency.acquire_refresh_lock(tmp_path, "isk")
+    assert lock.acquired is True
+    lock.release()
+
+
+def test_held_refresh_lock_rejects_foreign_descriptors(tmp_path):
+    with pytest.raises(ValueError, match="missing refresh lock"):
+        currency.refresh_rates_with_held_lock(tmp_path, "isk", 12345)
+
+    currency.acquire_flock_refresh_lock(tmp_path, "isk").release()
+    other = currency.acquire_flock_refresh_lock(tmp_path, "usd")
+    with pytest.raises(ValueError, match="invalid refresh lock descriptor"):
+        currency.refresh_rates_with_held_lock(tmp_path, "isk", other.fd)
+    other.release()
+
+    holder = currency.acquire_flock_refresh_lock(tmp_path, "isk")
+    fd = os.open(holder.path, os.O_RDWR)
+    try:
+        with pytest.raises(ValueError, match="refresh lock is not held"):
+            currency.refresh_rates_with_held_lock(tmp_path, "isk", fd)
+    finally:
+        os.close(fd)
+        holder.release()
+
+
+def test_main_update_held_uses_inherited_descriptor(monkeypatch):
     calls = []
 
     monkeypatch.setattr(
         currency,
-        "refresh_rates",
-        lambda base_dir, base: calls.append((base_dir, base)),
+        "refresh_rates_with_held_lock",
+        lambda *args: calls.append(("base",) + args),
+    )
+    monkeypatch.setattr(
+        currency,
+        "refresh_bases_with_held_lock",
+        lambda *args: calls.append(("all",) + args),
     )
 
-    assert currency.main(["update", "isk"]) == 0
-    assert calls == [(None, "isk")]
+    assert currency.main(["update-held", "isk", "7"]) == 0
+    assert currency.main(["update-held-all", "8"]) == 0
+    assert calls == [("base", None, "isk", 7), ("all", None, 8)]
+    with pytest.raises(SystemExit, match="invalid lock descriptor"):
+        currency.main(["update-held", "isk", "x"])
 
 
-def test_main_update_locked_invokes_refresh_with_existing_lock(monkeypatch):
+def _reference_cache():
+    return currency.RateCache(
+        base="eur",
+        date=dt.date(2026, 4, 24),
+        fetched_at=dt.date(2026, 4, 25),
+        rates={
+            "usd": decimal.Decimal("1.25"),
+            "gbp": decimal.Decimal("0.8"),
+            "isk": decimal.Decimal("160"),
+        },
+    )
+
+
+def test_refresh_bases_fetches_reference_once_and_writes_derived_tables(
+    tmp_path,
+    monkeypatch,
+):
     calls = []
+    monkeypatch.setattr(
+        currency,
+        "fetch_rates",
+        lambda base, previous=None: calls.append(base) or _reference_cache(),
+    )
+
+    cache = currency.refresh_bases(tmp_path, ["usd", "GBP", "eur", "jpy"])
 
+    assert calls == ["eur"]
+    assert cache == _reference_cache()
+    assert currency.cached_bases(tmp_path) == ("eur", "gbp", "usd")
+    usd = currency.read_rate_cache(tmp_path, "usd")
+    assert usd.fetched_at == dt.date(2026, 4, 25)
+    assert usd.rates == {
+        "eur": decimal.Decimal("0.8"),
+        "gbp": decimal.Decimal("0.64"),
+        "isk": decimal.Decimal("128"),
+    }
+    assert not (tmp_path / "currency" / "locks" / "eur.lock").exists()
+
+
+def test_refresh_bases_defaults_to_configured_targets(tmp_path, monkeypatch):
+    monkeypatch.setenv(currency.DEFAULT_TARGETS_ENV, "usd gbp")
     monkeypatch.setattr(
         currency,
-        "refresh_rates_with_existing_lock",
-        lambda base_dir, base, lock_path, token=None: calls.append(
-            (base_dir, base, lock_path, token)
+        "fetch_rates",
+        lambda base, previous=None: _reference_cache(),
+    )
+
+    currency.refresh_bases(tmp_path)
+
+    assert currency.bulk_refresh_bases() == ("eur", "usd", "gbp")
+    assert currency.cached_bases(tmp_path) == ("eur", "gbp", "usd")
+
+
+def test_refresh_bases_returns_none_when_locked(tmp_path, monkeypatch):
+    lock = currency.acquire_refresh_lock(tmp_path, "eur")
+    monkeypatch.setattr(
+        currency,
+        "fetch_rates",
+        lambda base, previous=None: (_ for _ in ()).throw(
+            AssertionError("fetched")
+        ),
+    )
+
+    assert currency.refresh_bases(tmp_path, ["usd"]) is None
+    lock.release()
+
+
+def test_refresh_bases_releases_lock_on_failure(tmp_path, monkeypatch):
+    def fail(base, previous=None):
+        raise RuntimeError("network down")
+
+    monkeypatch.setattr(currency, "fetch_rates", fail)
+
+    with pytest.raises(RuntimeError):
+        currency.refresh_bases(tmp_path, ["usd"])
+
+    assert currency.acquire_refresh_lock(tmp_path, "eur").acquired is True
+
+
+def test_write_rate_caches_validates_all_tables_before_writing(tmp_path):
+    invalid = currency.RateCache(
+        base="usd",
+        date=dt.date(2026, 4, 24),
+        fetched_at=dt.date(2026, 4, 25),
+        rates={"eur": decimal.Decimal("0")},
+    )
+
+    with pytest.raises(ValueError):
+        currency.write_rate_caches(tmp_path, [_reference_cache(), invalid])
+
+    assert currency.cached_bases(tmp_path) == ()
+    assert list((tmp_path / "currency").glob("*.tmp")) == []
+
+
+def test_write_rate_caches_replaces_each_table_atomically(
+    tmp_path,
+    monkeypatch,
+):
+    old = currency.RateCache(
+        base="usd",
+        date=dt.date(2026, 4, 23),
+        fetched_at=dt.date(2026, 4, 23),
+        rates={"eur": decimal.Decimal("0.9")},
+    )
+    currency.write_rate_cache(tmp_path, old)
+    replace = currency.os.replace
+    replaced = []
+
+    def fail_second_replace(source, destination):
+        if replaced:
+            raise OSError("replace failed")
+        replaced.append(destination)
+        replace(source, destination)
+
+    monkeypatch.setattr(currency.os, "replace", fail_second_replace)
+    new = currency.derive_rate_cache(_reference_cache(), "usd")
+
+    with pytest.raises(OSError):
+        currency.write_rate_caches(tmp_path, [_reference_cache(), new])
+
+    assert currency.read_rate_cache(tmp_path, "eur") == _reference_cache()
+    assert currency.read_rate_cache(tmp_path, "usd") == old
+    assert list((tmp_path / "currency").glob("*.tmp")) == []
+
+
+def test_refresh_bases_with_existing_lock_writes_tables(tmp_path, monkeypatch):
+    monkeypatch.setenv(currency.DEFAULT_TARGETS_ENV, "usd")
+    monkeypatch.setattr(
+        currency,
+        "fetch_rates",
+        lambda base, previous=None: _reference_cache(),
+    )
+    lock = currency.acquire_refresh_lock(tmp_path, "eur")
+
+    currency.refresh_bases_with_existing_lock(
+        tmp_path,
+        lock.path,
+        token=lock.token,
+    )
+
+    assert currency.cached_bases(tmp_path) == ("eur", "usd")
+    assert not os.path.exists(lock.path)
+
+
+def test_refresh_bases_with_existing_lock_rejects_other_base_lock(tmp_path):
+    lock = currency.acquire_refresh_lock(tmp_path, "usd")
+
+    with pytest.raises(ValueError, match="invalid refresh lock path"):
+        currency.refresh_bases_with_existing_lock(
+            tmp_path,
+            lock.path,
+            token=lock.token,
+        )
+
+    lock.release()
+
+
+def test_bulk_background_refresh_uses_single_reference_worker(
+    tmp_path,
+    monkeypatch,
+):
+    launched = []
+
+    def fake_popen(command, **kwargs):
+        launched.append((command, kwargs))
+
+    monkeypatch.setenv(currency.BULK_REFRESH_ENV, "yes")
+    monkeypatch.setattr(currency.subprocess, "Popen", fake_popen)
+
+    assert currency.start_background_refresh_status(tmp_path, "isk") == (
+        currency.BACKGROUND_REFRESH_STARTED
+    )
+    assert currency.start_background_refresh_status(tmp_path, "usd") == (
+        currency.BACKGROUND_REFRESH_ALREADY_RUNNING
+    )
+
+    assert len(launched) == 1
+    command, kwargs = launched[0]
+    assert command[3:] == [
+        "update-locked-all",
+        str(tmp_path / "currency" / "locks" / "eur.lock"),
+    ]
+    currency.RefreshLock(
+        path=command[4],
+        acquired=True,
+        token=kwargs["env"][currency.LOCK_TOKEN_ENV],
+    ).release()
+
+
+def test_bulk_refresh_for_unconfigured_source_answers_via_cross_rates(
+    tmp_path,
+    monkeypatch,
+):
+    launched = []
+    monkeypatch.setenv("alfred_workflow_cache", str(tmp_path))
+    monkeypatch.setenv(currency.BULK_REFRESH_ENV, "yes")
+    monkeypatch.setenv(currency.DEFAULT_TARGETS_ENV, "usd")
+    monkeypatch.setattr(
+        currency.subprocess,
+        "Popen",
+        lambda command, **kwargs: launched.append((command, kwargs)),
+    )
+    monkeypatch.setattr(
+        currency,
+        "fetch_rates",
+        lambda base, previous=None: replace(
+            _reference_cache(),
+            fetched_at=dt.date.today(),
         ),
     )
+
+    response = currency.convert_query(tmp_path, "5 isk")
+
+    assert response.items[0].title == "Currency rates updating"
+    command, kwargs = launched[0]
     monkeypatch.setenv(
         currency.LOCK_TOKEN_ENV,
-        "worker-token",
+        kwargs["env"][currency.LOCK_TOKEN_ENV],
     )
+    assert currency.main(command[3:]) == 0
 
-    assert currency.main(["update-locked", "isk", "/tmp/isk.lock"]) == 0
-    assert calls == [(None, "isk", "/tmp/isk.lock", "worker-token")]
+    assert currency.cached_bases(tmp_path) == ("eur", "usd")
+    response = currency.convert_query(tmp_path, "5 isk")
+    assert response.items[0].valid is True
+    assert response.items[0].arg == "0.039062"
 
 
-def test_main_rejects_invalid_usage():
-    with pytest.raises(
-        SystemExit,
-        match="Usage: python -m converter.currency",
-    ):
-        currency.main(["invalid"])
+def test_main_update_all_invokes_bulk_refresh(monkeypatch):
+    calls = []
+
+    monkeypatch.setattr(
+        currency,
+        "refresh_bases",
+        lambda base_dir, bases: calls.append((base_dir, bases)),
+    )
 
+    assert currency.main(["update-all"]) == 0
+    assert currency.main(["update-all", "usd", "gbp"]) == 0
+    assert calls == [(None, None), (None, ["usd", "gbp"])]
 
-def test_main_honors_explicit_empty_argv(monkeypatch):
+
+def test_main_update_locked_all_invokes_bulk_refresh(monkeypatch):
     calls = []
 
-    monkeypatch.setattr(currency.sys, "argv", ["currency.py", "update", "isk"])
     monkeypatch.setattr(
         currency,
-        "refresh_rates",
-        lambda base_dir, base: calls.append((base_dir, base)),
+        "refresh_bases_with_existing_lock",
+        lambda base_dir, lock_path, token=None: calls.append(
+            (base_dir, lock_path, token)
+        ),
     )
+    monkeypatch.setenv(currency.LOCK_TOKEN_ENV, "worker-token")
 
-    with pytest.raises(
-        SystemExit,
-        match="Usage: python -m converter.currency",
-    ):
-        currency.main([])
+    assert currency.main(["update-locked-all", "/tmp/eur.lock"]) == 0
+    assert calls == [(None, "/tmp/eur.lock", "worker-token")]
 
-    assert calls == []
+
+@pytest.fixture
+def refresh_worker():
+    worker = currency.enable_in_process_refresh()
+    try:
+        yield worker
+    finally:
+        currency.disable_in_process_refresh()
+
+
+def fail_popen(*args, **kwargs):
+    raise AssertionError("Popen called")
+
+
+def test_in_process_refresh_runs_on_worker_thread(
+    tmp_path,
+    monkeypatch,
+    refresh_worker,
+):
+    threads = []
+    fetched = currency.RateCache(
+        base="isk",
+        date=dt.date(2026, 4, 24),
+        fetched_at=dt.date(2026, 4, 25),
+        rates={"eur": decimal.Decimal("0.0069542179")},
+    )
+    monkeypatch.setattr(currency.subprocess, "Popen", fail_popen)
+    monkeypatch.setattr(
+        currency,
+        "fetch_rates",
+        lambda base, previous=None: threads.append(
+            threading.current_thread().name
+        ) or fetched,
+    )
+
+    assert currency.start_background_refresh_status(tmp_path, "isk") == (
+        currency.BACKGROUND_REFRESH_STARTED
+    )
+    refresh_worker.join()
+
+    assert threads == ["converter-currency-refresh"]
+    assert currency.read_rate_cache(tmp_path, "isk") == fetched
+    assert not (tmp_path / "currency" / "locks" / "isk.lock").exists()
+
+
+def test_in_process_refresh_respects_cross_process_lock(
+    tmp_path,
+    monkeypatch,
+    refresh_worker,
+):
+    lock = currency.acquire_refresh_lock(tmp_path, "isk")
+    monkeypatch.setattr(
+        refresh_worker,
+        "submit",
+        lambda job: (_ for _ in ()).throw(AssertionError("submitted")),
+    )
+
+    assert currency.start_background_refresh_status(tmp_path, "isk") == (
+        currency.BACKGROUND_REFRESH_ALREADY_RUNNING
+    )
+    lock.release()
+
+
+def test_in_process_refresh_records_errors_and_releases_lock(
+    tmp_path,
+    monkeypatch,
+    refresh_worker,
+):
+    def fail(base, previous=None):
+        raise RuntimeError("network down")
+
+    monkeypatch.setattr(currency, "fetch_rates", fail)
+
+    currency.start_background_refresh_status(tmp_path, "isk")
+    refresh_worker.join()
+
+    assert str(refresh_worker.last_error) == "network down"
+    assert currency.acquire_refresh_lock(tmp_path, "isk").acquired is True
+
+
+def test_in_process_bulk_refresh_fetches_reference(
+    tmp_path,
+    monkeypatch,
+    refresh_worker,
+):
+    calls = []
+    monkeypatch.setenv(currency.BULK_REFRESH_ENV, "yes")
+    monkeypatch.setenv(currency.DEFAULT_TARGETS_ENV, "usd")
+    monkeypatch.setattr(currency.subprocess, "Popen", fail_popen)
+    monkeypatch.setattr(
+        currency,
+        "fetch_rates",
+        lambda base, previous=None: calls.append(base) or _reference_cache(),
+    )
+
+    currency.start_background_refresh_status(tmp_path, "isk")
+    refresh_worker.join()
+
+    assert calls == ["eur"]
+    assert currency.cached_bases(tmp_path) == ("eur", "usd")
+
+
+def test_refresh_worker_restarts_after_stop():
+    worker = currency.RefreshWorker()
+    ran = []
+
+    worker.submit(lambda: ran.append(1))
+    worker.join()
+    worker.stop()
+    worker.stop()
+    worker.submit(lambda: ran.append(2))
+    worker.join()
+    worker.stop()
+
+    assert ran == [1, 2]
+
+
+def test_enable_in_process_refresh_is_idempotent():
+    try:
+        worker = currency.enable_in_process_refresh()
+        assert currency.enable_in_process_refresh() is worker
+    finally:
+        currency.disable_in_process_refresh()
+    currency.disable_in_process_refresh()
+
+
+def test_convert_query_records_source_usage_once_per_day(
+    tmp_path,
+    monkeypatch,
+):
+    monkeypatch.setattr(
+        currency,
+        "start_background_refresh_status",
+        lambda base_dir, base: currency.BACKGROUND_REFRESH_STARTED,
+    )
+    currency.convert_query(
+        tmp_path,
+        "5 isk eur",
+        today=dt.date(2026, 4, 24),
+    )
+    path = tmp_path / "currency" / "usage.json"
+    modified = path.stat().st_mtime_ns
+    currency.record_usage(tmp_path, "isk", dt.date(2026, 4, 24))
+
+    assert path.stat().st_mtime_ns == modified
+    assert currency.read_usage(tmp_path) == {"isk": dt.date(2026, 4, 24)}
+
+
+def test_convert_query_records_fresh_hits_once_per_day(
+    tmp_path,
+    monkeypatch,
+):
+    today = dt.date(2026, 4, 24)
+    currency.write_rate_cache(
+        tmp_path,
+        currency.RateCache(
+            base="isk",
+            date=today,
+            fetched_at=today,
+            rates={"eur": decimal.Decimal("0.007")},
+        ),
+    )
+    monkeypatch.setattr(currency, "_recorded_usage", {})
+
+    response = currency.convert_query(tmp_path, "5 isk eur", today=today)
+
+    assert response.items[0].arg == "0.035"
+    assert currency.read_usage(tmp_path) == {"isk": today}
+
+    # A later keystroke in a new process only checks the stamp
+    currency._recorded_usage.clear()
+    monkeypatch.setattr(
+        currency,
+        "read_usage",
+        lambda base_dir: pytest.fail("usage log read"),
+    )
+    currency.convert_query(tmp_path, "6 isk eur", today=today)
+
+
+def test_prefetched_bases_stay_in_usage_while_queried(
+    tmp_path,
+    monkeypatch,
+):
+    monkeypatch.setenv(currency.DEFAULT_TARGETS_ENV, "eur")
+    monkeypatch.setattr(currency, "_recorded_usage", {})
+    start = dt.date(2026, 4, 1)
+    days = [start]
+    monkeypatch.setattr(
+        currency,
+        "fetch_rates",
+        lambda base, previous=None: currency.RateCache(
+            base=base,
+            date=days[-1],
+            fetched_at=days[-1],
+            rates={"eur": decimal.Decimal("0.007")},
+        ),
+    )
+    currency.record_usage(tmp_path, "isk", start)
+
+    # Prefetch keeps ISK fresh every morning, so every query is a fresh
+    # hit, well past the seven day usage window
+    for offset in range(1, 15):
+        today = start + dt.timedelta(days=offset)
+        days.append(today)
+        currency._recorded_usage.clear()
+
+        assert "isk" in currency.prefetch(tmp_path, today)
+        response = currency.convert_query(tmp_path, "5 isk eur", today=today)
+        assert response.items[0].arg == "0.035"
+
+    assert currency.read_usage(tmp_path)["isk"] == today
+
+
+def test_record_usage_reads_the_log_once_per_process_and_day(
+    tmp_path,
+    monkeypatch,
+):
+    reads = []
+    read_usage = currency.read_usage
+
+    def count_reads(base_dir):
+        reads.append(base_dir)
+        return read_usage(base_dir)
+
+    monkeypatch.setattr(currency, "read_usage", count_reads)
+
+    for _ in range(3):
+        currency.record_usage(tmp_path, "isk", dt.date(2026, 4, 24))
+    currency.record_usage(tmp_path, "isk", dt.date(2026, 4, 25))
+
+    assert len(reads) == 2
+    assert currency.read_usage(tmp_path) == {"isk": dt.date(2026, 4, 25)}
+
+
+def test_read_usage_ignores_malformed_log(tmp_path):
+    (tmp_path / "currency").mkdir()
+    (tmp_path / "currency" / "usage.json").write_text(
+        '{"zzz": "2026-04-24"}',
+        encoding="utf-8",
+    )
+
+    assert currency.read_usage(tmp_path) == {}
+
+
+def test_record_usage_ignores_write_failures(tmp_path, monkeypatch):
+    def fail_replace(source, destination):
+        raise OSError("read-only")
+
+    monkeypatch.setattr(currency.os, "replace", fail_replace)
+
+    currency.record_usage(tmp_path, "isk", dt.date(2026, 4, 24))
+
+    assert currency.read_usage(tmp_path) == {}
+    assert list((tmp_path / "currency").glob("*.tmp")) == []
+
+
+def test_prefetch_bases_include_defaults_and_recent_usage(
+    tmp_path,
+    monkeypatch,
+):
+    monkeypatch.setenv(currency.DEFAULT_TARGETS_ENV, "usd eur")
+    for base, date in (
+        ("isk", dt.date(2026, 4, 20)),
+        ("nok", dt.date(2026, 4, 24)),
+        ("usd", dt.date(2026, 4, 24)),
+        ("sek", dt.date(2026, 4, 1)),
+    ):
+        currency.record_usage(tmp_path, base, date)
+
+    assert currency.prefetch_bases(tmp_path, dt.date(2026, 4, 25)) == (
+        "usd",
+        "eur",
+        "nok",
+        "isk",
+    )
+
+
+def test_prefetch_refreshes_only_bases_without_fresh_rates(
+    tmp_path,
+    monkeypatch,
+):
+    today = dt.date.today()
+    monkeypatch.setenv(currency.DEFAULT_TARGETS_ENV, "usd gbp jpy")
+    currency.write_rate_cache(
+        tmp_path,
+        currency.RateCache(
+            base="usd",
+            date=today,
+            fetched_at=today,
+            rates={"gbp": decimal.Decimal("0.8")},
+        ),
+    )
+    calls = []
+    monkeypatch.setattr(
+        currency,
+        "fetch_rates",
+        lambda base, previous=None: calls.append(base) or currency.RateCache(
+            base=base,
+            date=today,
+            fetched_at=today,
+            rates={"usd": decimal.Decimal("1.1")},
+        ),
+    )
+
+    assert currency.prefetch(tmp_path) == ("jpy",)
+    assert calls == ["jpy"]
+    assert currency.prefetch(tmp_path) == ()
+
+
+def test_prefetch_skips_locked_bases(tmp_path, monkeypatch):
+    monkeypatch.setenv(currency.DEFAULT_TARGETS_ENV, "usd")
+    lock = currency.acquire_refresh_lock(tmp_path, "usd")
+
+    assert currency.prefetch(tmp_path) == ()
+    lock.release()
+
+
+def test_bulk_prefetch_uses_one_reference_fetch(tmp_path, monkeypatch):
+    calls = []
+    monkeypatch.setenv(currency.BULK_REFRESH_ENV, "yes")
+    monkeypatch.setenv(currency.DEFAULT_TARGETS_ENV, "usd gbp")
+    monkeypatch.setattr(
+        currency,
+        "fetch_rates",
+        lambda base, previous=None: calls.append(base) or replace(
+            _reference_cache(),
+            fetched_at=dt.date.today(),
+        ),
+    )
+
+    assert currency.prefetch(tmp_path) == ("usd", "gbp")
+    assert calls == ["eur"]
+
+    lock = currency.acquire_refresh_lock(tmp_path, "eur")
+    monkeypatch.setenv(currency.DEFAULT_TARGETS_ENV, "jpy")
+    assert currency.prefetch(tmp_path) == ()
+    lock.release()
+
+
+def test_next_prefetch_at_runs_just_after_midnight():
+    assert currency.next_prefetch_at(dt.datetime(2026, 4, 24, 23, 59)) == (
+        dt.datetime(2026, 4, 25, 0, 1)
+    )
+    assert currency.next_prefetch_at().date() == (
+        dt.date.today() + dt.timedelta(days=1)
+    )
+
+
+def test_prefetch_scheduler_runs_immediately_and_stops(
+    tmp_path,
+    monkeypatch,
+):
+    ran = threading.Event()
+
+    def fake_prefetch(base_dir):
+        ran.set()
+        raise RuntimeError("network down")
+
+    monkeypatch.setattr(currency, "prefetch", fake_prefetch)
+    scheduler = currency.PrefetchScheduler(tmp_path)
+
+    assert scheduler.start().start() is scheduler
+    assert ran.wait(5)
+    scheduler.stop()
+    scheduler.stop()
+
+    assert str(scheduler.last_error) == "network down"
+
+
+def test_main_prefetch_invokes_prefetch(monkeypatch):
+    calls = []
+    monkeypatch.setattr(currency, "prefetch", calls.append)
+
+    assert currency.main(["prefetch"]) == 0
+    assert calls == [None]
+
+
+def test_main_update_invokes_refresh(monkeypatch):
+    calls = []
+
+    monkeypatch.setattr(
+        currency,
+        "refresh_rates",
+        lambda base_dir, base: calls.append((base_dir, base)),
+    )
+
+    assert currency.main(["update", "isk"]) == 0
+    assert calls == [(None, "isk")]
+
+
+def test_main_update_locked_invokes_refresh_with_existing_lock(monkeypatch):
+    calls = []
+
+    monkeypatch.setattr(
+        currency,
+        "refresh_rates_with_existing_lock",
+        lambda base_dir, base, lock_path, token=None: calls.append(
+            (base_dir, base, lock_path, token)
+        ),
+    )
+    monkeypatch.setenv(
+        currency.LOCK_TOKEN_ENV,
+        "worker-token",
+    )
+
+    assert currency.main(["update-locked", "isk", "/tmp/isk.lock"]) == 0
+    assert calls == [(None, "isk", "/tmp/isk.lock", "worker-token")]
+
+
+def test_main_rejects_invalid_usage():
+    with pytest.raises(
+        SystemExit,
+        match="Usage: python -m converter.currency",
+    ):
+        currency.main(["invalid"])
+
+
+def test_main_honors_explicit_empty_argv(monkeypatch):
+    calls = []
+
+    monkeypatch.setattr(currency.sys, "argv", ["currency.py", "update", "isk"])
+    monkeypatch.setattr(
+        currency,
+        "refresh_rates",
+        lambda base_dir, base: calls.append((base_dir, base)),
+    )
+
+    with pytest.raises(
+        SystemExit,
+        match="Usage: python -m converter.currency",
+    ):
+        currency.main([])
+
+    assert calls == []
+
+
+def _history_cache(base, day, rates):
+    return currency.RateCache(
+        base=base,
+        date=day,
+        fetched_at=day,
+        rates={
+            code: decimal.Decimal(value) for code, value in rates.items()
+        },
+    )
+
+
+def test_parse_query_reads_history_dates():
+    assert currency.parse_query("100 usd to eur @2025-01-31") == (
+        currency.CurrencyQuery(
+            amount=decimal.Decimal("100"),
+            source="usd",
+            target="eur",
+            on=dt.date(2025, 1, 31),
+        )
+    )
+    assert currency.parse_default_query("5 usd @2025-01-31").on == (
+        dt.date(2025, 1, 31)
+    )
+    assert currency.parse_query("100 usd eur @2025-02-30") is None
+    assert currency.parse_default_query("5 usd @2025-13-01") is None
+    assert currency.parse_query("100 usd eur @25-01-31") is None
+
+
+def test_rate_refreshes_append_to_history(tmp_path):
+    first = _history_cache("usd", dt.date(2025, 1, 30), {"eur": "0.95"})
+    second = _history_cache("usd", dt.date(2025, 1, 31), {"eur": "0.96"})
+    currency.write_rate_cache(tmp_path, first)
+    currency.write_rate_cache(tmp_path, second)
+    # Tables already recorded for a day are never rewritten
+    currency.write_rate_cache(
+        tmp_path,
+        _history_cache("usd", dt.date(2025, 1, 31), {"eur": "9"}),
+    )
+
+    assert currency.read_rate_cache(tmp_path, "usd").rates == {
+        "eur": decimal.Decimal("9"),
+    }
+    assert currency.read_history_cache(
+        tmp_path, "usd", dt.date(2025, 1, 30)
+    ) == first
+    assert currency.read_history_cache(
+        tmp_path, "usd", dt.date(2025, 2, 3)
+    ) == second
+    assert currency.read_history_cache(
+        tmp_path, "usd", dt.date(2025, 1, 29)
+    ) is None
+
+
+def test_history_lookup_derives_cross_rates(tmp_path):
+    currency.record_history(
+        tmp_path,
+        [
+            _history_cache(
+                "eur",
+                dt.date(2025, 1, 31),
+                {"usd": "1.25", "isk": "160"},
+            ),
+            _history_cache("isk", dt.date(2025, 1, 20), {"gbp": "0.006"}),
+            _history_cache("gbp", dt.date(2025, 1, 31), {"jpy": "190"}),
+        ],
+    )
+
+    cache = currency.read_history_cache(
+        tmp_path,
+        "isk",
+        dt.date(2025, 2, 1),
+        targets=("usd",),
+    )
+    assert cache.base == "isk"
+    assert cache.date == dt.date(2025, 1, 31)
+    assert cache.rates["usd"] == decimal.Decimal("1.25") / 160
+
+    # The ISK table is older but is the only one listing GBP
+    cache = currency.read_history_cache(
+        tmp_path,
+        "isk",
+        dt.date(2025, 2, 1),
+        targets=("gbp",),
+    )
+    assert cache.date == dt.date(2025, 1, 20)
+    assert currency.read_history_cache(
+        tmp_path, "chf", dt.date(2025, 2, 1)
+    ) is None
+
+
+def test_history_lookup_only_loads_the_chosen_table(tmp_path, monkeypatch):
+    currency.record_history(
+        tmp_path,
+        [
+            _history_cache("usd", dt.date(2025, 1, 30), {"eur": "0.95"}),
+            _history_cache("usd", dt.date(2025, 1, 31), {"eur": "0.96"}),
+            _history_cache("eur", dt.date(2025, 1, 31), {"usd": "1.04"}),
+            _history_cache(
+                "gbp",
+                dt.date(2025, 1, 31),
+                {"usd": "1.25", "jpy": "190"},
+            ),
+        ],
+    )
+    loaded = []
+    history_table = currency._history_table
+
+    def record_table(connection, base, date):
+        loaded.append((base, date))
+        return history_table(connection, base, date)
+
+    monkeypatch.setattr(currency, "_history_table", record_table)
+
+    cache = currency.read_history_cache(
+        tmp_path, "usd", dt.date(2025, 2, 1), targets=("eur",)
+    )
+    assert cache.rates == {"eur": decimal.Decimal("0.96")}
+    assert loaded == [("usd", "2025-01-31")]
+
+    # JPY is only listed by GBP, so that is the one cross table loaded
+    del loaded[:]
+    cache = currency.read_history_cache(
+        tmp_path, "usd", dt.date(2025, 2, 1), targets=("jpy",)
+    )
+    assert cache.rates["jpy"] == decimal.Decimal("190") / decimal.Decimal(
+        "1.25"
+    )
+    assert loaded == [("usd", "2025-01-31"), ("gbp", "2025-01-31")]
+
+
+def test_history_lookup_ignores_missing_or_broken_history(tmp_path):
+    on = dt.date(2025, 1, 31)
+    assert currency.read_history_cache(tmp_path, "usd", on) is None
+
+    currency.record_history(tmp_path, [])
+    assert not os.path.exists(currency.history_path(tmp_path))
+
+    currency.record_history(
+        tmp_path,
+        [_history_cache("usd", on, {"eur": "0.95"})],
+    )
+    with contextlib.closing(
+        currency.sqlite3.connect(currency.history_path(tmp_path))
+    ) as connection, connection:
+        connection.execute("UPDATE rates SET rate = 'nan'")
+    assert currency.read_history_cache(tmp_path, "usd", on) is None
+
+    Path(currency.history_path(tmp_path)).write_bytes(b"not a database")
+    assert currency.read_history_cache(tmp_path, "usd", on) is None
+
+
+def test_history_failures_do_not_fail_rate_writes(tmp_path):
+    os.makedirs(currency.history_path(tmp_path))
+    cache = _history_cache("usd", dt.date(2025, 1, 31), {"eur": "0.95"})
+
+    currency.write_rate_cache(tmp_path, cache)
+
+    assert currency.read_rate_cache(tmp_path, "usd") == cache
+
+
+def test_convert_historical_query_uses_history_offline(
+    tmp_path, monkeypatch
+):
+    monkeypatch.setattr(
+        currency,
+        "start_background_refresh_status",
+        lambda base_dir, base: pytest.fail("refresh started"),
+    )
+    monkeypatch.delenv(currency.DEFAULT_TARGETS_ENV, raising=False)
+    currency.record_history(
+        tmp_path,
+        [
+            _history_cache(
+                "usd",
+                dt.date(2025, 1, 31),
+                {"eur": "0.96", "gbp": "0.8"},
+            ),
+        ],
+    )
+
+    response = currency.convert_query(tmp_path, "100 usd to eur @2025-02-02")
+
+    assert response.items[0].title == "100 USD ($) = 96 EUR (€)"
+    assert response.items[0].subtitle == (
+        "US Dollar to Euro - Rates from 2025-01-31"
+    )
+    assert not os.path.exists(currency.usage_log_path(tmp_path))
+
+    response = currency.convert_query(tmp_path, "5 usd @2025-01-31")
+    assert [item.arg for item in response.items[:2]] == ["4.8", "4"]
+
+    response = currency.convert_query(tmp_path, "5 usd eur @2025-01-30")
+    assert response.items[0].valid is False
+    assert response.items[0].subtitle == (
+        "No USD rate history on or before 2025-01-30."
+    )
@@ -0,0 +1,178 @@
+import asyncio
+import datetime as dt
+import decimal
+import threading
+
+import pytest
+
+from converter import currency, currency_async
+
+TODAY = dt.date(2026, 4, 25)
+
+
+def rate_cache(base, rates, fetched_at=TODAY):
+    return currency.RateCache(
+        base=base,
+        date=fetched_at,
+        fetched_at=fetched_at,
+        rates={
+            code: decimal.Decimal(value) for code, value in rates.items()
+        },
+    )
+
+
+def convert_many(queries, base_dir):
+    return asyncio.run(
+        currency_async.convert_many(queries, base_dir=base_dir, today=TODAY)
+    )
+
+
+def test_convert_many_keeps_input_order_and_reads_each_table_once(
+    tmp_path, monkeypatch
+):
+    currency.write_rate_cache(tmp_path, rate_cache("usd", {"eur": "0.9"}))
+    currency.write_rate_cache(tmp_path, rate_cache("isk", {"eur": "0.0066"}))
+    reads = []
+    read_rate_cache = currency.read_rate_cache
+
+    def counting_read(base_dir, base):
+        reads.append(base)
+        return read_rate_cache(base_dir, base)
+
+    monkeypatch.setattr(currency, "read_rate_cache", counting_read)
+
+    results = convert_many(
+        [
+            "10 usd eur",
+            currency.CurrencyQuery(
+                amount=decimal.Decimal("2000"),
+                source="isk",
+                target="eur",
+            ),
+            "1,5 usd to eur",
+            "3 isk gbp",
+        ],
+        tmp_path,
+    )
+
+    assert results == [
+        decimal.Decimal("9.0"),
+        decimal.Decimal("13.2000"),
+        decimal.Decimal("1.35"),
+        None,
+    ]
+    assert sorted(reads) == ["isk", "usd"]
+
+
+def test_convert_many_fetches_missing_tables_concurrently(
+    tmp_path, monkeypatch
+):
+    # Both fetches must be in flight at once for the barrier to open
+    barrier = threading.Barrier(2, timeout=5)
+    fetched = []
+
+    def fake_fetch(base, previous=None):
+        fetched.append(base)
+        barrier.wait()
+        return rate_cache(base, {"jpy": "150"})
+
+    monkeypatch.setattr(currency, "fetch_rates", fake_fetch)
+
+    results = convert_many(
+        ["1 usd jpy", "2 usd jpy", "1 chf jpy"],
+        tmp_path,
+    )
+
+    assert results == [
+        decimal.Decimal("150"),
+        decimal.Decimal("300"),
+        decimal.Decimal("150"),
+    ]
+    assert sorted(fetched) == ["chf", "usd"]
+    assert currency.read_rate_cache(tmp_path, "chf").rates == {
+        "jpy": decimal.Decimal("150"),
+    }
+
+
+def test_convert_many_uses_cross_rates_before_fetching(
+    tmp_path, monkeypatch
+):
+    currency.write_rate_cache(
+        tmp_path,
+        rate_cache("eur", {"usd": "1.25", "isk": "160"}),
+    )
+    monkeypatch.setattr(
+        currency,
+        "fetch_rates",
+        lambda base, previous=None: pytest.fail("fetched"),
+    )
+
+    assert convert_many(["16 isk usd"], tmp_path) == [
+        decimal.Decimal("0.125"),
+    ]
+
+
+def test_convert_many_falls_back_to_stale_table_when_refresh_fails(
+    tmp_path, monkeypatch
+):
+    stale = rate_cache("usd", {"eur": "0.9"}, fetched_at=dt.date(2026, 4, 1))
+    currency.write_rate_cache(tmp_path, stale)
+
+    def failing_fetch(base, previous=None):
+        raise RuntimeError("offline")
+
+    monkeypatch.setattr(currency, "fetch_rates", failing_fetch)
+
+    assert convert_many(["10 usd eur"], tmp_path) == [decimal.Decimal("9.0")]
+    with pytest.raises(RuntimeError, match="offline"):
+        convert_many(["10 chf eur"], tmp_path)
+
+
+def test_convert_many_keeps_full_precision():
+    cache = rate_cache("usd", {"eur": "0.123456789012345678901234567"})
+    query = currency.parse_query("123456789.123456789 usd eur")
+
+    with decimal.localcontext() as context:
+        context.prec = 100
+        expected = query.amount * cache.rates["eur"]
+
+    assert currency_async._convert_group([query], cache) == [expected]
+    assert len(expected.as_tuple().digits) > 28
+
+
+def test_convert_many_rejects_invalid_queries(tmp_path):
+    with pytest.raises(ValueError, match="invalid currency query"):
+        convert_many(["10 usd"], tmp_path)
+
+
+def test_format_many_matches_alfred_results(tmp_path):
+    currency.write_rate_cache(
+        tmp_path,
+        rate_cache("usd", {"eur": "0.9", "jpy": "150.123"}),
+    )
+    queries = ["10 usd eur", "0.0000001 usd eur", "2,5 usd jpy", "1 usd gbp"]
+
+    results = asyncio.run(
+        currency_async.format_many(queries, base_dir=tmp_path, today=TODAY)
+    )
+
+    assert results == ["9", "0.00000009", "375.3075", None]
+
+
+def test_convert_many_groups_historical_queries_by_date(tmp_path):
+    currency.record_history(
+        tmp_path,
+        [
+            rate_cache("usd", {"eur": "0.9"}, fetched_at=dt.date(2025, 1, 1)),
+            rate_cache("usd", {"eur": "0.8"}, fetched_at=dt.date(2025, 2, 1)),
+        ],
+    )
+
+    results = convert_many(
+        ["10 usd eur @2025-01-15", "10 usd eur @2025-02-01"],
+        tmp_path,
+    )
+
+    assert results == [decimal.Decimal("9.0"), decimal.Decimal("8.0")]
+    with pytest.raises(RuntimeError, match="No USD rate history"):
+        convert_many(["10 usd eur @2024-12-31"], tmp_path)
@@ -0,0 +1,111 @@
+import datetime as dt
+import decimal
+import random
+
+import pytest
+
+from converter import currency, fixed_point
+
+
+def random_decimal(rng, max_digits, max_places, signed=True):
+    digits = rng.randint(1, max_digits)
+    places = rng.randint(0, max_places)
+    coefficient = rng.randrange(10 ** digits)
+    if signed and rng.random() < 0.2:
+        coefficient = -coefficient
+    return decimal.Decimal(coefficient).scaleb(-places)
+
+
+@pytest.mark.parametrize(
+    "value",
+    [
+        "0",
+        "-0.000",
+        "1",
+        "150",
+        "1E+3",
+        "0.5",
+        "0.0000005",
+        "0.0000015",
+        "0.0000025",
+        "-0.0000025",
+        "0.00000049",
+        "0.0000001",
+        "-0.0000001",
+        "123.4500005",
+        "999999.9999995",
+        "0.039062500",
+        "1E-12",
+    ],
+)
+def test_format_decimal_matches_currency_formatter(value):
+    value = decimal.Decimal(value)
+
+    assert fixed_point.format_decimal(value) == currency._format_decimal(
+        value
+    )
+
+
+def test_format_decimal_matches_currency_formatter_for_random_values():
+    rng = random.Random(34)
+
+    for _ in range(5000):
+        value = random_decimal(rng, 30, 20)
+        assert fixed_point.format_decimal(value) == (
+            currency._format_decimal(value)
+        ), value
+
+
+def test_scaled_rate_table_matches_conversion_items():
+    rng = random.Random(340)
+    rates = {
+        code: random_decimal(rng, 12, 10, signed=False)
+        + decimal.Decimal("0.0001")
+        for code in ("usd", "eur", "jpy", "gbp", "isk")
+    }
+    cache = currency.RateCache(
+        base="chf",
+        date=dt.date(2026, 4, 24),
+        fetched_at=dt.date(2026, 4, 25),
+        rates=rates,
+    )
+    table = fixed_point.ScaledRateTable.from_cache(cache)
+
+    for _ in range(2000):
+        query = currency.CurrencyQuery(
+            amount=random_decimal(rng, 15, 6),
+            source="chf",
+            target=rng.choice(sorted(rates)),
+        )
+        item = currency._conversion_item(query, cache)
+        assert table.format(query.amount, query.target) == item.arg, query
+
+
+def test_scaled_rate_table_stores_rates_on_one_scale():
+    cache = currency.RateCache(
+        base="eur",
+        date=dt.date(2026, 4, 24),
+        fetched_at=dt.date(2026, 4, 25),
+        rates={
+            "usd": decimal.Decimal("1.25"),
+            "isk": decimal.Decimal("160"),
+            "btc": decimal.Decimal("0.0000123"),
+        },
+    )
+
+    table = fixed_point.ScaledRateTable.from_cache(cache)
+
+    assert table.scale == 7
+    assert table.rates == {"usd": 12500000, "isk": 1600000000, "btc": 123}
+    assert table.convert(decimal.Decimal("2.5"), "usd") == (312500000, 8)
+    assert table.convert(decimal.Decimal("1"), "gbp") is None
+    assert table.format(decimal.Decimal("1"), "gbp") is None
+
+
+def test_scaled_values_reject_inexact_and_non_finite_input():
+    with pytest.raises(ValueError, match="more than 2 decimal places"):
+        fixed_point.scale_decimal(decimal.Decimal("0.125"), 2)
+    with pytest.raises(ValueError, match="not finite"):
+        fixed_point.scale_decimal(decimal.Decimal("NaN"), 2)
+    with pytest.raises(ValueError, match="not finite"):
+        fixed_point.split_decimal(decimal.Decimal("Infinity"))
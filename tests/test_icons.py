@@ -0,0 +1,41 @@
+import pickle
+
+from converter import convert, output, settings
+
+
+def test_units_resolve_their_icon_when_built(units):
+    assert units.get('m').icon == 'scale6.png'
+    assert units.get('kg').icon == 'weight4.png'
+    assert units.get('MB').icon == 'binary9.png'
+
+    loaded = pickle.loads(pickle.dumps(units, -1))
+    assert loaded.get('m').icon == 'scale6.png'
+
+
+def test_get_icon_applies_the_color_prefix(units):
+    meter = units.get('m')
+
+    assert meter.get_icon('') == 'scale6.png'
+    assert meter.get_icon('inv-') == 'inv-scale6.png'
+
+
+def test_icon_paths_cover_light_and_dark_themes():
+    for icon, (light, dark) in convert.ICON_PATHS.items():
+        assert light == f'icons/{icon}'
+        assert dark == f'icons/inv-{icon}'
+        assert convert.icon_path(icon, 'inv-') is dark
+
+
+def test_items_use_the_precomputed_icons(units):
+    create_item = output.item_creator()
+    dark = settings.Settings(color_prefix='inv-')
+
+    light_items = list(convert.main(units, '1 kg in g', create_item))
+    dark_items = list(convert.main(units, '1 kg in g', create_item, dark))
+    fallback = list(convert.create_items(
+        create_item, units.get('A'), '1', ['title'], units.get('mA'), ''
+    ))
+
+    assert light_items[0].icon == 'icons/weight4.png'
+    assert dark_items[0].icon == 'icons/inv-weight4.png'
+    assert fallback[0].icon == 'icons/ruler9.png'
@@ -0,0 +1,63 @@
+import decimal
+import math
+
+import pytest
+
+from converter import convert, corpus, output
+
+
+@pytest.mark.parametrize('value', [
+    '1', '1000', '-0.5', '5E-7', '123456.789', '2E+400', '-3E-400',
+])
+def test_magnitude_matches_log10(value):
+    value = decimal.Decimal(value)
+
+    assert convert.magnitude(value) == pytest.approx(
+        float(value.copy_abs().log10()), abs=1e-12
+    )
+
+
+def test_magnitude_special_values():
+    assert convert.magnitude(decimal.Decimal(0)) == -math.inf
+    assert convert.magnitude(decimal.Decimal('-inf')) == math.inf
+    assert math.isnan(convert.magnitude(decimal.Decimal('nan')))
+
+
+def test_sort_results_breaks_near_ties_exactly(units):
+    # |log10(5/6)| and |log10(6/5)| only differ by rounding
+    liter_per_hour = units.get('L/h')
+    results = [
+        (liter_per_hour, decimal.Decimal(50), units.get('m3/d')),
+        (liter_per_hour, decimal.Decimal(50), units.get('L/min')),
+    ]
+
+    exact = sorted(
+        results,
+        key=lambda result: convert.sort_abs_magnitude(result, exact=True),
+    )
+
+    assert convert.sort_results(results, convert.sort_abs_magnitude) == (
+        exact
+    )
+    assert convert.sort_results(results[::-1], convert.sort_abs_magnitude) == (
+        exact
+    )
+
+
+def test_results_match_exact_magnitudes(monkeypatch, units):
+    weights = dict(corpus.WEIGHTS, currency=0)
+    queries = corpus.generate(units, 300, seed=11, weights=weights)
+    create_item = output.item_creator()
+
+    def titles():
+        return [
+            [item.title for item in convert.main(units, query, create_item)]
+            for query in queries
+        ]
+
+    estimated = titles()
+    monkeypatch.setattr(
+        convert, 'magnitude', lambda value: value.copy_abs().log10()
+    )
+
+    assert estimated == titles()
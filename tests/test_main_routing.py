@@ -1,5 +1,8 @@
+import io
 import json
 
+import pytest
+
 from converter import main
 
 
@@ -166,3 +169,40 @@ def test_malformed_update_command_routes_to_currency_update(
 
     assert response.items[0].valid is False
     assert response.items[0].title == "Invalid currency update command"
+
+
+def test_stream_writes_unit_results_as_json(monkeypatch, tmp_path):
+    monkeypatch.setenv("alfred_workflow_cache", str(tmp_path))
+    buffer = io.StringIO()
+
+    count = main.stream("1 + 1", out=buffer)
+
+    data = json.loads(buffer.getvalue())
+    assert count == len(data["items"])
+    assert data["skipknowledge"] is True
+    assert data["items"][0]["title"] == "2"
+
+
+def test_stream_writes_ndjson(monkeypatch, tmp_path):
+    monkeypatch.setenv("alfred_workflow_cache", str(tmp_path))
+    buffer = io.StringIO()
+
+    count = main.stream("1 inch", ndjson=True, out=buffer)
+
+    lines = buffer.getvalue().split("\n")[:-1]
+    assert count == len(lines) > 1
+    assert all(json.loads(line)["title"] for line in lines)
+
+
+def test_stream_empty_results_raise_before_writing(monkeypatch):
+    def no_results(units, query, create_item):
+        return iter(())
+
+    monkeypatch.setattr(main, "load_units", object)
+    monkeypatch.setattr(main.convert, "main", no_results)
+    buffer = io.StringIO()
+
+    with pytest.raises(RuntimeError):
+        main.stream("1 m in cm", out=buffer)
+
+    assert buffer.getvalue() == ""
@@ -0,0 +1,60 @@
+import pickle
+
+from converter import __main__ as cli, memory
+
+
+def test_report_covers_every_part(units):
+    report = memory.report(units)
+
+    for part in memory.PARTS:
+        assert report[part] > 0
+    assert report['total'] > sum(report[part] for part in memory.PARTS)
+    assert report['unit_count'] == len(
+        {id(unit) for unit in units.ids.values()}
+    )
+
+
+def test_deep_size_counts_shared_objects_once():
+    shared = ['x' * 100]
+    seen = set()
+
+    first = memory.deep_size([shared], seen)
+    second = memory.deep_size([shared], seen)
+
+    assert first > second
+
+
+def test_units_share_params_and_quantity_types(units):
+    report = memory.report(units)
+
+    assert report['conversion_params'] < report['unit_count'] / 2
+    assert report['quantity_type_sets'] < report['unit_count'] / 4
+    kilogram, gram = units.get('kg'), units.get('g')
+    assert kilogram.quantity_types is gram.quantity_types
+    assert not hasattr(kilogram, '__dict__')
+
+
+def test_shared_params_keep_decimal_exponents(units):
+    one = units.shared_params('0', '1', '1', '0')
+
+    assert units.shared_params(0, 1, 1, 0) is one
+    assert units.shared_params('0', '1.0', '1', '0') is not one
+
+
+def test_slotted_units_round_trip_through_pickle(units):
+    loaded = pickle.loads(pickle.dumps(units, -1))
+
+    inch = loaded.get('in')
+    assert inch.fractional
+    assert inch.units is loaded
+    assert inch.conversion_params == units.get('in').conversion_params
+    assert loaded.get('ft').split == 'in'
+    assert 'Unit' in repr(inch)
+
+
+def test_memory_command_prints_report(capsys):
+    assert cli.main(['memory']) == 0
+
+    out = capsys.readouterr().out
+    assert 'total: ' in out
+    assert 'unit_count: ' in out
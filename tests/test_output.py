@@ -1,6 +1,12 @@
+import dataclasses
+import io
 import json
+import pickle
+import tracemalloc
 from decimal import Decimal
 
+import pytest
+
 from converter import output
 
 
@@ -186,3 +192,139 @@ def test_write_json_writes_response_to_stdout(capsys):
             }
         ]
     }
+
+
+def _json_items():
+    return [
+        output.Item(title="2"),
+        output.Item(
+            title='5\' = 60" \\ "quoted"',
+            subtitle="Grüße   tab\tnewline\n",
+            arg="1,5",
+            uid="calc:1,5",
+            valid=False,
+            icon="icons/currencies/flags/eur.png",
+            autocomplete="1,5 €",
+        ),
+        output.Item(
+            title="1 in",
+            arg="1",
+            text_copy="copy",
+            text_largetype="largetype",
+        ),
+    ]
+
+
+def test_item_to_json_matches_json_dumps():
+    for item in _json_items():
+        assert item.to_json() == json.dumps(
+            item.to_alfred(),
+            ensure_ascii=False,
+        )
+
+
+def test_response_to_json_matches_json_dumps():
+    responses = [
+        output.Response(),
+        output.Response(items=_json_items(), skipknowledge=True),
+        output.Response(items=_json_items()[:1], rerun=0.5),
+    ]
+
+    for response in responses:
+        assert response.to_json() == json.dumps(
+            response.to_alfred(),
+            ensure_ascii=False,
+        )
+
+
+def test_render_json_matches_json_dumps():
+    response = output.Response(items=_json_items(), rerun=1)
+
+    assert output.render_json(response) == json.dumps(
+        response.to_alfred(), ensure_ascii=False
+    )
+
+
+def test_items_and_responses_are_slotted():
+    item = output.Item(title="2", arg="2")
+    response = output.Response(items=[item])
+
+    assert not hasattr(item, "__dict__")
+    assert not hasattr(response, "__dict__")
+    with pytest.raises(dataclasses.FrozenInstanceError):
+        item.title = "3"
+
+
+def test_slotted_items_round_trip_through_pickle():
+    response = output.Response(items=_json_items(), rerun=0.5)
+
+    assert pickle.loads(pickle.dumps(response, -1)) == response
+
+
+def test_slotted_items_restore_dict_pickle_state():
+    item = output.Item.__new__(output.Item)
+    state = dataclasses.asdict(output.Item(title="2", arg="2"))
+
+    item.__setstate__(state)
+
+    assert item == output.Item(title="2", arg="2")
+
+
+def test_create_item_allocations_per_response():
+    create_item = output.item_creator()
+    attrib = {"uid": "m to cm", "arg": "1000", "valid": "yes"}
+
+    def build():
+        return output.Response(items=[
+            create_item(
+                title="10 meter = 1000 centimeter",
+                subtitle="subtitle",
+                icon="icons/scale6.png",
+                attrib=attrib,
+            )
+            for _ in range(100)
+        ])
+
+    build()
+    tracemalloc.start()
+    try:
+        snapshot = tracemalloc.take_snapshot()
+        response = build()
+        stats = tracemalloc.take_snapshot().compare_to(snapshot, "filename")
+    finally:
+        tracemalloc.stop()
+
+    assert len(response.items) == 100
+    # One slotted instance per item, plus the list and response
+    assert sum(stat.count_diff for stat in stats) < 150
+
+
+def test_write_stream_matches_response_to_json():
+    for kwargs in ({}, {"skipknowledge": True, "rerun": 0.5}):
+        buffer = io.StringIO()
+
+        count = output.write_stream(
+            iter(_json_items()), stream=buffer, **kwargs
+        )
+
+        assert count == len(_json_items())
+        assert buffer.getvalue() == output.Response(
+            items=_json_items(), **kwargs
+        ).to_json()
+
+
+def test_write_stream_handles_no_items():
+    buffer = io.StringIO()
+
+    assert output.write_stream(iter(()), stream=buffer) == 0
+    assert buffer.getvalue() == output.Response().to_json()
+
+
+def test_write_ndjson_writes_one_item_per_line():
+    buffer = io.StringIO()
+
+    count = output.write_ndjson(_json_items(), stream=buffer)
+
+    lines = buffer.getvalue().split("\n")[:-1]
+    assert count == len(lines) == len(_json_items())
+    assert lines == [item.to_json() for item in _json_items()]
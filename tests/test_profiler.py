@@ -0,0 +1,53 @@
+import pytest
+
+from converter import __main__ as cli, profiler
+
+
+@pytest.fixture(autouse=True)
+def cache_dir(monkeypatch, tmp_path):
+    monkeypatch.setenv('alfred_workflow_cache', str(tmp_path))
+    return tmp_path
+
+
+def test_hotspots_report_covers_run():
+    report = profiler.hotspots('1 m in cm', runs=2, limit=50)
+
+    assert 'Ordered by: cumulative time' in report
+    assert 'main.py' in report
+
+
+def test_collapsed_stacks_count_samples(monkeypatch):
+    def slow_run(query):
+        deadline = profiler.time.perf_counter() + 0.02
+        while profiler.time.perf_counter() < deadline:
+            pass
+
+    monkeypatch.setattr(profiler.converter_main, 'run', slow_run)
+
+    lines = profiler.collapsed_stacks('1 m in cm', runs=2, interval=0.001)
+
+    assert lines
+    for line in lines:
+        stack, count = line.rsplit(' ', 1)
+        assert int(count) > 0
+    assert any('test_profiler:slow_run' in line for line in lines)
+
+
+def test_profile_command_writes_report_and_stacks(capsys, cache_dir):
+    path = cache_dir / 'query.folded'
+
+    assert cli.main([
+        'profile', '1 + 1', '-n', '2', '--collapsed', str(path),
+    ]) == 0
+
+    out = capsys.readouterr().out
+    assert 'function calls' in out
+    assert f'to {path}' in out
+    assert path.exists()
+
+
+def test_unknown_command_prints_usage(capsys):
+    assert cli.main(['missing']) == 2
+
+    usage = capsys.readouterr().err
+    assert 'usage: python -m converter {memory,profile}' in usage
@@ -0,0 +1,148 @@
+import decimal
+import math
+
+import pytest
+
+from converter import benchmark, safe_math
+
+D = decimal.Decimal
+
+ARGUMENTS = ['0', '0.5', '-1', '3', '-3', '1000', '-1000', '1E+20']
+
+
+def reference(function, argument, precision=60):
+    # Same function, far more digits, rounded to the default precision
+    with decimal.localcontext() as context:
+        context.prec = precision
+        value = function(D(argument))
+    return +value
+
+
+@pytest.mark.parametrize('name', ['cos', 'sin', 'tan'])
+@pytest.mark.parametrize('argument', ARGUMENTS)
+def test_trigonometry_matches_higher_precision(name, argument):
+    function = getattr(safe_math, name)
+
+    assert function(D(argument)) == reference(function, argument)
+
+
+@pytest.mark.parametrize('argument', ['0.5', '-1', '1000', '-1000'])
+def test_trigonometry_matches_floats(argument):
+    for name in ('cos', 'sin', 'tan'):
+        value = getattr(safe_math, name)(D(argument))
+        expected = getattr(math, name)(float(argument))
+
+        assert float(value) == pytest.approx(expected, rel=1e-12)
+
+
+def test_trigonometry_handles_quadrants():
+    pi = safe_math.pi()
+
+    assert abs(safe_math.cos(pi / 3) - D('0.5')) < D('1E-27')
+    assert safe_math.tan(pi / 4) == 1
+    assert safe_math.sin(-pi / 2) == -1
+    assert safe_math.cos(pi) == -1
+
+
+@pytest.mark.parametrize('name', ['cos', 'sin', 'tan'])
+def test_trigonometry_rejects_infinity(name):
+    with pytest.raises(decimal.InvalidOperation):
+        getattr(safe_math, name)(D('Inf'))
+
+
+@pytest.mark.parametrize('name, argument', [
+    ('exp', '200'),
+    ('exp', '-50'),
+    ('cosh', '3'),
+    ('sinh', '-3'),
+    ('tanh', '0.5'),
+    ('log', '1E-30'),
+    ('log2', '3'),
+    ('log1p', '1E-20'),
+    ('expm1', '1E-20'),
+])
+def test_functions_match_higher_precision(name, argument):
+    function = getattr(safe_math, name)
+
+    assert function(D(argument)) == reference(function, argument)
+
+
+@pytest.mark.parametrize('argument, expected', [
+    ('20', D('0.9999999999999999915032914894')),
+    ('-20', D('-0.9999999999999999915032914894')),
+    ('100', 1),
+    ('-100', -1),
+    ('10000000', 1),
+    ('-10000000', -1),
+    ('Inf', 1),
+    ('-Inf', -1),
+])
+def test_tanh_rounds_to_one_for_large_arguments(argument, expected):
+    assert safe_math.tanh(D(argument)) == expected
+
+
+def test_tanh_keeps_working_in_queries_with_large_arguments():
+    assert safe_math.safe_eval('tanh(10000000)') == 1
+    assert safe_math.safe_eval('tanh(-10000000)') == -1
+
+
+@pytest.mark.parametrize('argument', ['-50', '-1000'])
+def test_hyperbolic_functions_are_symmetric(argument):
+    positive = -D(argument)
+
+    assert safe_math.sinh(D(argument)) == -safe_math.sinh(positive)
+    assert safe_math.cosh(D(argument)) == safe_math.cosh(positive)
+    assert safe_math.tanh(D(argument)) == -safe_math.tanh(positive)
+
+
+@pytest.mark.parametrize('name', ['sinh', 'cosh'])
+@pytest.mark.parametrize('argument', ['10000000', '-10000000'])
+def test_hyperbolic_functions_overflow_for_huge_arguments(name, argument):
+    with pytest.raises(decimal.Overflow):
+        getattr(safe_math, name)(D(argument))
+
+
+def test_exp_uses_full_precision_for_large_arguments():
+    assert str(safe_math.exp(D(200))) == '7.225973768125749258177477042E+86'
+
+
+@pytest.mark.parametrize('argument', ['0', '-1'])
+def test_log_rejects_non_positive_values(argument):
+    with pytest.raises(ValueError):
+        safe_math.log(D(argument))
+
+    with pytest.raises(ValueError):
+        safe_math.safe_eval(f'log({argument})')
+
+
+def test_floats_keep_using_math():
+    assert safe_math.cos(0.5) == math.cos(0.5)
+    assert safe_math.log(8, 2) == math.log(8, 2)
+    assert safe_math.tanh(0.5) == math.tanh(0.5)
+
+
+def test_pi_is_cached_per_precision():
+    safe_math._pi.cache_clear()
+    short = safe_math.pi()
+    assert safe_math.pi() is short
+
+    with decimal.localcontext() as context:
+        context.prec = 50
+        assert str(safe_math.pi()) == (
+            '3.1415926535897932384626433832795028841971693993751'
+        )
+
+    assert safe_math._pi.cache_info().misses == 2
+
+
+def test_safe_eval_uses_decimal_functions():
+    # e keeps a few guard digits, so powers of it stay exact
+    assert +safe_math.safe_eval('e') == reference(safe_math.exp, '1')
+    assert safe_math.safe_eval('tan(1)') == safe_math.tan(D(1))
+    assert safe_math.safe_eval('log2(1024)') == 10
+    assert isinstance(safe_math.safe_eval('cosh(1)'), D)
+
+
+def test_taylor_reference_agrees_for_small_arguments():
+    for name, function in benchmark.TAYLOR_FUNCTIONS.items():
+        assert function(D('0.5')) == getattr(safe_math, name)(D('0.5'))
@@ -0,0 +1,77 @@
+import decimal
+
+from converter import convert, currency, output, settings
+
+
+def test_defaults_without_environment(monkeypatch):
+    for name in settings.ENV_NAMES:
+        monkeypatch.delenv(name, raising=False)
+
+    assert settings.from_environ() == settings.Settings()
+
+
+def test_environment_is_parsed_into_settings(monkeypatch):
+    monkeypatch.setenv('UNITS_SIDE', 'Left')
+    monkeypatch.setenv('MAX_MAGNITUDE', '5')
+    monkeypatch.setenv('UNITS_BLACKLIST', ' Foot  Yard ')
+    monkeypatch.setenv('BASE_8', 'no')
+    monkeypatch.setenv('CURRENCY_DEFAULT_TARGETS', 'usd, EUR gbp')
+
+    config = settings.from_environ()
+
+    assert config.units_left is True
+    assert config.max_magnitude == 5
+    assert config.blacklist == {'foot', 'yard'}
+    assert config.bases == (16, 2)
+    assert config.currency_targets == ('usd', 'EUR', 'gbp')
+
+
+def test_current_is_cached_until_the_environment_changes(monkeypatch):
+    monkeypatch.setenv('MAX_MAGNITUDE', '4')
+    first = settings.current()
+
+    assert settings.current() is first
+
+    monkeypatch.setenv('MAX_MAGNITUDE', '6')
+    assert settings.current() is not first
+    assert settings.current().max_magnitude == 6
+
+
+def test_blacklist_hides_units_by_id(units):
+    create_item = output.item_creator()
+    config = settings.Settings(blacklist=frozenset({'centimetre'}))
+
+    assert 'cm' in config.blacklisted_ids(units)
+    assert units.get('cm').is_blacklisted(config)
+    assert not units.get('mm').is_blacklisted(config)
+
+    titles = [
+        item.title
+        for item in convert.main(units, '1 m', create_item, config)
+    ]
+    assert not any('centimeter' in title for title in titles)
+    assert any(
+        'centimeter' in item.title
+        for item in convert.main(units, '1 m', create_item)
+    )
+
+
+def test_bases_and_color_prefix_come_from_settings():
+    create_item = output.item_creator()
+    config = settings.Settings(color_prefix='inv-', bases=(2,))
+
+    items = list(convert.format_number(
+        create_item, decimal.Decimal(10), config
+    ))
+
+    assert [item.title for item in items] == ['10', '0b1010']
+    assert items[0].icon == 'icons/inv-calculator63.png'
+
+
+def test_currency_default_targets_use_settings():
+    config = settings.Settings(currency_targets=('GBP', 'usd', 'xyz'))
+
+    assert currency.default_targets('usd', config) == ('gbp',)
+    assert currency.default_targets('usd', settings.Settings()) == tuple(
+        target for target in currency.DEFAULT_TARGETS if target != 'usd'
+    )
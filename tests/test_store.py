@@ -0,0 +1,252 @@
+import datetime as dt
+import decimal
+import os
+import sqlite3
+
+import pytest
+
+from converter import currency, main, output, store
+
+
+@pytest.fixture(autouse=True)
+def close_stores():
+    yield
+    store.close_stores()
+
+
+@pytest.fixture
+def sqlite_store(monkeypatch, tmp_path):
+    monkeypatch.setenv(store.STORE_ENV, 'sqlite')
+    monkeypatch.setenv('alfred_workflow_cache', str(tmp_path))
+    return store.open_store(tmp_path)
+
+
+def rate_cache(base, rates, fetched_at=None):
+    fetched_at = fetched_at or dt.date.today()
+    return currency.RateCache(
+        base=base,
+        date=dt.date(2026, 4, 24),
+        fetched_at=fetched_at,
+        rates={
+            code: decimal.Decimal(value) for code, value in rates.items()
+        },
+    )
+
+
+def test_store_is_opt_in(monkeypatch, tmp_path):
+    monkeypatch.delenv(store.STORE_ENV, raising=False)
+    assert store.enabled() is False
+
+    monkeypatch.setenv(store.STORE_ENV, ' SQLite ')
+    assert store.enabled() is True
+
+    monkeypatch.setenv('alfred_workflow_cache', str(tmp_path))
+    assert store.store_path() == str(tmp_path / 'converter.sqlite3')
+    assert store.open_store() is store.open_store(tmp_path)
+
+
+def test_store_uses_write_ahead_logging(sqlite_store, tmp_path):
+    sqlite_store.write_rate_tables([('usd', {'base': 'usd'})])
+
+    with sqlite_store.transaction() as connection:
+        mode, = connection.execute('PRAGMA journal_mode').fetchone()
+
+    assert mode == 'wal'
+    assert os.path.exists(tmp_path / 'converter.sqlite3')
+
+
+def test_store_readers_do_not_wait_for_writers(sqlite_store):
+    sqlite_store.write_rate_tables([('usd', {'base': 'usd', 'v': 1})])
+    writer = sqlite3.connect(sqlite_store.path)
+    try:
+        writer.execute('BEGIN IMMEDIATE')
+        writer.execute(
+            "UPDATE rate_tables SET data = '{\"v\": 2}' WHERE base = 'usd'"
+        )
+        # The open write transaction neither blocks nor leaks into reads
+        assert sqlite_store.rate_table('usd') == {'base': 'usd', 'v': 1}
+        writer.commit()
+    finally:
+        writer.close()
+
+    assert sqlite_store.rate_table('usd') == {'v': 2}
+
+
+def test_store_keeps_only_current_units_snapshot(sqlite_store):
+    sqlite_store.save_units('old', b'old units')
+    sqlite_store.save_units('new', b'new units')
+
+    assert sqlite_store.units('old') is None
+    assert sqlite_store.units('new') == b'new units'
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = dt.datetime(2026, 4, 24, tzinfo=dt.timezone.utc)
+
+    def __call__(self):
+        return self.now
+
+    def advance(self, interval):
+        self.now += interval
+
+
+def test_store_result_cache_keeps_recently_used_results(
+    sqlite_store, monkeypatch
+):
+    clock = FakeClock()
+    monkeypatch.setattr(store, '_utcnow', clock)
+    monkeypatch.setattr(store, 'RESULT_CACHE_SIZE', 2)
+    responses = {
+        key: output.Response(items=[output.Item(title=key)])
+        for key in ('a', 'b', 'c')
+    }
+
+    sqlite_store.save_response('a', responses['a'])
+    clock.advance(dt.timedelta(seconds=1))
+    sqlite_store.save_response('b', responses['b'])
+    clock.advance(store.RESULT_REFRESH_INTERVAL)
+    assert sqlite_store.cached_response('a') == responses['a']
+    sqlite_store.save_response('c', responses['c'])
+
+    assert sqlite_store.cached_response('a') == responses['a']
+    assert sqlite_store.cached_response('b') is None
+    assert sqlite_store.cached_response('c') == responses['c']
+
+
+def test_store_result_cache_hits_are_read_only(sqlite_store, monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(store, '_utcnow', clock)
+    response = output.Response(items=[output.Item(title='a')])
+    sqlite_store.save_response('a', response)
+    with sqlite_store.transaction() as connection:
+        changes = connection.total_changes
+
+    clock.advance(store.RESULT_REFRESH_INTERVAL / 2)
+    for _ in range(3):
+        assert sqlite_store.cached_response('a') == response
+    with sqlite_store.transaction() as connection:
+        assert connection.total_changes == changes
+
+    clock.advance(store.RESULT_REFRESH_INTERVAL)
+    assert sqlite_store.cached_response('a') == response
+    with sqlite_store.transaction() as connection:
+        assert connection.total_changes == changes + 1
+
+
+def test_result_key_tracks_query_units_and_settings(monkeypatch):
+    monkeypatch.delenv('OUTPUT_DECIMALS', raising=False)
+    key = store.result_key('1m in cm', 'units')
+
+    assert store.result_key('1m in cm', 'units') == key
+    assert store.result_key('2m in cm', 'units') != key
+    assert store.result_key('1m in cm', 'other units') != key
+    monkeypatch.setenv('OUTPUT_DECIMALS', '2')
+    assert store.result_key('1m in cm', 'units') != key
+
+
+def test_store_reconnects_after_close(sqlite_store):
+    sqlite_store.write_rate_tables([('usd', {'base': 'usd'})])
+    sqlite_store.close()
+    sqlite_store.close()
+
+    assert sqlite_store.rate_table_bases() == ('usd',)
+
+
+def test_store_closes_connection_when_setup_fails(tmp_path, monkeypatch):
+    closed = []
+
+    class FailingConnection:
+        def execute(self, statement):
+            raise sqlite3.OperationalError('disk I/O error')
+
+        def close(self):
+            closed.append(True)
+
+    monkeypatch.setattr(
+        store.sqlite3,
+        'connect',
+        lambda *args, **kwargs: FailingConnection(),
+    )
+
+    with pytest.raises(sqlite3.OperationalError):
+        store.Store(str(tmp_path / 'broken.sqlite3')).rate_table('usd')
+    assert closed == [True]
+
+
+def test_currency_tables_live_in_store(sqlite_store, tmp_path):
+    usd = rate_cache('usd', {'eur': '0.9'})
+    eur = rate_cache('eur', {'usd': '1.1', 'isk': '150'})
+
+    currency.write_rate_caches(tmp_path, [usd, eur])
+
+    assert currency.read_rate_cache(tmp_path, 'usd') == usd
+    assert currency.cached_bases(tmp_path) == ('eur', 'usd')
+    assert not (tmp_path / 'currency' / 'usd.json').exists()
+    assert currency.history_path(tmp_path) == sqlite_store.path
+    assert currency.read_history_cache(
+        tmp_path, 'usd', dt.date(2026, 4, 24)
+    ).rates == usd.rates
+
+    response = currency.convert_query(tmp_path, '300 isk usd')
+    assert response.items[0].arg == '2.2'
+
+
+def test_currency_store_errors_read_as_missing(sqlite_store, tmp_path):
+    sqlite_store.write_rate_tables([('usd', {'base': 'usd'})])
+    assert currency.read_rate_cache(tmp_path, 'usd') is None
+    assert currency.read_rate_cache(tmp_path, 'eur') is None
+
+    def broken(*args):
+        raise sqlite3.OperationalError('database is locked')
+
+    sqlite_store.rate_table_bases = broken
+    sqlite_store.rate_table = broken
+
+    assert currency.cached_bases(tmp_path) == ()
+    assert currency.read_rate_cache(tmp_path, 'usd') is None
+
+
+def test_units_snapshot_is_built_once(sqlite_store, monkeypatch):
+    loads = []
+    real_load = main.convert.Units.load
+
+    def counting_load(self, xml_file):
+        loads.append(xml_file)
+        real_load(self, xml_file)
+
+    monkeypatch.setattr(main.convert.Units, 'load', counting_load)
+
+    first = main.load_units()
+    store.close_stores()
+    second = main.load_units()
+
+    assert len(loads) == 1
+    assert second.get('in').fractional
+    assert first.get('m').id == second.get('m').id
+
+
+def test_stale_units_snapshot_is_rebuilt(sqlite_store):
+    units = main.load_store_units(sqlite_store)
+    units.cache_version = -1
+    sqlite_store.save_units(
+        main.units_store_key(),
+        main.pickle.dumps(units, -1),
+    )
+
+    rebuilt = main.load_store_units(sqlite_store)
+
+    assert rebuilt.cache_version == main.constants.UNITS_CACHE_VERSION
+
+
+def test_unit_results_are_served_from_store(sqlite_store, monkeypatch):
+    first = main.run('1m in cm')
+
+    def fail():
+        raise AssertionError('units loaded')
+
+    monkeypatch.setattr(main, 'load_units', fail)
+
+    assert main.run('1m in cm') == first
+    with pytest.raises(AssertionError, match='units loaded'):
+        main.run('2m in cm')
@@ -0,0 +1,80 @@
+import json
+
+from converter import main, trace
+
+
+def read_trace(tmp_path):
+    with open(tmp_path / trace.TRACE_FILENAME, encoding="utf-8") as fh:
+        return [json.loads(line) for line in fh]
+
+
+def test_trace_is_off_by_default(capsys, monkeypatch, tmp_path):
+    monkeypatch.delenv(trace.TRACE_ENV, raising=False)
+    monkeypatch.setenv("alfred_workflow_cache", str(tmp_path))
+
+    main.scriptfilter("1 m in cm")
+
+    capsys.readouterr()
+    assert not (tmp_path / trace.TRACE_FILENAME).exists()
+    assert trace.stage("convert").__enter__() == {}
+
+
+def test_scriptfilter_writes_stage_timings(capsys, monkeypatch, tmp_path):
+    monkeypatch.setenv(trace.TRACE_ENV, "1")
+    monkeypatch.setenv("alfred_workflow_cache", str(tmp_path))
+
+    main.scriptfilter("1 m in cm")
+    main.scriptfilter("2 + 2")
+
+    capsys.readouterr()
+    first, second = read_trace(tmp_path)
+    assert first["query"] == "1 m in cm"
+    assert second["query"] == "2 + 2"
+    stages = first["stages"]
+    assert stages["import"]["seconds"] > 0
+    for name in (
+        "load_units", "clean_query", "pre_calculate", "convert",
+        "sort", "format", "render",
+    ):
+        assert stages[name]["count"] >= 1
+        assert 0 <= stages[name]["seconds"] <= first["seconds"]
+    assert stages["load_units"]["source"] in {"pickle", "store", "xml"}
+    assert stages["convert"]["results"] >= 1
+
+
+def test_trace_sums_repeated_stages(monkeypatch, tmp_path):
+    monkeypatch.setenv(trace.TRACE_ENV, "yes")
+
+    trace.start("query")
+    for index in range(3):
+        with trace.stage("format") as fields:
+            fields["index"] = index
+    recorded = trace.finish(tmp_path)
+
+    assert recorded.stages["format"]["count"] == 3
+    assert recorded.stages["format"]["index"] == 2
+    assert trace.finish(tmp_path) is None
+    assert len(read_trace(tmp_path)) == 1
+
+
+class FakeWorker:
+    def __init__(self):
+        self.jobs = []
+
+    def submit(self, job):
+        self.jobs.append(job)
+
+
+def test_trace_records_currency_stages(monkeypatch, tmp_path):
+    monkeypatch.setenv(trace.TRACE_ENV, "1")
+    worker = FakeWorker()
+    monkeypatch.setattr(main.currency, "_refresh_worker", worker)
+
+    trace.start("5 usd eur")
+    main.currency.convert_query(tmp_path, "5 usd eur")
+    recorded = trace.finish(tmp_path)
+
+    assert recorded.stages["rate_cache"]["hit"] is False
+    assert recorded.stages["refresh_lock"]["acquired"] is True
+    assert len(worker.jobs) == 1
+    worker.jobs[0].args[-1].release()
@@ -0,0 +1,87 @@
+import decimal
+import fractions
+import random
+
+import pytest
+
+from converter import benchmark, utils
+
+
+@pytest.mark.parametrize('value, expected', [
+    (fractions.Fraction(7, 4), ('7/4', '1 3/4')),
+    (fractions.Fraction(8, 4), ('2', None)),
+    (fractions.Fraction(-7, 4), ('-7/4', None)),
+    (fractions.Fraction(0), ('0', None)),
+    (fractions.Fraction(100, 3), ('100/3', '33 1/3')),
+    (fractions.Fraction(1001, 300), ('~107/32', '~3 11/32')),
+    (fractions.Fraction(1, 1000), (None, None)),
+    (decimal.Decimal('2.5'), ('5/2', '2 1/2')),
+    (3, ('3', None)),
+])
+def test_fraction_to_strings(value, expected):
+    assert utils.fraction_to_strings(value) == expected
+
+
+def test_fraction_to_strings_matches_fraction_arithmetic():
+    rng = random.Random(0)
+    values = benchmark.fraction_samples() + [
+        fractions.Fraction(
+            rng.randint(-10 ** 6, 10 ** 6), rng.randint(1, 10 ** 5)
+        )
+        for _ in range(2000)
+    ]
+
+    for value in values:
+        for limit in (64, 4, 0):
+            assert utils.fraction_to_strings(value, limit) == (
+                benchmark.fraction_to_string_fractions(value, False, limit),
+                benchmark.fraction_to_string_fractions(value, True, limit),
+            )
+
+
+def test_fraction_rounding_is_half_to_even():
+    assert utils.fraction_to_string(fractions.Fraction(41, 8), limit=4) == (
+        '~5'
+    )
+    assert utils.fraction_to_string(fractions.Fraction(43, 8), limit=4) == (
+        '~11/2'
+    )
+    # Rounds to 1/2, which is off by a third
+    assert utils.fraction_to_string(fractions.Fraction(3, 8), limit=4) is None
+
+
+@pytest.mark.parametrize('value, expected', [
+    ('12.50', '12.5'),
+    ('-3.000', '-3'),
+    ('1000', '1000'),
+    ('-0.0', '-0'),
+    ('1E+3', '1000'),
+    ('0E-7', '0'),
+    ('0.00000049', '0'),
+    ('2.0000005', '2'),
+    ('1.23456789', '1.234568'),
+])
+def test_decimal_to_string(value, expected):
+    assert utils.decimal_to_string(decimal.Decimal(value)) == expected
+
+
+def test_decimal_to_string_matches_localcontext_quantize(monkeypatch):
+    samples = benchmark.decimal_samples(2000) + [
+        decimal.Decimal('123456789012345678901234567890123456789.5'),
+        decimal.Decimal('-7.25E-3'),
+    ]
+
+    for decimals in (6, 2):
+        monkeypatch.setattr(utils.constants, 'OUTPUT_DECIMALS', decimals)
+        for value in samples:
+            assert utils.decimal_to_string(value) == (
+                benchmark.decimal_to_string_localcontext(value)
+            )
+
+
+def test_decimal_to_string_keeps_integers_without_decimals(monkeypatch):
+    monkeypatch.setattr(utils.constants, 'OUTPUT_DECIMALS', 0)
+
+    assert utils.decimal_to_string(decimal.Decimal('100')) == '100'
+    assert utils.decimal_to_string(decimal.Decimal('1E+2')) == '100'
+    assert utils.decimal_to_string(decimal.Decimal('99.5')) == '100'